@@ -1,42 +1,73 @@
-from flask import Flask, render_template, request, jsonify, session, send_from_directory, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, send_from_directory, redirect, url_for, g
+from flask_sock import Sock
 from datetime import datetime
 from functools import wraps
-import base64
+import atexit
+import hashlib
+import json
+import multiprocessing
 import os
-import numpy as np
+import threading
+import time
+import uuid
 
 from config import Config
 from utils.image_processor import ImageProcessor
-from utils.emotion_analyzer import EmotionAnalyzer
 from utils.database import Database
 from utils.face_recognition import FaceRecognition
+from utils.face_gallery import FaceGallery
+from utils.user_search import UserSearchIndex
+from utils.response_cache import ResponseCache
+from utils.metrics import Metrics
+from utils.face_tracker import FaceTrackerStore
 from utils.emotion_utils import get_emotion_color, calculate_emotion_variation
-
-def eye_aspect_ratio(eye):
-    """计算眼睛纵横比(EAR)"""
-    try:
-        # 确保坐标点是 numpy 数组
-        eye = np.array(eye)
-        
-        # 计算垂直方向上的欧氏距离
-        A = np.linalg.norm(eye[1] - eye[5])
-        B = np.linalg.norm(eye[2] - eye[4])
-        
-        # 计算水平方向上的欧氏距离
-        C = np.linalg.norm(eye[0] - eye[3])
-        
-        # 计算眼睛纵横比
-        ear = (A + B) / (2.0 * C)
-        return ear
-    except Exception as e:
-        print(f"计算眼睛纵横比时出错: {str(e)}")
-        return 0.0
+from utils.emotion_pivot import EmotionPivot
+from utils.emotion_writer import EmotionWriter, EmotionWriterBusyError
+from utils.model_registry import ModelRegistry
+from utils.liveness import LivenessSession, eye_aspect_ratio
+from utils.inference_executor import (
+    InferenceExecutor, InferenceBusyError, face_encoding_task, face_analysis_task, multi_face_task,
+    liveness_task
+)
 
 # 初始化 Flask 应用
 app = Flask(__name__, 
             static_folder=Config.STATIC_FOLDER,
             static_url_path=Config.STATIC_URL_PATH)
 app.secret_key = Config.SECRET_KEY
+sock = Sock(app)
+
+# 推理进程池以 spawn 方式启动，子进程会重新导入本模块，以下初始化只在主进程中执行
+is_main_process = multiprocessing.parent_process() is None
+
+# 推理进程池：启用时模型只在工作进程中加载
+inference_executor = None
+if Config.INFERENCE['enabled'] and is_main_process:
+    inference_executor = InferenceExecutor(
+        workers=Config.INFERENCE['workers'],
+        max_pending=Config.INFERENCE['max_pending'],
+        timeout=Config.INFERENCE['timeout'],
+        warmup=Config.MODEL_PRELOAD['warmup']
+    )
+    inference_executor.start()
+    atexit.register(inference_executor.shutdown)
+    if Config.EMOTION_BATCHING['enabled']:
+        print("提示: 已启用推理进程池，EMOTION_BATCHING 不生效（两者互斥）")
+elif is_main_process:
+    # 预加载 face_recognition / DeepFace 模型，默认在后台线程中进行，不阻塞导入
+    ModelRegistry.preload(Config.MODEL_PRELOAD['mode'], Config.MODEL_PRELOAD['warmup'])
+
+# 情绪记录异步批量写入
+emotion_writer = None
+if Config.EMOTION_WRITER['enabled'] and is_main_process:
+    emotion_writer = EmotionWriter(
+        batch_size=Config.EMOTION_WRITER['batch_size'],
+        flush_interval=Config.EMOTION_WRITER['flush_interval'],
+        max_queue_size=Config.EMOTION_WRITER['max_queue_size'],
+        put_timeout=Config.EMOTION_WRITER['put_timeout']
+    )
+    emotion_writer.start()
+    atexit.register(emotion_writer.close)
 
 # 装饰器
 def login_required(f):
@@ -56,6 +87,161 @@ def make_response(success=True, message='', data=None):
         **(({'data': data} if data else {}))
     })
 
+def snapshot_response(response):
+    """把 JSON 响应的响应体、ETag 和 X- 开头的响应头整理为可缓存的字典"""
+    body = response.get_data(as_text=True)
+    return {
+        'body': body,
+        'etag': hashlib.sha1(body.encode('utf-8')).hexdigest(),
+        'headers': {key: value for key, value in response.headers.items() if key.startswith('X-')}
+    }
+
+def cached_json_response(namespace, tags, params, build):
+    """带缓存和 ETag 的 JSON 响应
+
+    build() 返回成功时的 Flask 响应，其响应体和 X- 开头的响应头会一起缓存；
+    build() 抛出异常时不缓存。客户端带上匹配的 If-None-Match 时返回 304。
+    """
+    entry = ResponseCache.get_or_set(namespace, tags, params, lambda: snapshot_response(build()))
+    response = app.response_class(entry['body'], mimetype='application/json')
+    response.headers.update(entry['headers'])
+    response.set_etag(entry['etag'])
+    # 浏览器每次都需向服务器确认，数据未变时只返回 304
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def run_inference(task, *args):
+    """执行推理任务：启用推理进程池时提交到工作进程，否则在当前线程执行"""
+    with Metrics.timer(f'inference.{task.__name__}'):
+        if inference_executor is None:
+            return task(*args)
+        return inference_executor.run(task, *args)
+
+def get_face_tracker():
+    """当前会话的人脸跟踪状态，未启用跟踪时返回 None"""
+    if not Config.TRACKING['enabled']:
+        return None
+    if 'tracker_id' not in session:
+        session['tracker_id'] = uuid.uuid4().hex
+    return FaceTrackerStore.get(session['tracker_id'])
+
+def analyze_tracked_face(img, fields=(), fallback_fields=(), tracker=None):
+    """检测人脸并计算 fields 中的结果，启用跟踪时优先在上一帧人脸附近检测
+
+    fallback_fields 只在跟踪丢失、需要整帧检测时才计算。
+    """
+    now = time.monotonic()
+    hint = tracker.hint(now) if tracker is not None else None
+    try:
+        result = run_inference(face_analysis_task, img, hint, fields, fallback_fields)
+    except ValueError:
+        if tracker is not None:
+            tracker.lost()
+        raise
+    if tracker is not None:
+        tracker.observe(result['location'], result['tracked'], now)
+    return result
+
+def busy_response(e):
+    """推理繁忙或超时时返回 503"""
+    print(f"推理服务繁忙: {str(e)}")
+    return make_response(False, str(e)), 503
+
+def busy_message(e):
+    """推理繁忙或超时时 WebSocket 回复的消息，客户端稍后重发下一帧"""
+    print(f"推理服务繁忙: {str(e)}")
+    return json.dumps({'status': 'error', 'busy': True, 'message': str(e)})
+
+def analyze_liveness_frame(liveness, frame):
+    """解码一帧并通过推理任务计算 EAR，Web 进程中只更新会话的眨眼状态"""
+    now = time.monotonic()
+    img = ImageProcessor.decode_image_bytes(frame)
+    measurement = run_inference(liveness_task, img, liveness.last_location, liveness.track_margin)
+    return liveness.observe(measurement, now)
+
+# 图像上传统计，按上传方式汇总字节数与解码耗时
+upload_stats = {}
+upload_stats_lock = threading.Lock()
+
+def get_request_image_payload():
+    """读取请求中的图像数据
+
+    支持三种上传方式：
+    - multipart/form-data 中的 image 文件字段
+    - Content-Type 为 image/* 或 application/octet-stream 的原始二进制请求体
+    - JSON 中 base64 data URL 格式的 image 字段（兼容旧客户端）
+
+    返回 (上传方式, 数据)，未收到图像时返回 None。二进制数据以 memoryview
+    形式返回，解码时不再额外复制（multipart 文件读出时仍有一次复制）。
+    """
+    mimetype = request.mimetype
+    if mimetype == 'multipart/form-data':
+        file = request.files.get('image')
+        if file is None:
+            return None
+        return 'multipart', memoryview(file.stream.read())
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        data = request.get_data(cache=False)
+        return ('binary', memoryview(data)) if data else None
+    data = request.get_json(silent=True)
+    if not data or 'image' not in data:
+        return None
+    return 'base64', data['image']
+
+def decode_request_image(payload):
+    """解码 get_request_image_payload 返回的图像数据，并记录字节数与耗时"""
+    mode, data = payload
+    start = time.perf_counter()
+    if mode == 'base64':
+        img = ImageProcessor.decode_base64_image(data)
+    else:
+        img = ImageProcessor.decode_image_bytes(data)
+    elapsed = time.perf_counter() - start
+
+    g.upload_stats = (mode, len(data), elapsed)
+    with upload_stats_lock:
+        stats = upload_stats.setdefault(mode, {'requests': 0, 'bytes': 0, 'decode_time': 0.0})
+        stats['requests'] += 1
+        stats['bytes'] += len(data)
+        stats['decode_time'] += elapsed
+    return img
+
+def get_request_fields():
+    """读取请求中除图像外的其他字段"""
+    if request.mimetype == 'multipart/form-data':
+        return request.form
+    return request.get_json(silent=True) or {}
+
+@app.after_request
+def add_upload_headers(response):
+    """在响应头中返回本次请求的上传方式、字节数和解码耗时"""
+    stats = g.get('upload_stats')
+    if stats:
+        mode, size, elapsed = stats
+        response.headers['X-Upload-Mode'] = mode
+        response.headers['X-Upload-Bytes'] = str(size)
+        response.headers['X-Decode-Time-Ms'] = f'{elapsed * 1000:.2f}'
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    Metrics.begin_request()
+
+@app.after_request
+def record_request_timing(response):
+    """记录请求总耗时，并按需在 Server-Timing 响应头中返回各阶段耗时"""
+    timings = Metrics.end_request()
+    start = g.get('request_start')
+    if start is None or not Metrics.enabled():
+        return response
+    elapsed = time.perf_counter() - start
+    Metrics.observe('request', request.endpoint or 'unknown', elapsed)
+    if Config.METRICS['server_timing']:
+        timings['total'] = elapsed
+        response.headers['Server-Timing'] = Metrics.server_timing(timings)
+    return response
+
 # 路由处理
 @app.route('/')
 def index():
@@ -71,11 +257,13 @@ def serve_static(filename):
 def detect_action():
     """眨眼检测路由"""
     try:
-        image_data = request.json['image']
-        img = ImageProcessor.decode_base64_image(image_data)
+        payload = get_request_image_payload()
+        if payload is None:
+            return make_response(False, '未收到图片数据')
+        img = decode_request_image(payload)
         
-        # 获取人脸关键点
-        landmarks = FaceRecognition.get_face_landmarks(img)
+        # 获取人脸关键点（连续帧只在上一帧人脸附近检测）
+        landmarks = analyze_tracked_face(img, ('landmarks',), tracker=get_face_tracker())['landmarks']
         if not landmarks:
             return make_response(False, '未检测到人脸特征点')
         
@@ -92,7 +280,7 @@ def detect_action():
         ear = (left_ear + right_ear) / 2
         
         # 眨眼阈值
-        EYE_AR_THRESH = 0.22
+        EYE_AR_THRESH = Config.LIVENESS['ear_close_threshold']
         
         if ear < EYE_AR_THRESH:
             print(f"检测到眨眼 - EAR: {ear}")
@@ -101,57 +289,81 @@ def detect_action():
         print(f"未检测到眨眼 - EAR: {ear}")
         return make_response(False, '请眨眼', {'ear': ear})
         
+    except InferenceBusyError as e:
+        return busy_response(e)
+        
     except Exception as e:
         print(f"眨眼检测错误: {str(e)}")
         return make_response(False, str(e))
 
+@sock.route('/ws/liveness')
+def liveness_stream(ws):
+    """流式眨眼检测
+
+    客户端持续发送二进制 JPEG 帧，服务端为每个连接维护 EAR 与人脸跟踪状态，
+    每帧回复一条 JSON；完成闭眼-睁眼序列时 blink 为 true，
+    眨眼次数达到要求后 passed 为 true。逐帧检测与其他推理一样经 run_inference 执行，
+    推理进程池繁忙时回复 busy 为 true 的错误消息。
+    """
+    liveness = LivenessSession()
+    while True:
+        frame = ws.receive()
+        if frame is None:
+            break
+        if isinstance(frame, str):
+            # 文本消息作为控制指令
+            if frame == 'reset':
+                liveness = LivenessSession()
+            continue
+        try:
+            result = analyze_liveness_frame(liveness, frame)
+            ws.send(json.dumps({'status': 'success', **result}))
+        except InferenceBusyError as e:
+            ws.send(busy_message(e))
+        except Exception as e:
+            print(f"流式眨眼检测错误: {str(e)}")
+            ws.send(json.dumps({'status': 'error', 'message': str(e)}))
+
 @app.route('/register', methods=['POST'])
 def register():
     """注册路由"""
     try:
-        image_data = request.json['image']
-        username = request.json.get('username', '').strip()
+        payload = get_request_image_payload()
+        username = get_request_fields().get('username', '').strip()
         
+        if payload is None:
+            return make_response(False, '未收到图片数据')
         if not username:
             return make_response(False, '请输入姓名')
         
         # 解码图像
-        img = ImageProcessor.decode_base64_image(image_data)
+        img = decode_request_image(payload)
         
-        # 检测人脸
-        FaceRecognition.detect_face(img)
-            
         # 检查图像质量
         ImageProcessor.check_image_quality(img)
             
-        # 获取人脸编码
-        face_encoding = FaceRecognition.get_face_encoding(img)
+        # 检测人脸并获取人脸编码
+        face_encoding = run_inference(face_encoding_task, img)
         
         # 检查是否与现有用户太相似
-        with Database.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT face_encoding FROM users')
-            existing_users = cursor.fetchall()
-            
-            for existing_user in existing_users:
-                stored_encoding = np.frombuffer(base64.b64decode(existing_user[0]), dtype=np.float64)
-                if FaceRecognition.check_face_similarity(face_encoding, stored_encoding):
-                    return make_response(False, '已存在相似用户，请重试')
-            
-            # 保存用户信息
-            face_encoding_str = base64.b64encode(face_encoding).decode('utf-8')
-            cursor.execute(
-                'INSERT INTO users (username, face_encoding) VALUES (%s, %s)',
-                (username, face_encoding_str)
-            )
-            conn.commit()
-            session['user_id'] = cursor.lastrowid
+        match = FaceRecognition.find_best_match(face_encoding)
+        if match and match[2] < Config.FACE_RECOGNITION['face_distance_threshold']:
+            return make_response(False, '已存在相似用户，请重试')
+        
+        # 保存用户信息
+        user_id = Database.create_user(username, face_encoding)
+        FaceGallery.add(user_id, username, face_encoding)
+        UserSearchIndex.add_user(user_id, username)
+        session['user_id'] = user_id
         
         return make_response(True, '注册成功', {
             'username': username,
             'redirect': url_for('dashboard')
         })
         
+    except InferenceBusyError as e:
+        return busy_response(e)
+        
     except Exception as e:
         return make_response(False, str(e))
 
@@ -160,48 +372,51 @@ def check_face():
     """人脸验证路由"""
     try:
         # 1. 获取并验证图片数据
-        data = request.get_json()
-        if not data or 'image' not in data:
+        payload = get_request_image_payload()
+        if payload is None:
             return make_response(False, '未收到图片数据')
         
         try:
             # 2. 解码和处理图片
-            img = ImageProcessor.decode_base64_image(data['image'])
+            img = decode_request_image(payload)
             if img is None:
                 return make_response(False, '图片解码失败')
             
             # 3. 检查图片质量
             ImageProcessor.check_image_quality(img)
             
-            # 4. 获取人脸特征
-            face_encoding = FaceRecognition.get_face_encoding(img)
+            # 4. 检测人脸；同一张人脸仍在画面中且身份缓存未过期时直接复用，
+            #    否则计算人脸特征并在人脸编码库中查找最接近的用户
+            tracker = get_face_tracker()
+            match = tracker.cached_identity(time.monotonic()) if tracker is not None else None
+            if match is not None:
+                result = analyze_tracked_face(img, fallback_fields=('encoding',), tracker=tracker)
+            else:
+                result = analyze_tracked_face(img, ('encoding',), tracker=tracker)
+            if 'encoding' in result:
+                match = FaceRecognition.find_best_match(result['encoding'])
+                if tracker is not None and match is not None:
+                    tracker.remember_identity(match, time.monotonic())
             
-            # 5. 从数据库获取所有用户
-            with Database.get_connection() as conn:
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute('SELECT id, username, face_encoding FROM users')
-                users = cursor.fetchall()
-                
-                # 6. 首先用严格阈值检查用户是否存在
-                for user in users:
-                    stored_encoding = np.frombuffer(base64.b64decode(user['face_encoding']), dtype=np.float64)
-                    distance = FaceRecognition.calculate_face_distance(stored_encoding, face_encoding)
-                    
-                    # 如果找到匹配用户，使用宽松阈值进行最终验证
-                    if distance < Config.FACE_RECOGNITION['face_distance_threshold']:
-                        # 使用宽松阈值进行最终验证
-                        if distance < Config.FACE_RECOGNITION['login_tolerance']:
-                            session['user_id'] = user['id']
-                            return make_response(True, '验证成功', {
-                                'exists': True,
-                                'username': user['username']
-                            })
-                        else:
-                            return make_response(False, '人脸特征不匹配，请重试')
-                
-                # 如果没有找到匹配用户
-                return make_response(False, '未找到匹配用户，请先注册')
+            # 6. 首先用严格阈值检查用户是否存在
+            if match and match[2] < Config.FACE_RECOGNITION['face_distance_threshold']:
+                user_id, username, distance = match
+                # 使用宽松阈值进行最终验证
+                if distance < Config.FACE_RECOGNITION['login_tolerance']:
+                    session['user_id'] = user_id
+                    return make_response(True, '验证成功', {
+                        'exists': True,
+                        'username': username
+                    })
+                else:
+                    return make_response(False, '人脸特征不匹配，请重试')
+            
+            # 如果没有找到匹配用户
+            return make_response(False, '未找到匹配用户，请先注册')
                 
+        except InferenceBusyError as e:
+            return busy_response(e)
+            
         except ValueError as ve:
             print(f"人脸检测失败: {str(ve)}")
             return make_response(False, '未能检测到人脸，请调整姿势或光线')
@@ -216,6 +431,8 @@ def check_face():
 
 @app.route('/logout', methods=['POST'])
 def logout():
+    if 'tracker_id' in session:
+        FaceTrackerStore.drop(session['tracker_id'])
     session.clear()
     return make_response(True, '已退出登录')
 
@@ -225,31 +442,29 @@ def record_emotion():
     """情绪记录路由"""
     try:
         # 1. 获取并验证图片数据
-        data = request.get_json()
-        if not data or 'image' not in data:
+        payload = get_request_image_payload()
+        if payload is None:
             return make_response(False, '未收到图片数据')
         
         try:
             # 2. 解码和处理图片
-            img = ImageProcessor.decode_base64_image(data['image'])
+            img = decode_request_image(payload)
             if img is None:
                 return make_response(False, '图片解码失败')
 
-            # 3. 检测人脸
-            FaceRecognition.detect_face(img)
-            
-            # 4. 检查图像质量
+            # 3. 检查图像质量
             ImageProcessor.check_image_quality(img)
             
-            # 5. 调整图像大小
-            img = ImageProcessor.resize_image(img)
-            
-            # 6. 分析情绪
-            result = EmotionAnalyzer.analyze(img)
+            # 4. 检测人脸（连续帧只在上一帧人脸附近检测）并在人脸区域上分析情绪
+            result = analyze_tracked_face(img, ('emotion',), tracker=get_face_tracker())['emotion']
             
             # 7. 记录到数据库
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            Database.save_emotion(session['user_id'], result['emotion'], current_time)
+            if emotion_writer is not None:
+                emotion_writer.submit(session['user_id'], result['emotion'], current_time, result['probabilities'])
+            else:
+                Database.save_emotion(session['user_id'], result['emotion'], current_time, result['probabilities'])
+            UserSearchIndex.update_emotion(session['user_id'], result['emotion'], current_time)
 
             # 8. 返回结果
             return make_response(
@@ -264,6 +479,13 @@ def record_emotion():
                 }
             )
             
+        except InferenceBusyError as e:
+            return busy_response(e)
+            
+        except EmotionWriterBusyError as be:
+            print(f"情绪记录写入队列已满: {str(be)}")
+            return make_response(False, '系统繁忙，请稍后重试')
+            
         except ValueError as ve:
             print(f"人脸检测失败: {str(ve)}")
             return make_response(False, '未能检测到人脸，请调整姿势或光线')
@@ -276,96 +498,276 @@ def record_emotion():
         print(f"请求处理错误: {str(e)}")
         return make_response(False, f'记录情绪时发生错误: {str(e)}')
 
+@app.route('/analyze_faces', methods=['POST'])
+def analyze_faces():
+    """多人脸路由：一帧中识别所有人脸并分析情绪，为识别出的用户批量记录情绪"""
+    try:
+        payload = get_request_image_payload()
+        if payload is None:
+            return make_response(False, '未收到图片数据')
+
+        try:
+            img = decode_request_image(payload)
+            ImageProcessor.check_image_quality(img)
+
+            # 1. 一次检测所有人脸，批量计算编码和情绪
+            result = run_inference(multi_face_task, img, Config.MULTI_FACE['max_faces'])
+
+            # 2. 所有编码与人脸编码库一次矩阵运算完成匹配
+            matches = FaceRecognition.find_best_matches(result['encodings'])
+
+            # 3. 同一用户在画面中匹配到多张人脸时只记录距离最近的一张
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            faces, best = [], {}
+            for i, (location, match, emotion) in enumerate(zip(result['locations'], matches, result['emotions'])):
+                face = {
+                    'location': list(location),
+                    'emotion': emotion['emotion'],
+                    'probabilities': emotion['probabilities'],
+                    'identified': False
+                }
+                if match and match[2] < Config.FACE_RECOGNITION['face_distance_threshold']:
+                    user_id, username, distance = match
+                    face.update(identified=True, username=username, distance=round(distance, 4))
+                    if user_id not in best or distance < matches[best[user_id]][2]:
+                        best[user_id] = i
+                faces.append(face)
+
+            # 4. 批量写入情绪记录
+            if Config.MULTI_FACE['record_emotions'] and best:
+                records = [
+                    (user_id, faces[i]['emotion'], current_time, faces[i]['probabilities'])
+                    for user_id, i in best.items()
+                ]
+                if emotion_writer is not None:
+                    for record in records:
+                        emotion_writer.submit(*record)
+                else:
+                    Database.save_emotions(records)
+                for user_id, emotion, created_at, _ in records:
+                    UserSearchIndex.update_emotion(user_id, emotion, created_at)
+                for i in best.values():
+                    faces[i]['recorded'] = True
+
+            return make_response(True, f'检测到 {len(faces)} 张人脸，识别出 {len(best)} 位用户', {
+                'faces': faces,
+                'timestamp': current_time
+            })
+
+        except InferenceBusyError as e:
+            return busy_response(e)
+
+        except EmotionWriterBusyError as be:
+            print(f"情绪记录写入队列已满: {str(be)}")
+            return make_response(False, '系统繁忙，请稍后重试')
+
+        except ValueError as ve:
+            print(f"人脸检测失败: {str(ve)}")
+            return make_response(False, '未能检测到人脸，请调整姿势或光线')
+
+        except Exception as e:
+            print(f"处理图片数据时出错: {str(e)}")
+            return make_response(False, f'处理图片时发生错误: {str(e)}')
+
+    except Exception as e:
+        print(f"请求处理错误: {str(e)}")
+        return make_response(False, f'多人脸分析失败: {str(e)}')
+
 @app.route('/search_users', methods=['GET'])
 def search_users():
     try:
         search_query = request.args.get('query', '').strip()
-        users = Database.search_users(search_query)
+        users = UserSearchIndex.search(search_query, Config.DASHBOARD['user_list_page_size'])
         return make_response(True, '搜索成功', {'users': users})
         
     except Exception as e:
         print(f"搜索错误: {str(e)}")
         return make_response(False, str(e))
 
+def build_emotion_history(user_id, days, granularity):
+    """构建情绪历史图表数据"""
+    records, stats = Database.get_emotion_history(user_id, days)
+    return make_response(True, '获取成功', emotion_history_data(records, stats, granularity))
+
+def emotion_history_data(records, stats, granularity):
+    """由每日计数和统计信息生成图表数据"""
+    # 一次性构建 日期 × 情绪 矩阵，较长的时间窗口按周或按月合并
+    daily = EmotionPivot.from_records(records)
+    pivot = daily.resample(granularity)
+
+    # 构建数据集
+    datasets = [
+        {
+            'label': emotion,
+            'data': data,
+            'borderColor': get_emotion_color(emotion),
+            'backgroundColor': get_emotion_color(emotion, 0.2)
+        }
+        for emotion, data in pivot.series().items()
+    ]
+
+    # 计算情绪波动指数（始终按天计算）
+    variation = calculate_emotion_variation(daily)
+
+    return {
+        'labels': pivot.labels(granularity),
+        'granularity': granularity,
+        'datasets': datasets,
+        'stats': {
+            'mainEmotion': stats['main_emotion'] or '-',
+            'emotionVariation': f"{variation:.1f}",
+            'recordCount': stats['total_records']
+        }
+    }
+
+def emotion_history_params(args):
+    """解析情绪历史的查询参数，返回 (天数, 聚合粒度)"""
+    days = min(max(int(args.get('days', 7)), 1), Config.DASHBOARD['history_max_days'])
+    granularity = args.get('granularity') or EmotionPivot.auto_granularity(
+        days, Config.DASHBOARD['history_week_after_days'], Config.DASHBOARD['history_month_after_days']
+    )
+    if granularity not in EmotionPivot.GRANULARITIES:
+        raise ValueError(f'不支持的聚合粒度: {granularity}')
+    return days, granularity
+
 @app.route('/get_emotion_history', methods=['GET'])
 @login_required
 def get_emotion_history():
     """获取情绪历史数据"""
     try:
-        days = int(request.args.get('days', 7))
-        records, stats = Database.get_emotion_history(session['user_id'], days)
-        
-        # 处理数据格式
-        dates = sorted(list(set(record['date'].strftime('%Y-%m-%d') for record in records)))
-        emotions = sorted(list(set(record['emotion'] for record in records)))
-        
-        # 构建数据集
-        datasets = []
-        for emotion in emotions:
-            data = []
-            for date in dates:
-                count = 0
-                for record in records:
-                    if record['date'].strftime('%Y-%m-%d') == date and record['emotion'] == emotion:
-                        count = record['count']
-                        break
-                data.append(count)
-            
-            datasets.append({
-                'label': emotion,
-                'data': data,
-                'borderColor': get_emotion_color(emotion),
-                'backgroundColor': get_emotion_color(emotion, 0.2)
-            })
-        
-        # 计算情绪波动指数
-        variation = calculate_emotion_variation(records) if records else 0
-        
-        return make_response(True, '获取成功', {
-            'labels': dates,
-            'datasets': datasets,
-            'stats': {
-                'mainEmotion': stats['main_emotion'] or '-',
-                'emotionVariation': f"{variation:.1f}",
-                'recordCount': stats['total_records']
-            }
-        })
+        days, granularity = emotion_history_params(request.args)
+        user_id = session['user_id']
+        # 统计窗口以当天为终点，日期也作为缓存参数
+        params = [user_id, days, granularity, datetime.now().strftime('%Y-%m-%d')]
+        return cached_json_response(
+            'emotion_history', [ResponseCache.emotions_tag(user_id)], params,
+            lambda: build_emotion_history(user_id, days, granularity)
+        )
         
     except Exception as e:
         print(f"获取情绪历史数据错误: {str(e)}")
         return make_response(False, str(e))
 
+def user_list_params(args):
+    """解析用户列表的查询参数，返回 (每页条数, 游标)"""
+    limit = min(
+        int(args.get('limit', Config.DASHBOARD['user_list_page_size'])),
+        Config.DASHBOARD['user_list_max_page_size']
+    )
+    return max(limit, 1), args.get('cursor')
+
 @app.route('/get_user_list')
 def get_user_list():
     try:
-        users = Database.get_user_list()
-        return make_response(True, '获取成功', users)
+        limit, cursor = user_list_params(request.args)
+
+        def build():
+            users, next_cursor = Database.get_user_list(limit, cursor)
+            response = make_response(True, '获取成功', users)
+            # 下一页游标放在响应头中，保持 data 仍为用户数组
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response
+
+        return cached_json_response('user_list', [ResponseCache.USER_LIST_TAG], [limit, cursor], build)
         
     except Exception as e:
         print(f"获取用户列表失败: {str(e)}")
         return make_response(False, str(e))
 
+@app.route('/ready')
+def ready():
+    """就绪检查：模型加载并预热完成后才返回 200"""
+    if inference_executor is not None:
+        status = {'ready': inference_executor.is_ready(), 'inference': inference_executor.stats()}
+    else:
+        status = ModelRegistry.status()
+    return jsonify(status), (200 if status['ready'] else 503)
+
+@app.route('/upload_config')
+def upload_config():
+    """客户端上传参数协商：是否支持二进制上传及建议的缩放尺寸"""
+    return make_response(True, '获取成功', {
+        'binary': True,
+        'max_width': Config.UPLOAD['client_max_width'],
+        'jpeg_quality': Config.UPLOAD['client_jpeg_quality']
+    })
+
+@app.route('/metrics/upload')
+def upload_metrics():
+    """各上传方式的请求数、字节数和解码耗时"""
+    with upload_stats_lock:
+        stats = {mode: dict(values) for mode, values in upload_stats.items()}
+    for values in stats.values():
+        values['avg_bytes'] = values['bytes'] / values['requests']
+        values['avg_decode_ms'] = values['decode_time'] * 1000 / values['requests']
+    return jsonify(stats)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus 格式的阶段耗时直方图与连接池、推理进程池指标"""
+    pool = Database.pool_stats()
+    gallery = FaceGallery.memory_usage()
+    gauges = {
+        'face_auth_db_pool_in_use': ('正在使用的数据库连接数', pool['in_use']),
+        'face_auth_db_pool_idle': ('空闲的数据库连接数', pool['idle']),
+        'face_auth_db_pool_wait_seconds_max': ('借出数据库连接的最长等待时间（秒）', pool['wait_time_max']),
+        'face_auth_gallery_size': ('人脸编码库中的用户数', FaceGallery.size()),
+        'face_auth_gallery_bytes': ('人脸编码库占用的字节数（快照映射部分由各进程共享）',
+                                    gallery['encoding_bytes'] + gallery['identity_bytes'])
+    }
+    counters = {}
+    if inference_executor is not None:
+        inference = inference_executor.stats()
+        counters['face_auth_inference_rejected_total'] = ('推理进程池拒绝的任务数', inference['rejected'])
+        counters['face_auth_inference_timeouts_total'] = ('推理进程池超时的任务数', inference['timeouts'])
+        counters['face_auth_inference_restarts_total'] = ('推理进程池崩溃后重建的次数', inference['restarts'])
+    if emotion_writer is not None:
+        gauges['face_auth_emotion_writer_queued'] = ('等待写入的情绪记录数', emotion_writer.stats()['queued'])
+    return app.response_class(Metrics.render_prometheus(gauges, counters), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/db')
+def db_metrics():
+    """数据库连接池指标"""
+    return jsonify(Database.pool_stats())
+
+@app.route('/metrics/cache')
+def cache_metrics():
+    """读接口缓存指标"""
+    return jsonify(ResponseCache.stats())
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
     """仪表板路由"""
     try:
-        with Database.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute('SELECT username FROM users WHERE id = %s', (session['user_id'],))
-            user = cursor.fetchone()
-            
-        if not user:
+        user_id = session['user_id']
+        username = ResponseCache.get_or_set(
+            'username', [ResponseCache.user_tag(user_id)], user_id,
+            lambda: Database.get_username(user_id)
+        )
+        if not username:
             return redirect(url_for('index'))
             
-        return render_template('dashboard.html', current_user=user['username'])
+        return render_template('dashboard.html', current_user=username)
         
     except Exception as e:
         print(f"获取用户信息失败: {str(e)}")
         return redirect(url_for('index'))
 
+def init_app_state(migrate=True):
+    """建表并加载人脸编码库与用户名搜索索引
+
+    多进程部署时建表和迁移由 gunicorn master 执行一次（migrate=False），
+    避免多个 worker 同时对同一张表执行 ALTER TABLE。
+    """
+    if migrate:
+        Database.init_tables()
+    FaceGallery.load()
+    UserSearchIndex.load()
+
 if __name__ == '__main__':
-    Database.init_tables()
+    init_app_state()
     print("加载证书中...", os.path.exists(r"D:\openSSL\cert.pem"))
     app.run(
         host='0.0.0.0',
@@ -0,0 +1,221 @@
+"""ASGI 入口
+
+读接口（search_users、get_user_list、get_emotion_history、dashboard）在事件循环中执行，
+数据库查询使用 aiomysql 异步连接池，等待 MySQL 时不占用线程；响应与同步接口逐字节一致，
+并共用同一份结果缓存。其余 Flask 路由（识别、注册、情绪记录等 CPU 密集接口）原样挂载，
+由 a2wsgi 在线程池中执行，推理可再交给 INFERENCE 进程池。/ws/liveness 在事件循环中
+收发帧，逐帧解码放到线程池中，人脸检测与 EAR 计算同样可交给 INFERENCE 进程池。
+
+用法（在项目根目录执行）:
+    gunicorn -c gunicorn.conf.py asgi:application     # 生产部署，多进程
+    python manage.py init-db && uvicorn asgi:application --port 5001    # 单进程调试
+"""
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import wraps
+
+from a2wsgi import WSGIMiddleware
+from flask import render_template
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import HTMLResponse, RedirectResponse, Response
+from starlette.routing import Mount, Route, WebSocketRoute
+from werkzeug.http import parse_etags
+
+from app import (
+    app as flask_app, make_response, snapshot_response, init_app_state,
+    emotion_history_data, emotion_history_params, user_list_params,
+    analyze_liveness_frame, busy_message
+)
+from config import Config
+from utils.async_database import AsyncDatabase
+from utils.inference_executor import InferenceBusyError
+from utils.liveness import LivenessSession
+from utils.metrics import Metrics
+from utils.response_cache import ResponseCache
+from utils.user_search import UserSearchIndex
+
+
+def load_session(request):
+    """读取 Flask 签名 Cookie 中的会话（只读），签名无效或过期时返回空字典"""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        return serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+
+def flask_json(success=True, message='', data=None):
+    """用 Flask 的 make_response 生成 JSON 响应，保证与同步接口的输出一致"""
+    with flask_app.app_context():
+        return make_response(success, message, data)
+
+
+def to_response(flask_response):
+    return Response(
+        flask_response.get_data(),
+        status_code=flask_response.status_code,
+        headers=dict(flask_response.headers)
+    )
+
+
+async def cached_json_response(request, namespace, tags, params, build):
+    """与 app.cached_json_response 相同的缓存与 ETag 处理
+
+    build 为协程函数，返回 snapshot_response() 整理后的字典。
+    """
+    entry = await ResponseCache.aget_or_set(namespace, tags, params, build)
+    headers = {
+        **entry['headers'],
+        'ETag': f'"{entry["etag"]}"',
+        'Cache-Control': 'private, no-cache'
+    }
+    if parse_etags(request.headers.get('if-none-match')).contains_weak(entry['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(entry['body'], media_type='application/json', headers=headers)
+
+
+def timed_route(endpoint):
+    """记录请求总耗时，与 Flask 路由使用相同的指标和端点名"""
+    @wraps(endpoint)
+    async def wrapper(request, *args):
+        start = time.perf_counter()
+        try:
+            return await endpoint(request, *args)
+        finally:
+            if Metrics.enabled():
+                Metrics.observe('request', endpoint.__name__, time.perf_counter() - start)
+    return wrapper
+
+
+def login_required(endpoint):
+    """登录验证，未登录时与 Flask 版本一样跳转首页，已登录时传入 user_id"""
+    @wraps(endpoint)
+    async def wrapper(request):
+        user_id = load_session(request).get('user_id')
+        if user_id is None:
+            return RedirectResponse('/', status_code=302)
+        return await endpoint(request, user_id)
+    return wrapper
+
+
+@timed_route
+async def search_users(request):
+    try:
+        search_query = request.query_params.get('query', '').strip()
+        # 检索在内存索引上完成，但到期时会同步查询数据库增量，放到线程池中执行
+        users = await run_in_threadpool(
+            UserSearchIndex.search, search_query, Config.DASHBOARD['user_list_page_size']
+        )
+        return to_response(flask_json(True, '搜索成功', {'users': users}))
+
+    except Exception as e:
+        print(f"搜索错误: {str(e)}")
+        return to_response(flask_json(False, str(e)))
+
+
+@timed_route
+async def get_user_list(request):
+    try:
+        limit, cursor = user_list_params(request.query_params)
+
+        async def build():
+            users, next_cursor = await AsyncDatabase.get_user_list(limit, cursor)
+            response = flask_json(True, '获取成功', users)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return snapshot_response(response)
+
+        return await cached_json_response(request, 'user_list', [ResponseCache.USER_LIST_TAG], [limit, cursor], build)
+
+    except Exception as e:
+        print(f"获取用户列表失败: {str(e)}")
+        return to_response(flask_json(False, str(e)))
+
+
+@login_required
+@timed_route
+async def get_emotion_history(request, user_id):
+    try:
+        days, granularity = emotion_history_params(request.query_params)
+
+        async def build():
+            records, stats = await AsyncDatabase.get_emotion_history(user_id, days)
+            return snapshot_response(flask_json(True, '获取成功', emotion_history_data(records, stats, granularity)))
+
+        params = [user_id, days, granularity, datetime.now().strftime('%Y-%m-%d')]
+        return await cached_json_response(
+            request, 'emotion_history', [ResponseCache.emotions_tag(user_id)], params, build
+        )
+
+    except Exception as e:
+        print(f"获取情绪历史数据错误: {str(e)}")
+        return to_response(flask_json(False, str(e)))
+
+
+@login_required
+@timed_route
+async def dashboard(request, user_id):
+    try:
+        username = await ResponseCache.aget_or_set(
+            'username', [ResponseCache.user_tag(user_id)], user_id,
+            lambda: AsyncDatabase.get_username(user_id)
+        )
+        if not username:
+            return RedirectResponse('/', status_code=302)
+        with flask_app.app_context():
+            return HTMLResponse(render_template('dashboard.html', current_user=username))
+
+    except Exception as e:
+        print(f"获取用户信息失败: {str(e)}")
+        return RedirectResponse('/', status_code=302)
+
+
+async def liveness_stream(websocket):
+    """与 app.liveness_stream 相同的流式眨眼检测，逐帧分析在线程池中执行"""
+    await websocket.accept()
+    liveness = LivenessSession()
+    while True:
+        message = await websocket.receive()
+        if message['type'] == 'websocket.disconnect':
+            break
+        if message.get('text') is not None:
+            # 文本消息作为控制指令
+            if message['text'] == 'reset':
+                liveness = LivenessSession()
+            continue
+        try:
+            result = await run_in_threadpool(analyze_liveness_frame, liveness, message['bytes'])
+            await websocket.send_text(json.dumps({'status': 'success', **result}))
+        except InferenceBusyError as e:
+            await websocket.send_text(busy_message(e))
+        except Exception as e:
+            print(f"流式眨眼检测错误: {str(e)}")
+            await websocket.send_text(json.dumps({'status': 'error', 'message': str(e)}))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # 建表和迁移由 gunicorn.conf.py 的 on_starting 或 manage.py init-db 执行
+    await run_in_threadpool(init_app_state, False)
+    yield
+    await AsyncDatabase.close()
+
+
+application = Starlette(
+    routes=[
+        Route('/search_users', search_users),
+        Route('/get_user_list', get_user_list),
+        Route('/get_emotion_history', get_emotion_history),
+        Route('/dashboard', dashboard),
+        WebSocketRoute('/ws/liveness', liveness_stream),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=Config.SERVER['wsgi_threads']))
+    ],
+    lifespan=lifespan
+)
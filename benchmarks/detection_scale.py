@@ -0,0 +1,119 @@
+"""缩小检测 + 区域裁剪 与 原图检测的精度和耗时对比
+
+对每张照片先放大到指定分辨率（默认 1920x1080，模拟高清摄像头帧），分别：
+    - 原流程：在整帧上检测，再在整帧上计算编码
+    - 新流程：FacePipeline（缩小检测、人脸框放大回原图、在带边距的区域上计算编码）
+输出两种流程的检测耗时、人脸框 IoU 和编码距离。任一照片的编码距离超过
+--tolerance 或 IoU 低于 --min-iou 时退出码为 1。需要 face_recognition 和真实人脸照片。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.detection_scale photos/ --max-widths 480 640 960
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+from config import Config
+from utils.face_pipeline import FacePipeline
+from utils.model_registry import ModelRegistry
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_frames(paths, frame_size):
+    """读取照片并等比缩放、填充到 frame_size（宽, 高）"""
+    frames = []
+    for path in paths:
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+        for file in files:
+            if not file.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            img = cv2.imread(file)
+            if img is None:
+                continue
+            width, height = frame_size
+            scale = min(width / img.shape[1], height / img.shape[0])
+            resized = cv2.resize(img, (int(img.shape[1] * scale), int(img.shape[0] * scale)))
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            frame[:resized.shape[0], :resized.shape[1]] = resized
+            frames.append((os.path.basename(file), frame))
+    return frames
+
+
+def iou(a, b):
+    top, right, bottom, left = max(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+    inter = max(right - left, 0) * max(bottom - top, 0)
+    area = lambda box: (box[1] - box[3]) * (box[2] - box[0])
+    return inter / (area(a) + area(b) - inter) if inter else 0.0
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='照片文件或目录')
+    parser.add_argument('--frame-size', type=int, nargs=2, default=[1920, 1080], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--max-widths', type=int, nargs='+',
+                        default=[Config.FACE_RECOGNITION['detection_max_width']])
+    parser.add_argument('--tolerance', type=float, default=0.06, help='允许的最大编码距离')
+    parser.add_argument('--min-iou', type=float, default=0.7)
+    args = parser.parse_args(argv)
+
+    face_recognition = ModelRegistry.face_recognition()
+    frames = load_frames(args.paths, args.frame_size)
+    if not frames:
+        print("没有可用的照片")
+        return 1
+
+    # 原流程：整帧检测与编码
+    reference = {}
+    full_times = []
+    for name, frame in frames:
+        locations, elapsed = timed(lambda: face_recognition.face_locations(frame))
+        if not locations:
+            print(f"{name}: 原图上未检测到人脸，跳过")
+            continue
+        full_times.append(elapsed)
+        reference[name] = (locations[0], face_recognition.face_encodings(frame, known_face_locations=locations[:1])[0])
+    if not reference:
+        print("所有照片都未检测到人脸")
+        return 1
+    print(f"原图检测: {len(reference)} 张, 平均 {np.mean(full_times) * 1000:.1f} ms")
+
+    failed = False
+    print(f"{'max width':>10} {'detect ms':>10} {'speedup':>8} {'min IoU':>8} {'max dist':>9} {'missed':>7}")
+    for max_width in args.max_widths:
+        Config.FACE_RECOGNITION['detection_max_width'] = max_width
+        times, ious, distances, missed = [], [], [], 0
+        for name, frame in frames:
+            if name not in reference:
+                continue
+            try:
+                analysis, elapsed = timed(lambda: FacePipeline.process(frame))
+            except ValueError:
+                missed += 1
+                continue
+            times.append(elapsed)
+            location, encoding = reference[name]
+            ious.append(iou(location, analysis.face_location))
+            distances.append(float(np.linalg.norm(analysis.encoding - encoding)))
+        if not times:
+            print(f"{max_width:>10} 全部未检测到人脸")
+            failed = True
+            continue
+        min_iou, max_dist = min(ious), max(distances)
+        print(f"{max_width:>10} {np.mean(times) * 1000:>10.1f} {np.mean(full_times) / np.mean(times):>7.1f}x "
+              f"{min_iou:>8.3f} {max_dist:>9.4f} {missed:>7}")
+        failed |= missed > 0 or min_iou < args.min_iou or max_dist > args.tolerance
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""情绪模型批量推理的吞吐与延迟
+
+分别以 1/4/16/32 的批大小调用 EmotionAnalyzer.analyze_batch，输出每批延迟与
+每秒处理的人脸数；再用多线程模拟并发请求，测量 EmotionBatcher 的端到端延迟。
+需要本机已安装 DeepFace 并能加载情绪模型。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.emotion_batching --batch-sizes 1 4 16 32 --iterations 20
+"""
+import argparse
+import sys
+import threading
+import time
+import numpy as np
+
+from utils.emotion_analyzer import EmotionAnalyzer
+from utils.emotion_batcher import EmotionBatcher
+from utils.model_registry import ModelRegistry
+
+
+def make_crops(count, seed=0):
+    """生成合成的人脸区域图像"""
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, size=(160, 160, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def bench_direct(batch_size, iterations):
+    """直接批量推理，返回 (每批 p50 延迟 ms, 每批 p95 延迟 ms, 每秒人脸数)"""
+    crops = make_crops(batch_size)
+    EmotionAnalyzer.analyze_batch(crops)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        EmotionAnalyzer.analyze_batch(crops)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies)
+    return (np.percentile(latencies, 50) * 1000, np.percentile(latencies, 95) * 1000,
+            batch_size * iterations / latencies.sum())
+
+
+def bench_batcher(concurrency, requests_per_client, max_batch_size, max_wait_ms):
+    """多线程并发提交到 EmotionBatcher，返回 (p50 ms, p95 ms, 每秒请求数, 平均批大小)"""
+    batcher = EmotionBatcher(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    crop = make_crops(1)[0]
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            batcher.analyze(crop)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies)
+    return (np.percentile(latencies, 50) * 1000, np.percentile(latencies, 95) * 1000,
+            len(latencies) / elapsed, batcher.stats()['avg_batch_size'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests-per-client', type=int, default=10)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args(argv)
+
+    ModelRegistry.emotion_model()
+
+    print("直接批量推理")
+    print(f"{'batch':>6} {'p50 ms':>10} {'p95 ms':>10} {'faces/s':>10}")
+    for batch_size in args.batch_sizes:
+        p50, p95, throughput = bench_direct(batch_size, args.iterations)
+        print(f"{batch_size:>6} {p50:>10.2f} {p95:>10.2f} {throughput:>10.1f}")
+
+    print(f"\nEmotionBatcher（{args.concurrency} 个并发客户端，最多等待 {args.max_wait_ms} ms）")
+    print(f"{'max batch':>10} {'p50 ms':>10} {'p95 ms':>10} {'req/s':>10} {'avg batch':>10}")
+    for batch_size in args.batch_sizes:
+        p50, p95, throughput, avg_batch = bench_batcher(
+            args.concurrency, args.requests_per_client, batch_size, args.max_wait_ms
+        )
+        print(f"{batch_size:>10} {p50:>10.2f} {p95:>10.2f} {throughput:>10.1f} {avg_batch:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
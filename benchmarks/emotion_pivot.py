@@ -0,0 +1,99 @@
+"""情绪历史数据集构建的耗时随时间窗口的变化
+
+用合成的每日汇总记录（每天每种情绪一条）分别测量原来的 情绪 × 日期 × 记录
+三重循环和 EmotionPivot 一次性构建矩阵的耗时，并校验两者输出一致。
+EmotionPivot 每条记录的耗时应基本不随窗口变长而增加（线性）。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.emotion_pivot --days 7 30 90 365 730 --repeat 20
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from utils.emotion_pivot import EmotionPivot
+from utils.emotion_utils import EMOTION_VALUES, calculate_emotion_variation
+
+
+def make_records(days, emotions, seed=0):
+    """生成 days 天、每天每种情绪一条的汇总记录"""
+    start = date(2024, 1, 1)
+    return [
+        {'date': start + timedelta(days=i), 'emotion': emotion, 'count': (i * 7 + j * 13 + seed) % 20 + 1}
+        for i in range(days)
+        for j, emotion in enumerate(emotions)
+    ]
+
+
+def legacy_datasets(records):
+    """原实现：情绪 × 日期 × 记录 三重循环"""
+    dates = sorted(list(set(record['date'].strftime('%Y-%m-%d') for record in records)))
+    emotions = sorted(list(set(record['emotion'] for record in records)))
+    datasets = []
+    for emotion in emotions:
+        data = []
+        for d in dates:
+            count = 0
+            for record in records:
+                if record['date'].strftime('%Y-%m-%d') == d and record['emotion'] == emotion:
+                    count = record['count']
+                    break
+            data.append(count)
+        datasets.append((emotion, data))
+    return dates, datasets
+
+
+def pivot_datasets(records):
+    pivot = EmotionPivot.from_records(records)
+    return pivot.labels(), list(pivot.series().items())
+
+
+def measure(fn, records, repeat):
+    """返回最快一次的耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(records)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 30, 90, 365, 730])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--legacy-max-days', type=int, default=365,
+                        help='超过该天数时跳过原实现（耗时过长）')
+    args = parser.parse_args(argv)
+
+    emotions = list(EMOTION_VALUES)
+    print(f"{'days':>6} {'records':>8} {'legacy ms':>10} {'pivot ms':>10} {'pivot us/rec':>13} {'speedup':>8}")
+    for days in args.days:
+        records = make_records(days, emotions)
+        pivot_time = measure(pivot_datasets, records, args.repeat)
+        legacy = '-'
+        speedup = '-'
+        if days <= args.legacy_max_days:
+            if legacy_datasets(records) != pivot_datasets(records):
+                print(f"{days} 天的输出与原实现不一致")
+                return 1
+            legacy_time = measure(legacy_datasets, records, max(1, args.repeat // 10))
+            legacy = f"{legacy_time * 1000:.2f}"
+            speedup = f"{legacy_time / pivot_time:.0f}x"
+        print(f"{days:>6} {len(records):>8} {legacy:>10} {pivot_time * 1000:>10.3f} "
+              f"{pivot_time * 1e6 / len(records):>13.3f} {speedup:>8}")
+
+    # 波动指数与逐条计算的结果一致
+    records = make_records(30, emotions)
+    values = [EMOTION_VALUES.get(r['emotion'], 0) * r['count'] for r in records]
+    mean = sum(values) / len(values)
+    expected = (sum((x - mean) ** 2 for x in values) / len(values)) ** 0.5 * 100
+    if abs(calculate_emotion_variation(records) - expected) > 1e-6:
+        print("情绪波动指数与原实现不一致")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""人脸编码库存储精度与内存、识别准确性的对比
+
+在合成的人脸编码上，对 float64 / float32 / float16 / int8 四种 gallery_dtype 分别统计：
+每个用户占用的字节数（编码 + 用户 id / 用户名）、快照文件大小、与 float64 精确检索
+相比的 recall@1、最近距离的误差，以及在 face_distance_threshold（注册查重）和
+login_tolerance（登录）两个阈值上判定结果与 float64 不一致的比例。查询的噪声大小
+随机分布，使距离覆盖两个阈值附近，另有同样数量不在编码库中的陌生人查询。
+第一行 legacy 为改用紧凑存储前的表示（float64 矩阵 + Python 列表 / 集合）的内存。
+int8+inc 为从空编码库开始逐个追加（与注册新用户时的 FaceGallery.add 相同）得到的 int8 编码库。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.gallery_quantization --users 200000
+    python -m benchmarks.gallery_quantization --dtypes float64 float32 float16 --max-flip-rate 0.001
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+from config import Config
+from utils.gallery_store import EncodingStore, GallerySnapshot, IdentityTable
+
+
+def make_probes(gallery, queries, seed=0):
+    """生成查询：一半为编码库中用户加噪声（噪声大小随机，距离约 0.05~0.7），一半为陌生人"""
+    rng = np.random.default_rng(seed)
+    users, dim = gallery.shape
+    genuine = queries // 2
+    truth = rng.integers(users, size=genuine)
+    noise = rng.uniform(0.005, 0.06, size=(genuine, 1))
+    probes = gallery[truth] + rng.normal(0.0, 1.0, size=(genuine, dim)) * noise
+    strangers = rng.normal(0.0, 0.06, size=(queries - genuine, dim))
+    return np.vstack([probes, strangers])
+
+
+def build_store(gallery, dtype, incremental=False):
+    """一次性或逐行追加构建编码库"""
+    store = EncodingStore(gallery.shape[1], dtype)
+    if incremental:
+        for encoding in gallery:
+            store.append(encoding)
+    else:
+        store.append(gallery)
+    return store
+
+
+def legacy_bytes(user_ids, usernames):
+    """改用紧凑存储前每个用户的 Python 对象开销：id 与用户名对象、两个列表和 id 集合"""
+    known_ids = set(user_ids)
+    return (sum(sys.getsizeof(i) for i in user_ids) + sum(sys.getsizeof(name) for name in usernames)
+            + sys.getsizeof(user_ids) + sys.getsizeof(usernames) + sys.getsizeof(known_ids))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--dtypes', nargs='+', default=['float64', 'float32', 'float16', 'int8'],
+                        choices=sorted(EncodingStore.DTYPES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-flip-rate', type=float, default=None,
+                        help='任一精度在任一阈值上判定不一致的比例超过该值时返回非零退出码')
+    args = parser.parse_args(argv)
+
+    thresholds = {
+        'face_distance_threshold': Config.FACE_RECOGNITION['face_distance_threshold'],
+        'login_tolerance': Config.FACE_RECOGNITION['login_tolerance']
+    }
+    rng = np.random.default_rng(args.seed)
+    gallery = rng.normal(0.0, 0.06, size=(args.users, 128))
+    probes = make_probes(gallery, args.queries, seed=args.seed + 1)
+    user_ids = list(range(1, args.users + 1))
+    usernames = [f'user{i:07d}' for i in user_ids]
+
+    legacy = gallery.nbytes + legacy_bytes(user_ids, usernames)
+    print(f"用户数 {args.users}, 查询数 {args.queries}, 阈值 "
+          + ', '.join(f'{name}={value}' for name, value in thresholds.items()))
+    print(f"{'dtype':<8} {'B/user':>7} {'total MB':>9} {'snap MB':>8} {'ms/query':>9} {'recall@1':>9} "
+          f"{'max err':>9} {'mean err':>9} " + ' '.join(f'{"flips@" + str(value):>10}' for value in thresholds.values()))
+    print(f"{'legacy':<8} {legacy / args.users:>7.0f} {legacy / 2 ** 20:>9.1f}")
+
+    exact_rows = exact = None
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = [(dtype, dtype, False) for dtype in args.dtypes]
+        if 'int8' in args.dtypes:
+            variants.append(('int8+inc', 'int8', True))
+        for name, dtype, incremental in variants:
+            store = build_store(gallery, dtype, incremental)
+            identities = IdentityTable()
+            identities.append(user_ids, usernames)
+            total = store.nbytes + identities.nbytes
+
+            # 通过快照的内存映射检索，与配置了 gallery_snapshot 的 Web 进程一致
+            path = os.path.join(tmp, f'{name}.snap')
+            GallerySnapshot.save(path, store, identities, args.users)
+            store, identities, _ = GallerySnapshot.load(path)
+
+            start = time.perf_counter()
+            rows, distances = np.empty(len(probes), dtype=np.int64), np.empty(len(probes))
+            for i, probe in enumerate(probes):
+                query_distances = store.distances(probe)
+                rows[i] = query_distances.argmin()
+                distances[i] = query_distances[rows[i]]
+            ms = (time.perf_counter() - start) * 1000 / len(probes)
+            if exact is None:
+                # 第一个精度作为参照，默认为 float64
+                exact_rows, exact = rows, distances
+
+            errors = np.abs(distances - exact)
+            flips = {name: float(np.mean((distances < value) != (exact < value)))
+                     for name, value in thresholds.items()}
+            print(f"{name:<8} {total / args.users:>7.0f} {total / 2 ** 20:>9.1f} "
+                  f"{os.path.getsize(path) / 2 ** 20:>8.1f} {ms:>9.3f} {np.mean(rows == exact_rows):>9.4f} "
+                  f"{errors.max():>9.2e} {errors.mean():>9.2e} "
+                  + ' '.join(f'{rate:>10.4%}' for rate in flips.values()), flush=True)
+            if args.max_flip_rate is not None and max(flips.values()) > args.max_flip_rate:
+                failed = True
+            del store, identities
+
+    if failed:
+        print(f"存在判定不一致比例超过 {args.max_flip_rate} 的精度")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""识别、情绪和数据库热点路径的基准测试
+
+离线运行：图像与人脸编码均为合成数据，数据库使用 benchmarks/sqlite_db.py 中的
+SQLite 替身。每个用例输出 p50/p95/p99 延迟、吞吐量和峰值内存（tracemalloc），
+并与保存的基线比较，p95 延迟或峰值内存超出容差的用例记为回归，退出码为 1。
+
+覆盖的用例：
+    image.*    ImageProcessor.decode_base64_image（需要 opencv）
+    face.*     FaceRecognition 检测、编码、关键点（需要 face_recognition）
+    emotion.*  EmotionAnalyzer.analyze（需要 deepface）
+    gallery.*  check_face 中的人脸库匹配，按用户数递增
+    search.*   UserSearchIndex 子串搜索（不走结果缓存），合成用户名均为 userN，
+               'user' 会匹配全部用户，覆盖候选集超过 SCAN_THRESHOLD 的路径
+    db.*       Database 各查询，按用户数和情绪记录数递增
+缺少依赖的用例组会被跳过。基线与机器相关，请先在同一台机器上保存：
+
+用法（在项目根目录执行）:
+    python -m benchmarks.hot_paths --users 1000 10000 --save-baseline
+    python -m benchmarks.hot_paths --users 1000 10000           # 与基线比较
+    python -m benchmarks.hot_paths --only db gallery --image face.jpg
+"""
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from benchmarks import sqlite_db
+from utils.database import Database
+from utils.encoding_codec import FaceEncodingCodec
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baselines.json')
+GROUPS = ('image', 'face', 'emotion', 'gallery', 'search', 'db')
+
+
+def measure(name, fn, iterations, warmup=2, memory_runs=3):
+    """多次调用 fn，返回延迟分位数、吞吐量和峰值内存"""
+    for _ in range(warmup):
+        fn()
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies[i] = time.perf_counter() - start
+
+    # tracemalloc 本身有开销，单独跑几次只统计内存
+    tracemalloc.start()
+    for _ in range(memory_runs):
+        fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        'name': name,
+        'iterations': iterations,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'throughput': float(iterations / latencies.sum()),
+        'peak_kb': peak / 1024
+    }
+
+
+def has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def make_frame(image_path=None, size=(480, 640), seed=0):
+    """测试图像：指定了真实照片时读取照片，否则生成带噪声的合成帧"""
+    if image_path:
+        import cv2
+        img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError(f'无法读取图像: {image_path}')
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(*size, 3), dtype=np.uint8)
+
+
+def bench_image(args, frame):
+    import cv2
+    from utils.image_processor import ImageProcessor
+
+    ok, jpeg = cv2.imencode('.jpg', cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 85])
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg.tobytes()).decode()
+    yield measure('image.decode_base64', lambda: ImageProcessor.decode_base64_image(data_url), args.iterations)
+
+
+def bench_face(args, frame):
+    from utils.face_recognition import FaceRecognition
+
+    def detect():
+        try:
+            return FaceRecognition.detect_face(frame)
+        except ValueError:
+            return None
+
+    # 合成帧上检测不到人脸时使用固定的人脸框
+    locations = detect() or [(frame.shape[0] // 4, frame.shape[1] * 3 // 4, frame.shape[0] * 3 // 4, frame.shape[1] // 4)]
+    iterations = max(args.iterations // 5, 5)
+    yield measure('face.detect', detect, iterations)
+    yield measure('face.encode', lambda: FaceRecognition.get_face_encoding(frame, locations), iterations)
+    yield measure('face.landmarks', lambda: FaceRecognition.get_face_landmarks(frame, locations), iterations)
+
+
+def bench_emotion(args, frame):
+    from utils.emotion_analyzer import EmotionAnalyzer
+    from utils.image_processor import ImageProcessor
+
+    height, width = frame.shape[:2]
+    crop = ImageProcessor.crop_face(frame, (height // 4, width * 3 // 4, height * 3 // 4, width // 4))
+    iterations = max(args.iterations // 5, 5)
+    yield measure('emotion.analyze', lambda: EmotionAnalyzer.analyze(crop, detector_backend='skip'), iterations)
+
+
+def bench_gallery(args, users, rng):
+    from utils.face_gallery import FaceGallery
+    from utils.face_recognition import FaceRecognition
+
+    yield measure(f'gallery.load[users={users}]', FaceGallery.load, args.db_iterations, warmup=0, memory_runs=1)
+    known = FaceEncodingCodec.decode_many(
+        [row[2] for row in Database.get_face_encodings(rng.randrange(users))[:1]]
+    )[0]
+    near = known + np.random.default_rng(1).normal(0, 0.01, size=known.shape)
+    stranger = np.random.default_rng(2).normal(0, 0.1, size=known.shape)
+    yield measure(f'gallery.match_hit[users={users}]', lambda: FaceRecognition.find_best_match(near), args.iterations)
+    yield measure(f'gallery.match_miss[users={users}]', lambda: FaceRecognition.find_best_match(stranger), args.iterations)
+
+
+def bench_search(args, users, rng):
+    from utils.user_search import UserSearchIndex
+
+    def search(query):
+        UserSearchIndex._cache.clear()
+        return UserSearchIndex.search(query)
+
+    UserSearchIndex.load()
+    # 'use' 与 'user' 匹配的用户相同，但超过 MAX_GRAM 的查询需要再校验子串
+    for query in ('use', 'user', f'user{rng.randint(1, users)}'):
+        yield measure(f'search.{query[:4]}_{len(query)}chars[users={users}]', lambda: search(query), args.iterations)
+
+
+def bench_db(args, users, rng):
+    suffix = f'[users={users},emotions={users * args.emotions_per_user}]'
+    random_id = lambda: rng.randint(1, users)
+    now = lambda: time.strftime('%Y-%m-%d %H:%M:%S')
+    _, cursor = Database.get_user_list(50)
+    for _ in range(4):
+        if cursor:
+            _, cursor = Database.get_user_list(50, cursor)
+
+    yield measure(f'db.get_username{suffix}', lambda: Database.get_username(random_id()), args.iterations)
+    yield measure(f'db.get_user_list{suffix}', lambda: Database.get_user_list(50), args.iterations)
+    yield measure(f'db.get_user_list_page5{suffix}', lambda: Database.get_user_list(50, cursor), args.iterations)
+    yield measure(f'db.get_emotion_history{suffix}', lambda: Database.get_emotion_history(random_id(), 90), args.iterations)
+    yield measure(f'db.save_emotion{suffix}', lambda: Database.save_emotion(random_id(), '开心', now()), args.iterations)
+    yield measure(
+        f'db.save_emotions_200{suffix}',
+        lambda: Database.save_emotions([(random_id(), '平静', now(), None) for _ in range(200)]),
+        max(args.iterations // 10, 5)
+    )
+    yield measure(f'db.get_face_encodings{suffix}', Database.get_face_encodings, args.db_iterations, warmup=0, memory_runs=1)
+    yield measure(f'db.get_search_entries{suffix}', Database.get_search_entries, args.db_iterations, warmup=0, memory_runs=1)
+
+
+def compare(results, baseline, latency_tolerance, memory_tolerance):
+    """返回回归的用例说明列表"""
+    regressions = []
+    for result in results:
+        base = baseline.get(result['name'])
+        if base is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + latency_tolerance):
+            regressions.append(f"{result['name']}: p95 {base['p95_ms']:.3f} -> {result['p95_ms']:.3f} ms")
+        if result['peak_kb'] > base['peak_kb'] * (1 + memory_tolerance) + 64:
+            regressions.append(f"{result['name']}: 峰值内存 {base['peak_kb']:.0f} -> {result['peak_kb']:.0f} KB")
+    return regressions
+
+
+def print_result(result):
+    print(f"{result['name']:<58} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+          f"{result['throughput']:>10.1f} {result['peak_kb']:>10.0f}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS))
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--emotions-per-user', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--db-iterations', type=int, default=5, help='整表读取等耗时用例的迭代次数')
+    parser.add_argument('--image', help='使用真实照片代替合成帧')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--latency-tolerance', type=float, default=0.25)
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    args = parser.parse_args(argv)
+
+    frame = make_frame(args.image)
+    results = []
+    print(f"{'case':<58} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10} {'peak KB':>10}")
+
+    for group, module, bench in (
+        ('image', 'cv2', bench_image),
+        ('face', 'face_recognition', bench_face),
+        ('emotion', 'deepface', bench_emotion)
+    ):
+        if group not in args.only:
+            continue
+        if not has_module(module):
+            print(f"跳过 {group}: 未安装 {module}")
+            continue
+        for result in bench(args, frame):
+            print_result(result)
+            results.append(result)
+
+    if {'gallery', 'search', 'db'} & set(args.only):
+        encoding_rng = np.random.default_rng(0)
+        encoding_blob = lambda _: FaceEncodingCodec.encode(encoding_rng.normal(0, 0.1, 128))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for users in sorted(args.users):
+                path = sqlite_db.install(os.path.join(tmpdir, f'bench_{users}.db'))
+                sqlite_db.populate(path, users, args.emotions_per_user, encoding_blob=encoding_blob)
+                rng = random.Random(users)
+                for group, bench in (('gallery', bench_gallery), ('search', bench_search), ('db', bench_db)):
+                    if group not in args.only:
+                        continue
+                    for result in bench(args, users, rng):
+                        print_result(result)
+                        results.append(result)
+            Database.get_pool().close_all()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update({result['name']: result for result in results})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n已保存 {len(results)} 个用例的基线: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\n没有基线文件，跳过回归比较（使用 --save-baseline 保存）")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        regressions = compare(results, json.load(f), args.latency_tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} 项回归:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\n与基线相比没有回归")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
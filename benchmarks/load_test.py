@@ -0,0 +1,143 @@
+"""并发请求扩展性压测
+
+对一个或多个已启动的服务（例如现有的 Flask 开发服务器和 gunicorn + uvicorn 的 ASGI
+部署）按递增的并发数循环请求同一组接口，输出每个并发级别的吞吐量（请求/秒）、延迟
+分位数，以及吞吐量相对最低并发级别的扩展倍数。每个并发连接对应一个线程并复用一条
+keep-alive 连接。压测客户端本身也受 GIL 限制，吞吐量很高时建议在另一台机器上运行。
+任一目标在某个并发级别的错误率（连接失败或 5xx）超过 --max-error-rate 时退出码为 1。
+
+准备（在项目根目录执行）:
+    python app.py                                                    # 现有服务器，https://localhost:5001
+    gunicorn -c gunicorn.conf.py -b 0.0.0.0:5002 asgi:application    # ASGI 部署
+
+用法:
+    python -m benchmarks.load_test --target flask=https://localhost:5001 --target asgi=http://localhost:5002 \\
+        --paths "/search_users?query=a" /get_user_list --concurrency 1 8 32 64 --duration 10
+需要登录的接口（/get_emotion_history、/dashboard）用 --cookie "session=..." 传入浏览器中的会话 Cookie。
+"""
+import argparse
+import http.client
+import json
+import ssl
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+import numpy as np
+
+
+def make_connection(url, timeout):
+    if url.scheme == 'https':
+        # 开发服务器使用自签名证书，压测时不校验
+        return http.client.HTTPSConnection(url.netloc, timeout=timeout, context=ssl._create_unverified_context())
+    return http.client.HTTPConnection(url.netloc, timeout=timeout)
+
+
+def run_client(url, paths, headers, deadline, timeout, results, lock):
+    """在 deadline 之前循环请求 paths，把延迟和错误数汇总到 results"""
+    conn = make_connection(url, timeout)
+    prefix = url.path.rstrip('/')
+    latencies, errors, i = [], 0, 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', prefix + path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = make_connection(url, timeout)
+    conn.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+
+
+def run_level(target, base_url, paths, headers, concurrency, duration, timeout):
+    """以 concurrency 个并发连接压测 duration 秒"""
+    url = urlsplit(base_url)
+    results = {'latencies': [], 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=run_client, args=(url, paths, headers, deadline, timeout, results, lock), daemon=True)
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(results['latencies'])
+    total = len(latencies) + results['errors']
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if len(latencies) else (np.nan,) * 3
+    return {
+        'target': target,
+        'concurrency': concurrency,
+        'requests': total,
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'errors': results['errors'],
+        'error_rate': results['errors'] / total if total else 1.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='被压测的服务，可重复指定')
+    parser.add_argument('--paths', nargs='+', default=['/search_users?query=a', '/get_user_list'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--duration', type=float, default=10, help='每个并发级别的压测时长（秒）')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求的超时（秒）')
+    parser.add_argument('--cookie', help='随请求发送的 Cookie，例如登录后的 session')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    args = parser.parse_args(argv)
+
+    targets = []
+    for item in args.target:
+        name, sep, url = item.partition('=')
+        if not sep:
+            parser.error(f'--target 格式应为 NAME=URL: {item}')
+        targets.append((name, url))
+    headers = {'Connection': 'keep-alive'}
+    if args.cookie:
+        headers['Cookie'] = args.cookie
+
+    results = []
+    failed = False
+    print(f"{'target':<10} {'conc':>5} {'req/s':>9} {'scale':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, url in targets:
+        # 预热：模型、连接池和缓存就绪后再计时
+        run_level(name, url, args.paths, headers, 1, 1, args.timeout)
+        baseline = None
+        for concurrency in sorted(args.concurrency):
+            result = run_level(name, url, args.paths, headers, concurrency, args.duration, args.timeout)
+            baseline = baseline or result['throughput'] or None
+            result['scale'] = result['throughput'] / baseline if baseline else 0.0
+            results.append(result)
+            print(f"{name:<10} {concurrency:>5} {result['throughput']:>9.1f} {result['scale']:>5.1f}x "
+                  f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+                  f"{result['errors']:>7}", flush=True)
+            failed |= result['error_rate'] > args.max_error_rate
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
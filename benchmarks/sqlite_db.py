@@ -0,0 +1,196 @@
+"""基准测试用的本地数据库替身
+
+用 SQLite 文件库模拟 Database 用到的 MySQL 连接接口（dictionary / prepared 游标、
+%s 占位符、ON DUPLICATE KEY UPDATE 等），让 Database 的查询不依赖 MySQL 服务器
+也能离线运行。只覆盖 Database 中热点查询用到的语法，绝对耗时与 MySQL 不可直接比较，
+用于观察随数据量增长的趋势和版本间的回归。
+
+    from benchmarks.sqlite_db import install
+    install('/tmp/bench.db')   # 之后 Database 的查询都落到 SQLite 上
+"""
+import os
+import random
+import re
+import sqlite3
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from utils.database import Database
+from utils.db_pool import ConnectionPool, PooledConnection
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username VARCHAR(255) NOT NULL,
+        face_encoding BLOB NOT NULL,
+        latest_emotion VARCHAR(50) NULL,
+        latest_emotion_at TIMESTAMP NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_users_latest_emotion ON users (latest_emotion_at, id);
+    CREATE TABLE IF NOT EXISTS emotions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INT NOT NULL,
+        emotion VARCHAR(50) NOT NULL,
+        probabilities TEXT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_emotions_user_created ON emotions (user_id, created_at);
+    CREATE TABLE IF NOT EXISTS emotion_daily_counts (
+        user_id INT NOT NULL,
+        day DATE NOT NULL,
+        emotion VARCHAR(50) NOT NULL,
+        count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day, emotion)
+    );
+'''
+
+# MySQL 语法 -> SQLite 语法
+REWRITES = [
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'DATE_SUB\(CURRENT_DATE,\s*INTERVAL \? DAY\)'), "date('now', '-' || ? || ' days')"),
+    (re.compile(r'ON DUPLICATE KEY UPDATE (\w+) = \1 \+ VALUES\(\1\)'),
+     r'ON CONFLICT DO UPDATE SET \1 = \1 + excluded.\1'),
+]
+
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()[:10]))
+
+
+def translate(sql):
+    for pattern, replacement in REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def _adapt(params):
+    # SQLite 按声明类型解析，时间统一以 ISO 字符串写入
+    return tuple(
+        value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value
+        for value in params
+    )
+
+
+class SQLiteCursor:
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(translate(sql), _adapt(params))
+
+    def executemany(self, sql, seq_params):
+        self._cursor.executemany(translate(sql), [_adapt(params) for params in seq_params])
+
+    def _row(self, row):
+        if not self._dictionary or row is None:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """mysql.connector 连接接口中 Database 与 ConnectionPool 用到的部分"""
+    unread_result = False
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def cursor(self, dictionary=False, prepared=False):
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def consume_results(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLitePool(ConnectionPool):
+    def _connect(self):
+        conn = PooledConnection(SQLiteConnection(self.connect_kwargs['path']))
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+
+def install(path, reset=True):
+    """让 Database 改用 path 处的 SQLite 库，reset=True 时先清空"""
+    if reset and os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.commit()
+    conn.close()
+    if Database._pool is not None:
+        Database._pool.close_all()
+    Database._pool = SQLitePool({'path': path})
+    return path
+
+
+def populate(path, users, emotions_per_user, days=90, emotions=None, encoding_blob=None, seed=0):
+    """直接写入合成数据：users 个用户，每人 emotions_per_user 条情绪记录及对应的每日汇总"""
+    rng = random.Random(seed)
+    emotions = emotions or ['开心', '伤心', '愤怒', '平静', '惊讶', '疲惫']
+    now = datetime.now().replace(microsecond=0)
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    start_id = (cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0]) + 1
+    for offset in range(0, users, 10000):
+        batch = range(start_id + offset, start_id + min(offset + 10000, users))
+        user_rows, emotion_rows, rollup = [], [], Counter()
+        for user_id in batch:
+            latest = None
+            for _ in range(emotions_per_user):
+                emotion = rng.choice(emotions)
+                created_at = now - timedelta(seconds=rng.randrange(days * 86400))
+                emotion_rows.append((user_id, emotion, created_at.strftime('%Y-%m-%d %H:%M:%S')))
+                rollup[(user_id, created_at.strftime('%Y-%m-%d'), emotion)] += 1
+                if latest is None or created_at > latest[1]:
+                    latest = (emotion, created_at)
+            user_rows.append((
+                user_id, f'user{user_id}', encoding_blob(rng) if encoding_blob else b'',
+                latest[0] if latest else None,
+                latest[1].strftime('%Y-%m-%d %H:%M:%S') if latest else None
+            ))
+        cursor.executemany(
+            'INSERT INTO users (id, username, face_encoding, latest_emotion, latest_emotion_at) VALUES (?, ?, ?, ?, ?)',
+            user_rows
+        )
+        cursor.executemany('INSERT INTO emotions (user_id, emotion, created_at) VALUES (?, ?, ?)', emotion_rows)
+        cursor.executemany(
+            'INSERT INTO emotion_daily_counts (user_id, day, emotion, count) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT DO UPDATE SET count = count + excluded.count',
+            [(user_id, day, emotion, count) for (user_id, day, emotion), count in rollup.items()]
+        )
+        conn.commit()
+    conn.close()
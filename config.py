@@ -11,7 +11,12 @@ class Config:
         'host': 'localhost',
         'user': 'root',
         'password': '1234',
-        'database': 'face_auth'
+        'database': 'face_auth',
+        # 连接池配置（以 pool_ 开头的键不会传给 mysql.connector.connect）
+        'pool_size': 10,
+        'pool_max_idle_time': 300,
+        'pool_health_check_interval': 30,
+        'pool_wait_timeout': 5
     }
     
     # 人脸识别配置
@@ -19,9 +24,80 @@ class Config:
         'min_quality_width': 200,
         'min_quality_height': 200,
         'face_distance_threshold': 0.4,
-        'login_tolerance': 0.6
+        'login_tolerance': 0.6,
+        # 人脸裁剪时四周扩展的比例（相对人脸框宽高）
+        'face_crop_padding': 0.2,
+        # 检测前把画面缩小到的最大宽度（像素），检测到的人脸框再按比例放大回原图，0 表示不缩放
+        'detection_max_width': 640,
+        # 计算编码和关键点时只传入人脸框四周扩展该比例后的区域
+        'roi_padding': 0.5,
+        # 人脸编码存储精度: 'float64' / 'float32' / 'float16'
+        'encoding_storage_dtype': 'float32',
+        # 人脸检索后端: 'brute_force' 精确检索, 'ivf' 倒排近似检索
+        'index_backend': 'brute_force',
+        # IVF 聚类数，一般取 sqrt(用户数) 的 1~4 倍
+        'ivf_nlist': 1024,
+        # 每次查询扫描的聚类数，越大召回率越高、延迟越大
+        'ivf_nprobe': 16,
+        # 用户数达到该值才训练 IVF，之前退化为精确检索
+        'ivf_min_train_size': 10000,
+        # k-means 训练采样数与迭代次数
+        'ivf_train_sample': 100000,
+        'ivf_kmeans_iters': 15,
+        # 进程内编码库的存储精度: 'float64' / 'float32' / 'float16' / 'int8'，
+        # 精度与内存的取舍见 python -m benchmarks.gallery_quantization
+        'gallery_dtype': 'float32',
+        # 编码库快照文件（python manage.py snapshot-gallery 生成），存在时以只读内存映射加载，
+        # 同一台机器上的多个 Web 进程共享一份物理内存，之后只从数据库同步快照之后的新用户；为空时不使用
+        'gallery_snapshot': '',
+        # 从数据库分批加载编码时每批的行数
+        'gallery_load_batch': 50000
     }
     
+    # 图像上传配置（通过 /upload_config 下发给客户端）
+    UPLOAD = {
+        # 客户端上传（含 WebSocket 活体检测帧）前把画面缩放到的最大宽度，0 表示不缩放
+        'client_max_width': 640,
+        'client_jpeg_quality': 0.85
+    }
+
+    # 眨眼活体检测配置
+    LIVENESS = {
+        # EAR 低于该值视为闭眼，之后高于 ear_open_threshold 视为重新睁眼
+        'ear_close_threshold': 0.22,
+        'ear_open_threshold': 0.25,
+        # 闭眼超过该时长（秒）不计为眨眼
+        'max_closed_seconds': 0.6,
+        # 跟踪时在上一帧人脸框四周扩展的比例
+        'track_margin': 0.5,
+        # 需要的眨眼次数
+        'required_blinks': 2
+    }
+
+    # 会话级人脸跟踪配置（登录与情绪记录的连续帧）
+    TRACKING = {
+        'enabled': True,
+        # 在上一帧人脸框四周扩展该比例的区域内检测
+        'search_margin': 0.5,
+        # 超过该时长（秒）没有看到人脸视为跟踪丢失
+        'max_gap': 2.0,
+        # 即使一直跟踪成功，也每隔该时长（秒）做一次整帧检测
+        'full_detect_interval': 5.0,
+        # 缓存的身份识别结果的有效期（秒），过期后重新计算编码并检索
+        'reverify_interval': 3.0,
+        # 同时保留的会话数及闲置过期时间（秒）
+        'max_sessions': 10000,
+        'session_ttl': 600
+    }
+
+    # 多人脸模式配置（/analyze_faces：一帧中识别并分析所有人脸）
+    MULTI_FACE = {
+        # 单帧最多处理的人脸数，超出时只保留面积最大的几张
+        'max_faces': 10,
+        # 为识别出的用户记录情绪
+        'record_emotions': True
+    }
+
     # 情绪检测配置
     EMOTION_DETECTION = {
         'std_threshold': 45,
@@ -29,6 +105,105 @@ class Config:
         'brightness_threshold': 130
     }
 
+    # 模型预加载配置
+    MODEL_PRELOAD = {
+        # 'eager' 启动时阻塞加载; 'background' 后台加载; 'lazy' 首次使用时加载
+        'mode': 'background',
+        # 加载后在合成图像上跑一次推理预热
+        'warmup': True
+    }
+
+    # 推理进程池配置：启用后 dlib / DeepFace 推理在独立进程中执行
+    INFERENCE = {
+        'enabled': False,
+        'workers': 2,
+        # 同时排队和执行的任务上限，超出时直接返回繁忙
+        'max_pending': 16,
+        # 单个任务的最长等待时间（秒）
+        'timeout': 10
+    }
+
+    # ASGI 部署配置（asgi.py 与 gunicorn.conf.py 读取）
+    SERVER = {
+        'bind': '0.0.0.0:5001',
+        # Web 进程数，每个进程各自加载模型和连接池，内存占用随进程数增加；
+        # 可用环境变量 WEB_CONCURRENCY 覆盖。RESPONSE_CACHE 为进程内后端时只启动 1 个进程
+        'workers': 2,
+        # 每个进程中执行 Flask 同步路由（识别、注册、情绪记录等）的线程数
+        'wsgi_threads': 16,
+        'timeout': 60,
+        'keepalive': 5,
+        # 处理该数量的请求后重启进程，0 表示不重启
+        'max_requests': 0,
+        # HTTPS 证书与私钥路径，为空时使用 HTTP
+        'certfile': '',
+        'keyfile': ''
+    }
+
+    # 情绪记录异步批量写入配置
+    EMOTION_WRITER = {
+        'enabled': False,
+        # 攒够多少条或等待多少秒后批量写入
+        'batch_size': 200,
+        'flush_interval': 1.0,
+        # 队列上限及队列满时 submit 的最长等待时间（秒）
+        'max_queue_size': 10000,
+        'put_timeout': 0.5
+    }
+
+    # 情绪推理微批处理配置：合并并发请求的人脸区域一次推理
+    # 与 INFERENCE 互斥：启用推理进程池时情绪在工作进程中逐个分析，微批处理不生效
+    EMOTION_BATCHING = {
+        'enabled': False,
+        # 单批最多多少张人脸，以及第一张到达后最多等待多少毫秒
+        'max_batch_size': 16,
+        'max_wait_ms': 5,
+        # 调用方等待结果的超时（秒）
+        'timeout': 10
+    }
+
+    # 耗时统计配置
+    METRICS = {
+        # 记录各阶段耗时并在 /metrics 中输出
+        'enabled': True,
+        # 在 Server-Timing 响应头中返回本次请求各阶段的耗时（浏览器开发者工具可直接查看）
+        'server_timing': False
+    }
+
+    # 仪表板配置
+    DASHBOARD = {
+        # 用户列表与搜索结果的默认每页条数及上限
+        'user_list_page_size': 50,
+        'user_list_max_page_size': 200,
+        # 情绪历史最长可查询天数；超过对应天数时图表改为按周、按月聚合
+        'history_max_days': 730,
+        'history_week_after_days': 90,
+        'history_month_after_days': 365
+    }
+
+    # 读接口结果缓存配置
+    RESPONSE_CACHE = {
+        'enabled': True,
+        # 'local' 为进程内 LRU，看不到其他进程（含 manage.py 命令）的写入；
+        # 多个 Web 进程部署或需要命令行写入立即生效时使用 'redis' 共享缓存和失效版本号
+        'backend': 'local',
+        'redis_url': 'redis://localhost:6379/0',
+        'max_entries': 1024,
+        # 条目过期时间（秒），写入时会按标签主动失效
+        'ttl': 300
+    }
+
+    # 用户名搜索配置
+    USER_SEARCH = {
+        # 同步其他进程写入的新用户和最新情绪的间隔（秒）
+        'refresh_interval': 5,
+        # 增量同步最新情绪时回看的秒数，需大于 EMOTION_WRITER['flush_interval'] 与各进程间的时钟偏差
+        'emotion_lookback': 60,
+        # 查询结果缓存条数与过期时间（秒）
+        'cache_size': 256,
+        'cache_ttl': 30
+    }
+
     # 情绪映射配置
     EMOTION_MAP = {
         'happy': '开心',
@@ -0,0 +1,61 @@
+"""gunicorn 部署配置（ASGI，多进程）
+
+用法（在项目根目录执行）:
+    gunicorn -c gunicorn.conf.py asgi:application
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py asgi:application
+
+参数取自 Config.SERVER。每个 worker 是独立的 uvicorn 事件循环进程，各自加载模型、
+人脸编码库和数据库连接池，因此不在 master 中预加载应用（preload_app = False）。
+进程内结果缓存（Config.RESPONSE_CACHE['backend'] == 'local'）的失效只作用于本进程，
+此时只启动 1 个 worker，显式要求多个 worker 时拒绝启动；多进程部署请改用 redis 后端。
+建表和迁移在 master 启动时执行一次（on_starting），worker 只加载数据。
+"""
+import os
+from config import Config
+
+
+def worker_count():
+    """worker 数：WEB_CONCURRENCY 优先，其次 Config.SERVER['workers']，进程内缓存时限制为 1"""
+    cache = Config.RESPONSE_CACHE
+    local_cache = cache['enabled'] and cache['backend'] == 'local'
+    if 'WEB_CONCURRENCY' in os.environ:
+        count = int(os.environ['WEB_CONCURRENCY'])
+        if count > 1 and local_cache:
+            raise RuntimeError(
+                f'WEB_CONCURRENCY={count} 需要共享的结果缓存：请把 Config.RESPONSE_CACHE 的 backend 改为 redis，'
+                f'否则各进程只失效自己的缓存，会在 {cache["ttl"]} 秒内返回旧数据'
+            )
+        return count
+    if local_cache and Config.SERVER['workers'] > 1:
+        print(f"警告: 结果缓存为进程内后端，只启动 1 个 worker（配置为 {Config.SERVER['workers']}）；"
+              f"多进程部署请把 Config.RESPONSE_CACHE 的 backend 改为 redis")
+        return 1
+    return Config.SERVER['workers']
+
+
+bind = os.environ.get('BIND', Config.SERVER['bind'])
+workers = worker_count()
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+timeout = Config.SERVER['timeout']
+graceful_timeout = Config.SERVER['timeout']
+keepalive = Config.SERVER['keepalive']
+max_requests = Config.SERVER['max_requests']
+max_requests_jitter = max_requests // 10
+
+preload_app = False
+
+if Config.SERVER['certfile']:
+    certfile = Config.SERVER['certfile']
+    keyfile = Config.SERVER['keyfile']
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """在 master 中执行一次建表和迁移，各 worker 启动时不再执行"""
+    from utils.database import Database
+    Database.init_tables()
+    # 不把 master 中的数据库连接带进 fork 出的 worker
+    Database.close_pool()
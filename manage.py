@@ -0,0 +1,175 @@
+"""命令行管理工具
+
+用法:
+    python manage.py init-db
+    python manage.py migrate-encodings [--dtype float32] [--batch-size 1000] [--reencode]
+    python manage.py backfill-rollup [--batch-size 1000]
+    python manage.py backfill-latest-emotion [--batch-size 1000]
+    python manage.py replay session.mp4 [--sample-fps 2] [--user-id 1] [--start-time "2024-05-01 09:00:00"] [--dry-run]
+    python manage.py enroll photos/ [--workers 4] [--batch-size 256] [--checkpoint enroll.json] [--name-from file|dir] [--reencode]
+    python manage.py snapshot-gallery gallery.snap [--dtype float16]
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from config import Config
+from utils.database import Database
+
+
+def warn_local_cache():
+    """进程内缓存后端下，提示正在运行的 Web 服务看不到本命令的写入"""
+    cache = Config.RESPONSE_CACHE
+    if cache['enabled'] and cache['backend'] == 'local':
+        print(f"提示: RESPONSE_CACHE 为进程内后端，本命令的缓存失效只在当前进程生效，"
+              f"正在运行的 Web 服务最长 {cache['ttl']} 秒内仍可能返回旧的用户列表和情绪历史；"
+              f"需要立即生效时请重启 Web 服务，或改用 redis 后端")
+
+
+def init_db(args):
+    """初始化数据库表"""
+    Database.init_tables()
+    print("数据库表初始化完成")
+
+
+def migrate_encodings(args):
+    """把人脸编码迁移为二进制格式"""
+    converted = Database.migrate_face_encodings(
+        dtype=args.dtype,
+        batch_size=args.batch_size,
+        reencode=args.reencode
+    )
+    print(f"迁移完成，共转换 {converted} 条记录")
+
+
+def backfill_rollup(args):
+    """根据原始情绪记录重建按天汇总表"""
+    warn_local_cache()
+    processed = Database.backfill_emotion_rollup(batch_size=args.batch_size)
+    print(f"重建完成，共处理 {processed} 个用户")
+
+
+def backfill_latest_emotion(args):
+    """根据原始情绪记录重建用户最新情绪"""
+    warn_local_cache()
+    processed = Database.backfill_latest_emotions(batch_size=args.batch_size)
+    print(f"更新完成，共处理 {processed} 个用户")
+
+
+def enroll(args):
+    """从照片目录或压缩包批量注册用户"""
+    warn_local_cache()
+    from utils.enrollment import BulkEnroller
+    enroller = BulkEnroller(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint=args.checkpoint,
+        reencode=args.reencode
+    )
+    stats = enroller.run(args.path, name_from=args.name_from)
+    print(f"注册完成: 新用户 {stats['enrolled']}, 重新编码 {stats['reencoded']}, "
+          f"重复 {stats['duplicate']}, 失败 {stats['failed']}")
+    if stats['reencoded']:
+        print("已更新已有用户的人脸编码，请重启应用以重新加载人脸库")
+
+
+def replay(args):
+    """离线回放录像，按帧分析情绪并批量写入情绪记录"""
+    from utils.replay import FrameSampler, FrameSource, ReplayPipeline
+    source = FrameSource(args.path, fps=args.fps)
+    if args.start_time:
+        start_time = datetime.strptime(args.start_time, '%Y-%m-%d %H:%M:%S')
+    else:
+        start_time = datetime.fromtimestamp(os.path.getmtime(args.path))
+    pipeline = ReplayPipeline(
+        source,
+        FrameSampler(every=args.every, sample_fps=args.sample_fps, motion_threshold=args.motion_threshold),
+        start_time,
+        user_id=args.user_id,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run
+    )
+    if not args.dry_run:
+        warn_local_cache()
+    print(f"开始回放: {args.path}（{source.frame_count} 帧, {source.fps:.1f} fps, 起始时间 {start_time}）")
+    stats = pipeline.run()
+    print(f"回放完成: 耗时 {stats['elapsed']:.1f} 秒, 解码 {stats['decoded']} 帧, 分析 {stats['analyzed']} 帧 "
+          f"({stats['fps']:.1f} 帧/秒), 无人脸 {stats['no_face']} 帧, "
+          f"{'模拟' if args.dry_run else '写入'}情绪记录 {stats['records']} 条")
+
+
+def snapshot_gallery(args):
+    """从数据库加载全部人脸编码，写入可内存映射的编码库快照"""
+    from utils.face_gallery import FaceGallery
+    Config.FACE_RECOGNITION['gallery_dtype'] = args.dtype
+    Config.FACE_RECOGNITION['gallery_snapshot'] = ''
+    FaceGallery.load()
+    FaceGallery.save_snapshot(args.output)
+    usage = FaceGallery.memory_usage()
+    print(f"快照已写入: {args.output}（{usage['users']} 个用户, {usage['dtype']}, "
+          f"{os.path.getsize(args.output) / 2 ** 20:.1f} MB）")
+    print("在 Config.FACE_RECOGNITION['gallery_snapshot'] 中配置该路径后重启应用生效")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='人脸识别情绪分析系统管理工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_init = subparsers.add_parser('init-db', help='初始化数据库表')
+    parser_init.set_defaults(func=init_db)
+
+    parser_migrate = subparsers.add_parser('migrate-encodings', help='把 base64 人脸编码迁移为二进制 BLOB')
+    parser_migrate.add_argument('--dtype', default=Config.FACE_RECOGNITION['encoding_storage_dtype'],
+                                choices=['float64', 'float32', 'float16'], help='存储精度')
+    parser_migrate.add_argument('--batch-size', type=int, default=1000, help='每批处理的记录数')
+    parser_migrate.add_argument('--reencode', action='store_true', help='已是二进制的记录也按 --dtype 重新编码')
+    parser_migrate.set_defaults(func=migrate_encodings)
+
+    parser_rollup = subparsers.add_parser('backfill-rollup', help='根据 emotions 重建 emotion_daily_counts')
+    parser_rollup.add_argument('--batch-size', type=int, default=1000, help='每批处理的用户数')
+    parser_rollup.set_defaults(func=backfill_rollup)
+
+    parser_latest = subparsers.add_parser('backfill-latest-emotion', help='根据 emotions 重建 users 的最新情绪列')
+    parser_latest.add_argument('--batch-size', type=int, default=1000, help='每批处理的用户数')
+    parser_latest.set_defaults(func=backfill_latest_emotion)
+
+    parser_enroll = subparsers.add_parser('enroll', help='从照片目录或 zip / tar 压缩包批量注册用户')
+    parser_enroll.add_argument('path', help='照片目录或压缩包')
+    parser_enroll.add_argument('--workers', type=int, default=None, help='编码进程数，默认为 CPU 核数')
+    parser_enroll.add_argument('--batch-size', type=int, default=256, help='每批去重和写库的照片数')
+    parser_enroll.add_argument('--checkpoint', help='检查点文件，中断后用同一文件重新运行可继续')
+    parser_enroll.add_argument('--name-from', choices=['file', 'dir'], default='file',
+                               help='用户名取自文件名或所在目录名')
+    parser_enroll.add_argument('--reencode', action='store_true', help='用户名已存在时替换其人脸编码而不是新建用户')
+    parser_enroll.set_defaults(func=enroll)
+
+    parser_replay = subparsers.add_parser('replay', help='离线回放视频或图片序列，补录情绪记录')
+    parser_replay.add_argument('path', help='视频文件或图片序列目录')
+    parser_replay.add_argument('--user-id', type=int, help='录像中只有该用户，不做身份识别')
+    parser_replay.add_argument('--start-time', help='录像开始时间（%%Y-%%m-%%d %%H:%%M:%%S），默认取文件修改时间')
+    parser_replay.add_argument('--every', type=int, default=1, help='每 N 帧取一帧')
+    parser_replay.add_argument('--sample-fps', type=float, help='每秒最多分析的帧数')
+    parser_replay.add_argument('--motion-threshold', type=float, help='与上一张取样帧的灰度平均差低于该值时跳过')
+    parser_replay.add_argument('--fps', type=float, help='图片序列的帧率，视频默认读取文件中的帧率')
+    parser_replay.add_argument('--workers', type=int, default=2, help='推理线程数')
+    parser_replay.add_argument('--queue-size', type=int, default=32, help='阶段之间队列的长度')
+    parser_replay.add_argument('--batch-size', type=int, default=500, help='每批写入的情绪记录数')
+    parser_replay.add_argument('--dry-run', action='store_true', help='只分析并统计吞吐，不写数据库')
+    parser_replay.set_defaults(func=replay)
+
+    parser_snapshot = subparsers.add_parser('snapshot-gallery', help='生成可被多个进程内存映射共享的人脸编码库快照')
+    parser_snapshot.add_argument('output', help='快照文件路径')
+    parser_snapshot.add_argument('--dtype', default=Config.FACE_RECOGNITION['gallery_dtype'],
+                                 choices=['float64', 'float32', 'float16', 'int8'], help='快照中编码的存储精度')
+    parser_snapshot.set_defaults(func=snapshot_gallery)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
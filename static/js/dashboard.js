@@ -8,7 +8,11 @@ class DashboardManager {
         this.timeRange = document.getElementById('timeRange');
         this.chartType = document.getElementById('chartType');
         this.logoutBtn = document.getElementById('logoutBtn');
+        this.loadMoreUsersBtn = document.getElementById('loadMoreUsersBtn');
         this.emotionChart = null;
+        // 用户列表分页：下一页的游标（来自 X-Next-Cursor 响应头），为 null 时没有更多
+        this.userListCursor = null;
+        this.userListRequest = 0;
 
         // 情绪颜色映射
         this.emotionColors = {
@@ -52,6 +56,11 @@ class DashboardManager {
             });
         }
         
+        // 加载更多用户
+        if (this.loadMoreUsersBtn) {
+            this.loadMoreUsersBtn.addEventListener('click', () => this.updateUserList(true));
+        }
+
         // 搜索事件监听
         if (this.userSearch) {
             this.userSearch.addEventListener('input', this.debounce((e) => {
@@ -109,26 +118,17 @@ class DashboardManager {
             // 显示加载提示
             this.showLoading('正在分析情绪，请稍候');
 
-            // 捕获图像
-            const canvas = document.createElement('canvas');
-            canvas.width = this.video.videoWidth;
-            canvas.height = this.video.videoHeight;
-            const context = canvas.getContext('2d');
-            context.drawImage(this.video, 0, 0, canvas.width, canvas.height);
+            // 捕获图像，按服务端下发的参数缩放
+            const config = await FrameUploader.getConfig();
+            const canvas = FrameUploader.capture(this.video, config);
             
             // 确保图像质量
             if (canvas.width < 200 || canvas.height < 200) {
                 throw new Error('图像分辨率过低，请调整摄像头位置');
             }
             
-            const imageData = canvas.toDataURL('image/jpeg');
-            
-            // 发送请求
-            const response = await fetch('/record_emotion', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ image: imageData })
-            });
+            // 发送请求：支持时以 multipart 二进制上传，否则回退到 base64 JSON
+            const response = await FrameUploader.post('/record_emotion', canvas, config);
             
             const result = await response.json();
             Swal.close();
@@ -169,10 +169,18 @@ class DashboardManager {
 
     // 搜索用户
     async searchUsers(query) {
+        if (!query.trim()) {
+            // 清空搜索框时恢复可分页的完整列表
+            this.updateUserList();
+            return;
+        }
         try {
             const response = await fetch(`/search_users?query=${encodeURIComponent(query)}`);
             const data = await response.json();
             if (data.status === 'success' && data.data && data.data.users) {
+                // 搜索结果不分页
+                this.userListRequest++;
+                this.setUserListCursor(null);
                 this.updateUsersTable(data.data.users);
             } else {
                 this.showAlert('搜索失败', data.message || '未知错误', 'error');
@@ -183,12 +191,14 @@ class DashboardManager {
         }
     }
 
-    // 更新用户表格
-    updateUsersTable(users) {
+    // 更新用户表格，append 为 true 时追加到已有行之后
+    updateUsersTable(users, append = false) {
         const tbody = document.getElementById('user-list');
         if (!tbody) return;
         
-        tbody.innerHTML = '';
+        if (!append) {
+            tbody.innerHTML = '';
+        }
         if (users && users.length > 0) {
             users.forEach(user => {
                 const tr = document.createElement('tr');
@@ -208,7 +218,7 @@ class DashboardManager {
                 `;
                 tbody.appendChild(tr);
             });
-        } else {
+        } else if (!append) {
             const tr = document.createElement('tr');
             tr.innerHTML = '<td colspan="3" class="text-center">暂无数据</td>';
             tbody.appendChild(tr);
@@ -348,14 +358,29 @@ class DashboardManager {
         });
     }
 
-    // 更新用户列表
-    async updateUserList() {
+    setUserListCursor(cursor) {
+        this.userListCursor = cursor;
+        if (this.loadMoreUsersBtn) {
+            this.loadMoreUsersBtn.style.display = cursor ? 'block' : 'none';
+        }
+    }
+
+    // 更新用户列表，loadMore 为 true 时按 X-Next-Cursor 加载下一页
+    async updateUserList(loadMore = false) {
+        if (loadMore && !this.userListCursor) return;
+        // 较早发出的请求晚返回时丢弃，避免与刷新或搜索结果混在一起
+        const request = ++this.userListRequest;
         try {
-            const response = await fetch('/get_user_list');
+            const url = loadMore
+                ? `/get_user_list?cursor=${encodeURIComponent(this.userListCursor)}`
+                : '/get_user_list';
+            const response = await fetch(url);
             const data = await response.json();
+            if (request !== this.userListRequest) return;
             
             if (data.status === 'success' && data.data) {
-                this.updateUsersTable(data.data);
+                this.updateUsersTable(data.data, loadMore);
+                this.setUserListCursor(response.headers.get('X-Next-Cursor'));
             } else {
                 this.showAlert('获取用户列表失败', data.message || '未知错误', 'error');
             }
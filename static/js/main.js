@@ -73,6 +73,12 @@ class FaceAuth {
         }
     }
 
+    // 截取当前画面并按服务端下发的参数上传
+    async postFrame(url, fields = {}) {
+        const config = await FrameUploader.getConfig();
+        return FrameUploader.post(url, FrameUploader.capture(this.video, config), config, fields);
+    }
+
     detectFace() {
         if (!this.video || !this.video.videoWidth) {
             alert('请确保摄像头已开启');
@@ -80,7 +86,92 @@ class FaceAuth {
         }
 
         this.blinkText.textContent = '请眨眼...';
-        this.detectBlink();
+        this.detectBlinkStream();
+    }
+
+    // 通过 WebSocket 持续发送二进制帧，由服务端维护眨眼状态；不支持时回退到轮询
+    async detectBlinkStream() {
+        if (!window.WebSocket) {
+            this.detectBlink();
+            return;
+        }
+
+        const config = await FrameUploader.getConfig();
+
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(`${protocol}//${window.location.host}/ws/liveness`);
+        socket.binaryType = 'arraybuffer';
+
+        const startTime = Date.now();
+        const timeoutMs = 15000;
+        let opened = false;
+        let finished = false;
+
+        const finish = () => {
+            finished = true;
+            socket.close();
+        };
+
+        // 收到上一帧的结果后再发送下一帧，保证同一时间只有一帧在途
+        const sendFrame = () => {
+            if (finished || socket.readyState !== WebSocket.OPEN) return;
+            if (Date.now() - startTime > timeoutMs) {
+                this.blinkText.textContent = '未检测到眨眼，请重试';
+                this.blinkCount = 0;
+                finish();
+                return;
+            }
+            // 与 HTTP 上传使用同一缩放尺寸和 JPEG 质量
+            const canvas = FrameUploader.capture(this.video, config);
+            canvas.toBlob(blob => {
+                if (blob && !finished && socket.readyState === WebSocket.OPEN) {
+                    socket.send(blob);
+                }
+            }, 'image/jpeg', config.jpeg_quality);
+        };
+
+        socket.onopen = () => {
+            opened = true;
+            sendFrame();
+        };
+
+        socket.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.status === 'success') {
+                if (!data.face) {
+                    this.blinkText.textContent = '未检测到人脸';
+                } else if (data.blink) {
+                    this.blinkCount = data.blinks;
+                    this.blinkText.textContent = `检测到眨眼 ${this.blinkCount} 次`;
+                }
+                if (data.passed) {
+                    finish();
+                    this.checkFace();
+                    return;
+                }
+            } else if (data.busy) {
+                // 推理服务繁忙，稍后再发送下一帧
+                this.blinkText.textContent = '服务繁忙，请稍候...';
+                setTimeout(sendFrame, 500);
+                return;
+            }
+            sendFrame();
+        };
+
+        socket.onerror = () => {
+            // 连接未建立（例如服务端未启用 WebSocket）时回退到轮询
+            if (!opened && !finished) {
+                finished = true;
+                this.detectBlink();
+            }
+        };
+
+        socket.onclose = () => {
+            if (opened && !finished) {
+                this.blinkText.textContent = '检测连接已断开，请重试';
+                this.blinkCount = 0;
+            }
+        };
     }
 
     detectBlink() {
@@ -90,24 +181,7 @@ class FaceAuth {
             return;
         }
 
-        const canvas = document.createElement('canvas');
-        canvas.width = this.video.videoWidth;
-        canvas.height = this.video.videoHeight;
-        
-        const context = canvas.getContext('2d');
-        context.drawImage(this.video, 0, 0, canvas.width, canvas.height);
-        
-        const imageData = canvas.toDataURL('image/jpeg');
-
-        fetch('/detect_action', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                image: imageData
-            })
-        })
+        this.postFrame('/detect_action')
         .then(response => response.json())
         .then(data => {
             if (data.status === 'success') {
@@ -132,26 +206,9 @@ class FaceAuth {
     }
 
     checkFace() {
-        const canvas = document.createElement('canvas');
-        canvas.width = this.video.videoWidth;
-        canvas.height = this.video.videoHeight;
-        
-        const context = canvas.getContext('2d');
-        context.drawImage(this.video, 0, 0, canvas.width, canvas.height);
-        
-        const imageData = canvas.toDataURL('image/jpeg');
-
         this.blinkText.textContent = '正在验证...';
 
-        fetch('/check_face', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                image: imageData
-            })
-        })
+        this.postFrame('/check_face')
         .then(response => response.json())
         .then(data => {
             if (data.status === 'success' && data.data && data.data.exists) {
@@ -182,27 +239,9 @@ class FaceAuth {
             return;
         }
 
-        const canvas = document.createElement('canvas');
-        canvas.width = this.video.videoWidth;
-        canvas.height = this.video.videoHeight;
-        
-        const context = canvas.getContext('2d');
-        context.drawImage(this.video, 0, 0, canvas.width, canvas.height);
-        
-        const imageData = canvas.toDataURL('image/jpeg');
-
         this.blinkText.textContent = '正在注册...';
 
-        fetch('/register', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                image: imageData,
-                username: this.username.value.trim()
-            })
-        })
+        this.postFrame('/register', { username: this.username.value.trim() })
         .then(response => response.json())
         .then(data => {
             if (data.status === 'success') {
@@ -242,24 +281,7 @@ class FaceAuth {
             }
         });
 
-        const canvas = document.createElement('canvas');
-        canvas.width = this.video.videoWidth;
-        canvas.height = this.video.videoHeight;
-        
-        const context = canvas.getContext('2d');
-        context.drawImage(this.video, 0, 0, canvas.width, canvas.height);
-        
-        const imageData = canvas.toDataURL('image/jpeg');
-
-        fetch('/record_emotion', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                image: imageData
-            })
-        })
+        this.postFrame('/record_emotion')
         .then(response => response.json())
         .then(data => {
             Swal.close();
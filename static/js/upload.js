@@ -0,0 +1,48 @@
+// 摄像头画面上传：登录页（main.js）与控制面板（dashboard.js）共用
+class FrameUploader {
+    // 获取服务端下发的上传参数（是否支持二进制上传、建议缩放尺寸），同一页面只请求一次
+    static getConfig() {
+        if (!FrameUploader.config) {
+            FrameUploader.config = fetch('/upload_config')
+                .then(response => response.json())
+                .then(data => data.status === 'success' && data.data ? data.data : { binary: false })
+                .catch(() => ({ binary: false }));
+        }
+        return FrameUploader.config;
+    }
+
+    // 截取当前画面，按 max_width 等比缩小（0 或未下发时不缩放）
+    static capture(video, config) {
+        const scale = config.max_width ? Math.min(1, config.max_width / video.videoWidth) : 1;
+        const canvas = document.createElement('canvas');
+        canvas.width = Math.round(video.videoWidth * scale);
+        canvas.height = Math.round(video.videoHeight * scale);
+        canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
+        return canvas;
+    }
+
+    // 上传画面：支持时以 multipart 二进制上传，否则回退到 base64 JSON
+    static async post(url, canvas, config, fields = {}) {
+        if (!config.binary) {
+            return fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    image: canvas.toDataURL('image/jpeg'),
+                    ...fields
+                })
+            });
+        }
+
+        const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', config.jpeg_quality));
+        const form = new FormData();
+        form.append('image', blob, 'frame.jpg');
+        Object.entries(fields).forEach(([key, value]) => form.append(key, value));
+        return fetch(url, {
+            method: 'POST',
+            body: form
+        });
+    }
+}
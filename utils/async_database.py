@@ -0,0 +1,101 @@
+import asyncio
+from config import Config
+from utils.database import Database
+from utils.metrics import Metrics
+
+class AsyncDatabase:
+    """基于 aiomysql 的异步只读查询，供 asgi.py 中的 I/O 密集接口使用
+
+    等待数据库时不占用线程，单个进程即可同时处理大量并发的读请求。
+    SQL 与结果整理和同步的 Database 共用，写操作仍由 Database 完成。
+    连接池在首次查询时创建，每个 Web 进程各自一份。
+
+    aiomysql 为可选依赖，只有使用 ASGI 部署时才需要安装。
+    """
+    _pool = None
+    _pool_lock = None
+
+    @classmethod
+    async def get_pool(cls):
+        if cls._pool is None:
+            try:
+                import aiomysql
+            except ImportError:
+                raise RuntimeError('使用异步数据库需要先安装 aiomysql: pip install aiomysql')
+            if cls._pool_lock is None:
+                cls._pool_lock = asyncio.Lock()
+            async with cls._pool_lock:
+                if cls._pool is None:
+                    config = Config.DB_CONFIG
+                    cls._pool = await aiomysql.create_pool(
+                        host=config['host'],
+                        port=config.get('port', 3306),
+                        user=config['user'],
+                        password=config['password'],
+                        db=config['database'],
+                        minsize=1,
+                        maxsize=config.get('pool_size', 10),
+                        pool_recycle=config.get('pool_max_idle_time', 300),
+                        autocommit=True,
+                        charset='utf8mb4'
+                    )
+        return cls._pool
+
+    @classmethod
+    async def close(cls):
+        """关闭连接池"""
+        if cls._pool is not None:
+            cls._pool.close()
+            await cls._pool.wait_closed()
+            cls._pool = None
+
+    @classmethod
+    async def _fetchall(cls, conn, sql, params, dictionary=True):
+        import aiomysql
+        async with conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor) as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+
+    @classmethod
+    async def get_username(cls, user_id):
+        """根据用户 id 获取用户名，不存在时返回 None"""
+        with Metrics.timer('db.get_username'):
+            pool = await cls.get_pool()
+            async with pool.acquire() as conn:
+                rows = await cls._fetchall(conn, 'SELECT username FROM users WHERE id = %s', (user_id,), False)
+        return rows[0][0] if rows else None
+
+    @classmethod
+    async def get_user_list(cls, limit=50, cursor_token=None):
+        """与 Database.get_user_list 相同的键集分页，返回 (users, next_cursor)"""
+        after_time, after_id = Database._parse_cursor(cursor_token)
+        users = []
+        with Metrics.timer('db.get_user_list'):
+            pool = await cls.get_pool()
+            async with pool.acquire() as conn:
+                if after_time is not None or after_id is None:
+                    if after_time is None:
+                        users = await cls._fetchall(conn, Database.USER_LIST_RECENT_SQL, (limit,))
+                    else:
+                        users = await cls._fetchall(
+                            conn, Database.USER_LIST_RECENT_AFTER_SQL, (after_time, after_id, limit)
+                        )
+                    users = list(users)
+                    after_id = None
+
+                if len(users) < limit:
+                    # 有情绪记录的用户已取完，继续取没有记录的用户
+                    users += await cls._fetchall(
+                        conn, Database.USER_LIST_NO_EMOTION_SQL,
+                        (after_id if after_id is not None else 2 ** 31, limit - len(users))
+                    )
+        return Database._user_list_page(users, limit)
+
+    @classmethod
+    async def get_emotion_history(cls, user_id, days):
+        """与 Database.get_emotion_history 相同，返回 (每日计数, 统计信息)"""
+        with Metrics.timer('db.get_emotion_history'):
+            pool = await cls.get_pool()
+            async with pool.acquire() as conn:
+                records = await cls._fetchall(conn, Database.EMOTION_HISTORY_SQL, (user_id, days))
+        return records, Database._history_stats(records)
@@ -1,17 +1,106 @@
+import json
+import threading
+from collections import Counter
 import mysql.connector
 from contextlib import contextmanager
 from config import Config
+from utils.db_pool import ConnectionPool
+from utils.encoding_codec import FaceEncodingCodec
+from utils.response_cache import ResponseCache
+from utils.metrics import Metrics
 
 class Database:
+    # 情绪按天汇总表的累加语句，参数为 (user_id, created_at 或日期, emotion, 条数)
+    ROLLUP_UPSERT_SQL = '''
+        INSERT INTO emotion_daily_counts (user_id, day, emotion, count)
+        VALUES (%s, DATE(%s), %s, %s)
+        ON DUPLICATE KEY UPDATE count = count + VALUES(count)
+    '''
+    # 更新用户最新情绪，只接受不早于当前值的记录，参数为 (emotion, created_at, user_id, created_at)
+    LATEST_EMOTION_SQL = '''
+        UPDATE users SET latest_emotion = %s, latest_emotion_at = %s
+        WHERE id = %s AND (latest_emotion_at IS NULL OR latest_emotion_at <= %s)
+    '''
+
+    # 用户列表分页查询，同步与异步实现共用（见 utils/async_database.py）
+    USER_LIST_RECENT_SQL = '''
+        SELECT id, username, latest_emotion, latest_emotion_at FROM users
+        WHERE latest_emotion_at IS NOT NULL
+        ORDER BY latest_emotion_at DESC, id DESC
+        LIMIT %s
+    '''
+    USER_LIST_RECENT_AFTER_SQL = '''
+        SELECT id, username, latest_emotion, latest_emotion_at FROM users
+        WHERE latest_emotion_at IS NOT NULL
+        AND (latest_emotion_at, id) < (%s, %s)
+        ORDER BY latest_emotion_at DESC, id DESC
+        LIMIT %s
+    '''
+    USER_LIST_NO_EMOTION_SQL = '''
+        SELECT id, username, latest_emotion, latest_emotion_at FROM users
+        WHERE latest_emotion_at IS NULL AND id < %s
+        ORDER BY id DESC
+        LIMIT %s
+    '''
+    EMOTION_HISTORY_SQL = '''
+        SELECT day as date, emotion, count
+        FROM emotion_daily_counts
+        WHERE user_id = %s
+        AND day >= DATE_SUB(CURRENT_DATE, INTERVAL %s DAY)
+        ORDER BY day
+    '''
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def get_pool():
+        """获取进程内共享的连接池"""
+        if Database._pool is None:
+            with Database._pool_lock:
+                if Database._pool is None:
+                    connect_kwargs = {
+                        k: v for k, v in Config.DB_CONFIG.items() if not k.startswith('pool_')
+                    }
+                    Database._pool = ConnectionPool(
+                        connect_kwargs,
+                        size=Config.DB_CONFIG.get('pool_size', 10),
+                        max_idle_time=Config.DB_CONFIG.get('pool_max_idle_time', 300),
+                        health_check_interval=Config.DB_CONFIG.get('pool_health_check_interval', 30),
+                        wait_timeout=Config.DB_CONFIG.get('pool_wait_timeout', 5)
+                    )
+        return Database._pool
+
+    @staticmethod
+    def close_pool():
+        """关闭并丢弃连接池，之后的查询会重新创建（用于 fork 子进程之前）"""
+        with Database._pool_lock:
+            if Database._pool is not None:
+                Database._pool.close_all()
+                Database._pool = None
+
     @staticmethod
     @contextmanager
     def get_connection():
-        """获取数据库连接"""
-        conn = mysql.connector.connect(**Config.DB_CONFIG)
+        """从连接池借出数据库连接，用完自动归还"""
+        pool = Database.get_pool()
+        with Metrics.timer('db.acquire'):
+            conn = pool.acquire()
         try:
             yield conn
+        except (mysql.connector.OperationalError, mysql.connector.InterfaceError):
+            # 连接本身出错时不再放回连接池
+            pool.release(conn, discard=True)
+            conn = None
+            raise
         finally:
-            conn.close()
+            if conn is not None:
+                pool.release(conn)
+
+    @staticmethod
+    def pool_stats():
+        """连接池指标：借出次数、等待时间等"""
+        return Database.get_pool().stats()
 
     @staticmethod
     def init_tables():
@@ -24,7 +113,9 @@ class Database:
                 CREATE TABLE IF NOT EXISTS users (
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     username VARCHAR(255) NOT NULL,
-                    face_encoding TEXT NOT NULL,
+                    face_encoding BLOB NOT NULL,
+                    latest_emotion VARCHAR(50) NULL,
+                    latest_emotion_at TIMESTAMP NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
@@ -35,106 +126,437 @@ class Database:
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     user_id INT NOT NULL,
                     emotion VARCHAR(50) NOT NULL,
+                    probabilities JSON NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (user_id) REFERENCES users(id)
                 )
             ''')
             
+            # 情绪按天汇总表，写入情绪记录时同步累加
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS emotion_daily_counts (
+                    user_id INT NOT NULL,
+                    day DATE NOT NULL,
+                    emotion VARCHAR(50) NOT NULL,
+                    count INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, day, emotion)
+                )
+            ''')
+            
+            # 旧版本创建的表补充新增的列和索引；人脸编码列改为二进制，
+            # 已有的 base64 文本原样保留，读取时兼容
+            Database._ensure_column_type(cursor, 'users', 'face_encoding', ('blob', 'mediumblob', 'longblob'),
+                                        'BLOB NOT NULL')
+            Database._ensure_column(cursor, 'emotions', 'probabilities', 'JSON NULL AFTER emotion')
+            Database._ensure_index(cursor, 'emotions', 'idx_emotions_user_created', '(user_id, created_at)')
+            Database._ensure_column(cursor, 'users', 'latest_emotion', 'VARCHAR(50) NULL AFTER face_encoding')
+            Database._ensure_column(cursor, 'users', 'latest_emotion_at', 'TIMESTAMP NULL AFTER latest_emotion')
+            Database._ensure_index(cursor, 'users', 'idx_users_latest_emotion', '(latest_emotion_at, id)')
+            
             conn.commit()
 
     @staticmethod
-    def save_emotion(user_id, emotion, created_at):
-        """保存情绪记录"""
+    def _ensure_column(cursor, table, column, definition):
+        """列不存在时执行 ALTER TABLE 添加"""
+        cursor.execute('''
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        ''', (table, column))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    @staticmethod
+    def _ensure_column_type(cursor, table, column, data_types, definition):
+        """列的类型不在 data_types 中时执行 ALTER TABLE 修改"""
+        cursor.execute('''
+            SELECT DATA_TYPE FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        ''', (table, column))
+        row = cursor.fetchone()
+        if row is None:
+            return
+        # 部分 MySQL 版本下 information_schema 的字符串列以 bytearray 返回
+        data_type = row[0].decode() if isinstance(row[0], (bytes, bytearray)) else row[0]
+        if data_type.lower() not in data_types:
+            cursor.execute(f'ALTER TABLE {table} MODIFY {column} {definition}')
+
+    @staticmethod
+    def _ensure_index(cursor, table, index, columns):
+        """索引不存在时执行 CREATE INDEX"""
+        cursor.execute('''
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        ''', (table, index))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f'CREATE INDEX {index} ON {table} {columns}')
+
+    @staticmethod
+    def backfill_emotion_rollup(batch_size=1000):
+        """根据 emotions 原始记录重建 emotion_daily_counts
+
+        按用户 id 分段重算，每段一个事务；可重复执行。返回处理的用户数。
+        """
+        processed = 0
+        with Database.get_connection() as conn:
+            cursor = conn.cursor()
+            last_id = 0
+            while True:
+                cursor.execute(
+                    'SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s',
+                    (last_id, batch_size)
+                )
+                user_ids = [row[0] for row in cursor.fetchall()]
+                if not user_ids:
+                    break
+                first_id, last_id = user_ids[0], user_ids[-1]
+
+                cursor.execute(
+                    'DELETE FROM emotion_daily_counts WHERE user_id BETWEEN %s AND %s',
+                    (first_id, last_id)
+                )
+                cursor.execute('''
+                    INSERT INTO emotion_daily_counts (user_id, day, emotion, count)
+                    SELECT user_id, DATE(created_at), emotion, COUNT(*)
+                    FROM emotions
+                    WHERE user_id BETWEEN %s AND %s
+                    GROUP BY user_id, DATE(created_at), emotion
+                    ON DUPLICATE KEY UPDATE count = VALUES(count)
+                ''', (first_id, last_id))
+                conn.commit()
+                processed += len(user_ids)
+                print(f"已重建 {processed} 个用户的情绪汇总")
+        return processed
+
+    @staticmethod
+    def migrate_face_encodings(dtype='float32', batch_size=1000, reencode=False):
+        """把 users.face_encoding 从 base64 TEXT 迁移为二进制 BLOB
+
+        可重复执行：已是二进制格式的记录会被跳过；reencode=True 时
+        二进制记录也会按 dtype 重新编码。返回转换的记录数。
+        """
+        converted = 0
+        with Database.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('ALTER TABLE users MODIFY face_encoding BLOB NOT NULL')
+            conn.commit()
+
+            last_id = 0
+            while True:
+                cursor.execute(
+                    'SELECT id, face_encoding FROM users WHERE id > %s ORDER BY id LIMIT %s',
+                    (last_id, batch_size)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                pending = [
+                    row for row in rows
+                    if reencode or not FaceEncodingCodec.is_binary(row[1])
+                ]
+                if not pending:
+                    continue
+                encodings = FaceEncodingCodec.decode_many([row[1] for row in pending])
+                cursor.executemany(
+                    'UPDATE users SET face_encoding = %s WHERE id = %s',
+                    [
+                        (FaceEncodingCodec.encode(encoding, dtype), row[0])
+                        for row, encoding in zip(pending, encodings)
+                    ]
+                )
+                conn.commit()
+                converted += len(pending)
+                print(f"已迁移 {converted} 条人脸编码")
+        return converted
+
+    @staticmethod
+    @Metrics.timed('db.get_face_encodings')
+    def get_face_encodings(min_id=0, limit=None):
+        """获取 id 大于 min_id 的用户人脸编码，limit 为每次最多返回的行数"""
+        sql = 'SELECT id, username, face_encoding FROM users WHERE id > %s ORDER BY id'
+        params = (min_id,)
+        if limit:
+            sql += ' LIMIT %s'
+            params += (limit,)
+        with Database.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    @staticmethod
+    @Metrics.timed('db.create_user')
+    def create_user(username, face_encoding):
+        """创建用户，返回新用户 id"""
         with Database.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT INTO emotions (user_id, emotion, created_at) VALUES (%s, %s, %s)",
-                (user_id, emotion, created_at)
+                'INSERT INTO users (username, face_encoding) VALUES (%s, %s)',
+                (username, FaceEncodingCodec.encode(
+                    face_encoding, Config.FACE_RECOGNITION['encoding_storage_dtype']
+                ))
+            )
+            conn.commit()
+            user_id = cursor.lastrowid
+        ResponseCache.invalidate(ResponseCache.user_tag(user_id), ResponseCache.USER_LIST_TAG)
+        return user_id
+
+    @staticmethod
+    def create_users(users):
+        """批量创建用户，users 为 (username, face_encoding) 列表，在同一个事务中提交"""
+        if not users:
+            return 0
+        dtype = Config.FACE_RECOGNITION['encoding_storage_dtype']
+        with Database.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                'INSERT INTO users (username, face_encoding) VALUES (%s, %s)',
+                [(username, FaceEncodingCodec.encode(encoding, dtype)) for username, encoding in users]
             )
             conn.commit()
+        ResponseCache.invalidate(ResponseCache.USER_LIST_TAG)
+        return len(users)
 
     @staticmethod
-    def get_user_list():
-        """获取用户列表"""
+    def update_face_encodings(updates):
+        """批量替换用户的人脸编码，updates 为 (user_id, face_encoding) 列表"""
+        if not updates:
+            return 0
+        dtype = Config.FACE_RECOGNITION['encoding_storage_dtype']
+        with Database.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                'UPDATE users SET face_encoding = %s WHERE id = %s',
+                [(FaceEncodingCodec.encode(encoding, dtype), user_id) for user_id, encoding in updates]
+            )
+            conn.commit()
+        return len(updates)
+
+    @staticmethod
+    @Metrics.timed('db.save_emotion')
+    def save_emotion(user_id, emotion, created_at, probabilities=None):
+        """保存情绪记录"""
+        with Database.get_connection() as conn:
+            conn.execute_prepared(
+                "INSERT INTO emotions (user_id, emotion, probabilities, created_at) VALUES (%s, %s, %s, %s)",
+                (user_id, emotion, Database._dump_probabilities(probabilities), created_at)
+            )
+            conn.execute_prepared(Database.ROLLUP_UPSERT_SQL, (user_id, created_at, emotion, 1))
+            conn.execute_prepared(Database.LATEST_EMOTION_SQL, (emotion, created_at, user_id, created_at))
+            conn.commit()
+        ResponseCache.invalidate(ResponseCache.emotions_tag(user_id), ResponseCache.USER_LIST_TAG)
+
+    @staticmethod
+    @Metrics.timed('db.save_emotions')
+    def save_emotions(records):
+        """批量保存情绪记录
+
+        records 为 (user_id, emotion, created_at, probabilities) 元组列表，
+        executemany 会把它们合并为一条多行 INSERT，在同一个事务中提交。
+        """
+        if not records:
+            return
+        with Database.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "INSERT INTO emotions (user_id, emotion, probabilities, created_at) VALUES (%s, %s, %s, %s)",
+                [
+                    (user_id, emotion, Database._dump_probabilities(probabilities), created_at)
+                    for user_id, emotion, created_at, probabilities in records
+                ]
+            )
+            # 同一批内先按 (用户, 日期, 情绪) 合并后再累加到汇总表
+            counts = Counter(
+                (user_id, str(created_at)[:10], emotion)
+                for user_id, emotion, created_at, _ in records
+            )
+            cursor.executemany(
+                Database.ROLLUP_UPSERT_SQL,
+                [(user_id, day, emotion, count) for (user_id, day, emotion), count in counts.items()]
+            )
+            # 每个用户只用本批中最新的一条更新最新情绪
+            latest = {}
+            for user_id, emotion, created_at, _ in records:
+                if user_id not in latest or str(created_at) >= str(latest[user_id][1]):
+                    latest[user_id] = (emotion, created_at)
+            cursor.executemany(
+                Database.LATEST_EMOTION_SQL,
+                [(emotion, created_at, user_id, created_at) for user_id, (emotion, created_at) in latest.items()]
+            )
+            conn.commit()
+        ResponseCache.invalidate(
+            *[ResponseCache.emotions_tag(user_id) for user_id in latest],
+            ResponseCache.USER_LIST_TAG
+        )
+
+    @staticmethod
+    def _dump_probabilities(probabilities):
+        """把情绪概率分布序列化为 JSON 字符串"""
+        if probabilities is None:
+            return None
+        return json.dumps(probabilities, ensure_ascii=False)
+
+    @staticmethod
+    @Metrics.timed('db.get_username')
+    def get_username(user_id):
+        """根据用户 id 获取用户名，不存在时返回 None"""
+        with Database.get_connection() as conn:
+            cursor = conn.execute_prepared('SELECT username FROM users WHERE id = %s', (user_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            username = rows[0][0]
+            return username.decode('utf-8') if isinstance(username, (bytes, bytearray)) else username
+
+    @staticmethod
+    @Metrics.timed('db.get_user_list')
+    def get_user_list(limit=50, cursor_token=None):
+        """获取用户列表（按最新情绪时间倒序的键集分页）
+
+        返回 (users, next_cursor)，next_cursor 为 None 表示没有更多数据。
+        有情绪记录的用户按 (latest_emotion_at, id) 倒序在前，没有记录的用户按 id 倒序在后，
+        两段都能直接走 idx_users_latest_emotion 索引，开销与情绪历史总量无关。
+        """
+        after_time, after_id = Database._parse_cursor(cursor_token)
+        users = []
         with Database.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT 
-                    u.username,
-                    e.emotion as latest_emotion,
-                    DATE_FORMAT(e.created_at, '%Y-%m-%d %H:%i:%s') as emotion_time
-                FROM users u
-                LEFT JOIN (
-                    SELECT user_id, emotion, created_at,
-                        ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC) as rn
-                    FROM emotions
-                ) e ON u.id = e.user_id AND e.rn = 1
-                ORDER BY e.created_at DESC
-            """)
+            if after_time is not None or after_id is None:
+                if after_time is None:
+                    cursor.execute(Database.USER_LIST_RECENT_SQL, (limit,))
+                else:
+                    cursor.execute(Database.USER_LIST_RECENT_AFTER_SQL, (after_time, after_id, limit))
+                users = cursor.fetchall()
+                after_id = None
+
+            if len(users) < limit:
+                # 有情绪记录的用户已取完，继续取没有记录的用户
+                cursor.execute(
+                    Database.USER_LIST_NO_EMOTION_SQL,
+                    (after_id if after_id is not None else 2 ** 31, limit - len(users))
+                )
+                users += cursor.fetchall()
+        return Database._user_list_page(users, limit)
+
+    @staticmethod
+    def _user_list_page(users, limit):
+        """把用户列表查询结果整理为 (users, next_cursor)"""
+        next_cursor = None
+        if len(users) == limit:
+            last = users[-1]
+            next_cursor = Database._make_cursor(last['latest_emotion_at'], last['id'])
+        users = [
+            {
+                'username': user['username'],
+                'latest_emotion': user['latest_emotion'],
+                'emotion_time': user['latest_emotion_at'].strftime('%Y-%m-%d %H:%M:%S')
+                if user['latest_emotion_at'] else None
+            }
+            for user in users
+        ]
+        return users, next_cursor
+
+    @staticmethod
+    def _make_cursor(latest_emotion_at, user_id):
+        """生成分页游标：'<最新情绪时间>|<用户 id>'，没有情绪记录时时间为空"""
+        time_part = latest_emotion_at.strftime('%Y-%m-%d %H:%M:%S') if latest_emotion_at else ''
+        return f'{time_part}|{user_id}'
+
+    @staticmethod
+    def _parse_cursor(cursor_token):
+        """解析分页游标，返回 (最新情绪时间, 用户 id)"""
+        if not cursor_token:
+            return None, None
+        try:
+            time_part, id_part = cursor_token.split('|')
+            return (time_part or None), int(id_part)
+        except ValueError:
+            raise ValueError('无效的分页参数')
+
+    @staticmethod
+    @Metrics.timed('db.get_search_entries')
+    def get_search_entries(min_id=0):
+        """获取 id 大于 min_id 的用户名及最新情绪，用于构建搜索索引"""
+        with Database.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT id, username, latest_emotion, latest_emotion_at FROM users WHERE id > %s ORDER BY id',
+                (min_id,)
+            )
             return cursor.fetchall()
 
     @staticmethod
-    def search_users(query):
-        """搜索用户"""
+    @Metrics.timed('db.get_latest_emotion_updates')
+    def get_latest_emotion_updates(since):
+        """获取最新情绪时间不早于 since 的用户"""
         with Database.get_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT 
-                    u.username,
-                    e.emotion as latest_emotion,
-                    e.created_at as emotion_time
-                FROM users u
-                LEFT JOIN (
-                    SELECT user_id, emotion, created_at,
-                           ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC) as rn
-                    FROM emotions
-                ) e ON u.id = e.user_id AND e.rn = 1
-                WHERE u.username LIKE %s
-                ORDER BY e.created_at DESC
-            """, (f'%{query}%',))
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT id, latest_emotion, latest_emotion_at FROM users WHERE latest_emotion_at >= %s',
+                (since,)
+            )
             return cursor.fetchall()
 
     @staticmethod
+    def backfill_latest_emotions(batch_size=1000):
+        """根据 emotions 原始记录重建 users 上的最新情绪列，返回处理的用户数"""
+        processed = 0
+        with Database.get_connection() as conn:
+            cursor = conn.cursor()
+            last_id = 0
+            while True:
+                cursor.execute(
+                    'SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s',
+                    (last_id, batch_size)
+                )
+                user_ids = [row[0] for row in cursor.fetchall()]
+                if not user_ids:
+                    break
+                first_id, last_id = user_ids[0], user_ids[-1]
+
+                cursor.execute("""
+                    UPDATE users u
+                    JOIN (
+                        SELECT e.user_id, MAX(e.emotion) as emotion, e.created_at
+                        FROM emotions e
+                        JOIN (
+                            SELECT user_id, MAX(created_at) as created_at
+                            FROM emotions
+                            WHERE user_id BETWEEN %s AND %s
+                            GROUP BY user_id
+                        ) latest ON e.user_id = latest.user_id AND e.created_at = latest.created_at
+                        GROUP BY e.user_id, e.created_at
+                    ) l ON u.id = l.user_id
+                    SET u.latest_emotion = l.emotion, u.latest_emotion_at = l.created_at
+                """, (first_id, last_id))
+                conn.commit()
+                processed += len(user_ids)
+                print(f"已更新 {processed} 个用户的最新情绪")
+        return processed
+
+    @staticmethod
+    @Metrics.timed('db.get_emotion_history')
     def get_emotion_history(user_id, days):
-        """获取情绪历史数据"""
+        """获取情绪历史数据
+
+        直接读取 emotion_daily_counts 中预先汇总的每日计数，统计信息在内存中计算。
+        """
         with Database.get_connection() as conn:
             cursor = conn.cursor(dictionary=True)
             
             # 获取指定天数的情绪记录
-            cursor.execute('''
-                SELECT 
-                    DATE(created_at) as date,
-                    emotion,
-                    COUNT(*) as count
-                FROM emotions
-                WHERE user_id = %s
-                AND created_at >= DATE_SUB(CURRENT_DATE, INTERVAL %s DAY)
-                GROUP BY DATE(created_at), emotion
-                ORDER BY date
-            ''', (user_id, days))
+            cursor.execute(Database.EMOTION_HISTORY_SQL, (user_id, days))
             records = cursor.fetchall()
-            
-            # 获取统计信息
-            cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_records,
-                    COUNT(DISTINCT DATE(created_at)) as total_days,
-                    (
-                        SELECT emotion
-                        FROM (
-                            SELECT emotion, COUNT(*) as emotion_count
-                            FROM emotions
-                            WHERE user_id = %s
-                            AND created_at >= DATE_SUB(CURRENT_DATE, INTERVAL %s DAY)
-                            GROUP BY emotion
-                            ORDER BY emotion_count DESC
-                            LIMIT 1
-                        ) as most_common
-                    ) as main_emotion
-                FROM emotions
-                WHERE user_id = %s
-                AND created_at >= DATE_SUB(CURRENT_DATE, INTERVAL %s DAY)
-            ''', (user_id, days, user_id, days))
-            
-            stats = cursor.fetchone()
-            return records, stats 
\ No newline at end of file
+        return records, Database._history_stats(records)
+
+    @staticmethod
+    def _history_stats(records):
+        """根据每日计数计算情绪历史的统计信息"""
+        emotion_counts = Counter()
+        for record in records:
+            emotion_counts[record['emotion']] += record['count']
+        return {
+            'total_records': sum(emotion_counts.values()),
+            'total_days': len(set(record['date'] for record in records)),
+            'main_emotion': emotion_counts.most_common(1)[0][0] if emotion_counts else None
+        }
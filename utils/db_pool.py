@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+import mysql.connector
+
+class PoolTimeoutError(Exception):
+    """等待空闲连接超时"""
+
+
+class PooledConnection:
+    """连接池中的连接
+
+    除了代理原始连接的全部方法外，还缓存了按 SQL 复用的服务端预处理语句。
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._statements = {}
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def execute_prepared(self, sql, params=()):
+        """以服务端预处理语句执行 sql，同一连接上的相同语句只会 PREPARE 一次
+
+        返回执行后的游标；再次执行同一语句前需读完结果集。
+        """
+        cursor = self._statements.get(sql)
+        if cursor is None:
+            cursor = self._conn.cursor(prepared=True)
+            self._statements[sql] = cursor
+        cursor.execute(sql, params)
+        return cursor
+
+    def close(self):
+        """关闭预处理语句和底层连接"""
+        for cursor in self._statements.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._statements.clear()
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """有界、线程安全的 MySQL 连接池
+
+    - 最多同时持有 size 个连接，用完时调用方最多等待 wait_timeout 秒
+    - 空闲超过 max_idle_time 秒的连接会被回收
+    - 空闲超过 health_check_interval 秒的连接在借出前先 ping 一次
+    """
+
+    def __init__(self, connect_kwargs, size=10, max_idle_time=300,
+                 health_check_interval=30, wait_timeout=5):
+        self.connect_kwargs = connect_kwargs
+        self.size = size
+        self.max_idle_time = max_idle_time
+        self.health_check_interval = health_check_interval
+        self.wait_timeout = wait_timeout
+
+        self._idle = deque()
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'closed': 0,
+            'evicted_idle': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0
+        }
+
+    def _connect(self):
+        conn = PooledConnection(mysql.connector.connect(**self.connect_kwargs))
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _evict_idle(self, now):
+        """回收空闲过久的连接，调用方需持有锁"""
+        expired = []
+        while self._idle and now - self._idle[0].last_used > self.max_idle_time:
+            expired.append(self._idle.popleft())
+        self._stats['evicted_idle'] += len(expired)
+        return expired
+
+    def _is_healthy(self, conn, now):
+        if now - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """借出一个连接"""
+        start = time.monotonic()
+        deadline = start + self.wait_timeout
+        with self._cond:
+            expired = self._evict_idle(start)
+            while not self._idle and self._in_use >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(f'数据库连接池已满（{self.size}），等待超时')
+                self._cond.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+        for stale in expired:
+            stale.close()
+
+        try:
+            if conn is not None and not self._is_healthy(conn, time.monotonic()):
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                    self._stats['closed'] += 1
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._release_slot()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+        return conn
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def release(self, conn, discard=False):
+        """归还连接；discard=True 时直接关闭（例如连接已出错）"""
+        if not discard:
+            try:
+                # 丢弃未读完的结果集并结束隐式事务，避免影响下一个使用者
+                if conn.unread_result:
+                    conn.consume_results()
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            conn.close()
+            with self._cond:
+                self._stats['closed'] += 1
+            self._release_slot()
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._in_use -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """关闭全部空闲连接"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._stats['closed'] += len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """连接池指标"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['in_use'] = self._in_use
+            stats['idle'] = len(self._idle)
+        checkouts = stats['checkouts']
+        stats['wait_time_avg'] = stats['wait_time_total'] / checkouts if checkouts else 0.0
+        return stats
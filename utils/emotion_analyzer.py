@@ -1,16 +1,27 @@
-from deepface import DeepFace
+import cv2
+import numpy as np
 from config import Config
+from utils.model_registry import ModelRegistry
+from utils.metrics import Metrics
 
 class EmotionAnalyzer:
+    # DeepFace 情绪模型的输出顺序
+    LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
     @staticmethod
-    def analyze(img):
-        """分析图像中的情绪"""
+    @Metrics.timed('emotion.analyze')
+    def analyze(img, detector_backend='opencv'):
+        """分析图像中的情绪
+
+        img 已是裁剪好的人脸区域时传入 detector_backend='skip'，
+        跳过 DeepFace 内部的人脸检测。
+        """
         try:
-            result = DeepFace.analyze(
+            result = ModelRegistry.deepface().analyze(
                 img,
                 actions=['emotion'],
-                enforce_detection=True,
-                detector_backend='opencv',
+                enforce_detection=detector_backend != 'skip',
+                detector_backend=detector_backend,
                 align=True
             )
             emotion = result[0]['dominant_emotion']
@@ -27,4 +38,63 @@ class EmotionAnalyzer:
                 'probabilities': emotions
             }
         except Exception as e:
-            raise ValueError(f'情绪分析失败: {str(e)}') 
\ No newline at end of file
+            raise ValueError(f'情绪分析失败: {str(e)}')
+
+    @staticmethod
+    def analyze_face(face_crop):
+        """分析已裁剪人脸区域的情绪
+
+        启用微批处理时交给 EmotionBatcher 与其他并发请求合并推理。
+        """
+        if Config.EMOTION_BATCHING['enabled']:
+            from utils.emotion_batcher import EmotionBatcher
+            return EmotionBatcher.get_instance().analyze(face_crop)
+        return EmotionAnalyzer.analyze(face_crop, detector_backend='skip')
+
+    @staticmethod
+    def analyze_faces(face_crops):
+        """分析多张已裁剪人脸区域的情绪，多张时合并为一次批量推理"""
+        if len(face_crops) == 1:
+            return [EmotionAnalyzer.analyze_face(face_crops[0])]
+        return EmotionAnalyzer.analyze_batch(face_crops)
+
+    @staticmethod
+    def preprocess(face_crop, target_size=224):
+        """与 DeepFace 一致的情绪模型预处理
+
+        等比缩放并补零到 target_size 见方、归一化到 [0, 1]，
+        再转灰度并缩放到 48x48，返回 (48, 48, 1) 的 float32 数组。
+        """
+        height, width = face_crop.shape[:2]
+        factor = min(target_size / height, target_size / width)
+        resized = cv2.resize(face_crop, (max(int(width * factor), 1), max(int(height * factor), 1)))
+        pad_h = target_size - resized.shape[0]
+        pad_w = target_size - resized.shape[1]
+        padded = np.pad(
+            resized,
+            ((pad_h // 2, pad_h - pad_h // 2), (pad_w // 2, pad_w - pad_w // 2), (0, 0)),
+            'constant'
+        ).astype(np.float32) / 255
+        gray = cv2.cvtColor(padded, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (48, 48))[:, :, np.newaxis]
+
+    @staticmethod
+    @Metrics.timed('emotion.analyze_batch')
+    def analyze_batch(face_crops):
+        """对一批人脸区域做一次批量推理，返回与 analyze 相同格式的结果列表"""
+        try:
+            batch = np.stack([EmotionAnalyzer.preprocess(crop) for crop in face_crops])
+            predictions = ModelRegistry.emotion_model().predict(batch, verbose=0)
+        except Exception as e:
+            raise ValueError(f'情绪分析失败: {str(e)}')
+
+        results = []
+        for prediction in predictions:
+            probabilities = 100 * prediction / prediction.sum()
+            emotions = {label: float(p) for label, p in zip(EmotionAnalyzer.LABELS, probabilities)}
+            emotion = EmotionAnalyzer.LABELS[int(np.argmax(prediction))]
+            results.append({
+                'emotion': Config.EMOTION_MAP.get(emotion, '平静'),
+                'probabilities': emotions
+            })
+        return results
@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from config import Config
+from utils.emotion_analyzer import EmotionAnalyzer
+
+class EmotionBatcher:
+    """情绪推理动态批处理器
+
+    并发请求提交的人脸区域进入队列，后台线程在第一张到达后最多等待
+    max_wait_ms 毫秒或攒够 max_batch_size 张，合并为一批送入情绪模型，
+    再把结果分发给各个调用方。
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_batch_size=16, max_wait_ms=5, timeout=10):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0}
+        self._thread = threading.Thread(target=self._run, name='emotion-batcher', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get_instance(cls):
+        """按 Config.EMOTION_BATCHING 创建的进程内共享实例"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls(
+                        max_batch_size=Config.EMOTION_BATCHING['max_batch_size'],
+                        max_wait_ms=Config.EMOTION_BATCHING['max_wait_ms'],
+                        timeout=Config.EMOTION_BATCHING['timeout']
+                    )
+        return cls._instance
+
+    def submit(self, face_crop):
+        """提交一张人脸区域，返回 Future"""
+        future = Future()
+        self._queue.put((face_crop, future))
+        return future
+
+    def analyze(self, face_crop):
+        """提交并等待结果，格式与 EmotionAnalyzer.analyze 相同"""
+        return self.submit(face_crop).result(timeout=self.timeout)
+
+    def stats(self):
+        """请求数、批次数与平均批大小"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['avg_batch_size'] = stats['requests'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            crops = [crop for crop, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = EmotionAnalyzer.analyze_batch(crops)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            with self._stats_lock:
+                self._stats['requests'] += len(batch)
+                self._stats['batches'] += 1
@@ -0,0 +1,89 @@
+from datetime import date
+import numpy as np
+
+class EmotionPivot:
+    """日期 × 情绪 的计数矩阵
+
+    由 (date, emotion, count) 形式的每日汇总记录一次性构建：先把日期和情绪分别
+    映射为行号、列号，再用一次 bincount 累加到矩阵中，耗时与记录数成线性关系。
+    只包含有记录的日期，日期升序、情绪按名称排序。
+    """
+    GRANULARITIES = ('day', 'week', 'month')
+
+    def __init__(self, days, emotions, counts):
+        # days 为 date.toordinal() 得到的整数数组
+        self.days = days
+        self.emotions = emotions
+        self.counts = counts
+
+    @staticmethod
+    def _to_ordinal(value):
+        if isinstance(value, str):
+            value = date.fromisoformat(value[:10])
+        return value.toordinal()
+
+    @classmethod
+    def from_records(cls, records):
+        """由 [{'date', 'emotion', 'count'}, ...] 构建矩阵"""
+        if not records:
+            return cls(np.zeros(0, dtype=np.int64), [], np.zeros((0, 0), dtype=np.int64))
+        day_values = np.fromiter((cls._to_ordinal(r['date']) for r in records), dtype=np.int64, count=len(records))
+        emotion_values = np.array([r['emotion'] for r in records])
+        count_values = np.fromiter((r['count'] for r in records), dtype=np.int64, count=len(records))
+
+        days, rows = np.unique(day_values, return_inverse=True)
+        emotions, cols = np.unique(emotion_values, return_inverse=True)
+        counts = np.bincount(
+            rows * len(emotions) + cols,
+            weights=count_values,
+            minlength=len(days) * len(emotions)
+        ).astype(np.int64).reshape(len(days), len(emotions))
+        return cls(days, emotions.tolist(), counts)
+
+    @staticmethod
+    def auto_granularity(days, week_after_days=90, month_after_days=365):
+        """按时间窗口长度选择聚合粒度"""
+        if days > month_after_days:
+            return 'month'
+        if days > week_after_days:
+            return 'week'
+        return 'day'
+
+    def _bucket_keys(self, granularity):
+        if granularity == 'day':
+            return self.days
+        if granularity == 'week':
+            # 以周一为一周的开始
+            return self.days - (self.days - 1) % 7
+        if granularity == 'month':
+            return np.array([date.fromordinal(int(d)).replace(day=1).toordinal() for d in self.days], dtype=np.int64)
+        raise ValueError(f'未知的聚合粒度: {granularity}')
+
+    def resample(self, granularity):
+        """按周或按月合并行，每行以该周期第一天为日期"""
+        if granularity == 'day' or not len(self.days):
+            return self
+        keys = self._bucket_keys(granularity)
+        # 日期已升序，同一周期的行相邻，直接按段求和
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return EmotionPivot(keys[starts], self.emotions, np.add.reduceat(self.counts, starts, axis=0))
+
+    def labels(self, granularity='day'):
+        """图表横轴标签：按日、按周为 'YYYY-MM-DD'，按月为 'YYYY-MM'"""
+        fmt = '%Y-%m' if granularity == 'month' else '%Y-%m-%d'
+        return [date.fromordinal(int(d)).strftime(fmt) for d in self.days]
+
+    def series(self):
+        """每种情绪按日期排列的计数序列"""
+        return {emotion: self.counts[:, j].tolist() for j, emotion in enumerate(self.emotions)}
+
+    def variation(self, weights):
+        """情绪波动指数：各 (日期, 情绪) 计数乘以情绪数值后的总体标准差 × 100
+
+        只统计计数大于 0 的单元格，即与逐条汇总记录计算的结果相同。
+        """
+        mask = self.counts > 0
+        if not mask.any():
+            return 0
+        values = self.counts * np.array([weights.get(e, 0) for e in self.emotions], dtype=np.float64)
+        return float(values[mask].std() * 100)
@@ -1,3 +1,15 @@
+from utils.emotion_pivot import EmotionPivot
+
+# 将情绪转换为数值
+EMOTION_VALUES = {
+    '开心': 1,
+    '平静': 0,
+    '惊讶': 0.5,
+    '伤心': -1,
+    '愤怒': -0.8,
+    '疲惫': -0.3
+}
+
 def get_emotion_color(emotion, alpha=1):
     """获取情绪对应的颜色"""
     colors = {
@@ -11,25 +23,13 @@ def get_emotion_color(emotion, alpha=1):
     return colors.get(emotion, f'rgba(189, 195, 199, {alpha})')
 
 def calculate_emotion_variation(records):
-    """计算情绪波动指数"""
-    if not records:
-        return 0
-        
-    # 将情绪转换为数值
-    emotion_values = {
-        '开心': 1,
-        '平静': 0,
-        '惊讶': 0.5,
-        '伤心': -1,
-        '愤怒': -0.8,
-        '疲惫': -0.3
-    }
-    
+    """计算情绪波动指数
+
+    records 可以是 (date, emotion, count) 每日汇总记录列表，也可以是已构建好的 EmotionPivot。
+    """
+    if not isinstance(records, EmotionPivot):
+        if not records:
+            return 0
+        records = EmotionPivot.from_records(records)
     # 计算情绪变化的标准差
-    values = [emotion_values.get(record['emotion'], 0) * record['count'] for record in records]
-    if not values:
-        return 0
-        
-    mean = sum(values) / len(values)
-    variance = sum((x - mean) ** 2 for x in values) / len(values)
-    return (variance ** 0.5) * 100  # 转换为0-100的分数 
\ No newline at end of file
+    return records.variation(EMOTION_VALUES)  # 转换为0-100的分数
\ No newline at end of file
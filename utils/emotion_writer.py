@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from utils.database import Database
+
+class EmotionWriterBusyError(Exception):
+    """写入队列已满"""
+
+
+class EmotionWriter:
+    """情绪记录的异步批量写入器（write-behind）
+
+    /record_emotion 只把记录放入有界队列，后台线程攒够 batch_size 条或
+    等待 flush_interval 秒后，用一条多行 INSERT 批量写入数据库。
+    队列满时 submit 最多阻塞 put_timeout 秒，仍然写不进去则抛出
+    EmotionWriterBusyError，由调用方返回“系统繁忙”。
+    close() 之后（例如进程退出时）提交的记录不再入队，直接同步写入。
+    """
+
+    def __init__(self, batch_size=200, flush_interval=1.0, max_queue_size=10000,
+                 put_timeout=0.5, max_retries=3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'written': 0,
+            'dropped': 0,
+            'rejected': 0,
+            'batches': 0
+        }
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='emotion-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, user_id, emotion, created_at, probabilities=None):
+        """提交一条情绪记录"""
+        record = (user_id, emotion, created_at, probabilities)
+        if self._stop.is_set():
+            # 已关闭，不再有线程消费队列
+            self._incr('submitted')
+            self._write([record])
+            return
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+        except queue.Full:
+            self._incr('rejected')
+            raise EmotionWriterBusyError('情绪记录写入繁忙，请稍后重试')
+        self._incr('submitted')
+        if self._stop.is_set():
+            # 与 close() 并发时，close 最后一次清空队列可能已经结束，由当前线程写完剩余记录
+            self._flush_remaining()
+
+    def close(self, timeout=10):
+        """停止后台写入并把队列中剩余记录全部写入，之后提交的记录改为同步写入"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # 线程未启动或已退出时在当前线程里写完剩余记录
+        self._flush_remaining()
+
+    def stats(self):
+        """写入器指标"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _incr(self, key, value=1):
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def _drain(self, limit):
+        """非阻塞地取出最多 limit 条记录"""
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush_remaining(self):
+        """写完队列中的全部记录"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+        # 退出前写完队列中的剩余记录
+        self._flush_remaining()
+
+    def _write(self, batch):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                Database.save_emotions(batch)
+                self._incr('written', len(batch))
+                self._incr('batches')
+                return
+            except Exception as e:
+                print(f"批量写入情绪记录失败（第 {attempt} 次）: {str(e)}")
+                time.sleep(min(0.1 * 2 ** attempt, 2))
+        self._incr('dropped', len(batch))
+        print(f"放弃写入 {len(batch)} 条情绪记录")
@@ -0,0 +1,91 @@
+import base64
+import struct
+import numpy as np
+
+class FaceEncodingCodec:
+    """人脸编码的二进制存储格式
+
+    每条编码为 8 字节头部 + 原始数组数据，直接写入 users.face_encoding (BLOB)：
+
+        magic(3)  b'\\x93FE'
+        version(1) 格式版本，当前为 1
+        dtype(1)  1=float64, 2=float32, 3=float16
+        reserved(1)
+        dim(2)    编码维度，小端 uint16
+
+    旧版本的 base64 文本编码仍可读取，可通过 `python manage.py migrate-encodings`
+    批量转换为二进制格式。
+    """
+    MAGIC = b'\x93FE'
+    VERSION = 1
+    HEADER = struct.Struct('<3sBBxH')
+    DTYPES = {1: np.float64, 2: np.float32, 3: np.float16}
+    DTYPE_CODES = {'float64': 1, 'float32': 2, 'float16': 3}
+
+    @staticmethod
+    def encode(face_encoding, dtype='float32'):
+        """把人脸编码序列化为带头部的二进制数据"""
+        code = FaceEncodingCodec.DTYPE_CODES.get(dtype)
+        if code is None:
+            raise ValueError(f'不支持的编码存储类型: {dtype}')
+        array = np.asarray(face_encoding).astype(FaceEncodingCodec.DTYPES[code]).ravel()
+        header = FaceEncodingCodec.HEADER.pack(
+            FaceEncodingCodec.MAGIC, FaceEncodingCodec.VERSION, code, array.size
+        )
+        return header + array.tobytes()
+
+    @staticmethod
+    def is_binary(blob):
+        """判断是否为二进制格式（否则视为旧版 base64 文本）"""
+        return isinstance(blob, (bytes, bytearray, memoryview)) and \
+            bytes(blob[:3]) == FaceEncodingCodec.MAGIC
+
+    @staticmethod
+    def decode(blob):
+        """反序列化单条编码，返回 float64 数组"""
+        return FaceEncodingCodec.decode_many([blob])[0]
+
+    @staticmethod
+    def decode_many(blobs, dim=128):
+        """把一整批编码一次性转换为 (n, dim) 的 float64 矩阵
+
+        同一格式的记录长度相同，拼接后用结构化 dtype 一次 frombuffer 即可得到
+        全部数据，无需逐行解析。格式不一致或仍为 base64 的记录走兜底分支。
+        """
+        count = len(blobs)
+        result = np.empty((count, dim), dtype=np.float64)
+        if count == 0:
+            return result
+
+        binary_rows = []
+        legacy_rows = []
+        for i, blob in enumerate(blobs):
+            (binary_rows if FaceEncodingCodec.is_binary(blob) else legacy_rows).append(i)
+
+        # 按头部分组，通常只有一组
+        groups = {}
+        for i in binary_rows:
+            groups.setdefault(bytes(blobs[i][:FaceEncodingCodec.HEADER.size]), []).append(i)
+        for header, rows in groups.items():
+            _, version, code, size = FaceEncodingCodec.HEADER.unpack(header)
+            if version != FaceEncodingCodec.VERSION or code not in FaceEncodingCodec.DTYPES:
+                raise ValueError(f'无法识别的人脸编码格式: version={version}, dtype={code}')
+            if size != dim:
+                raise ValueError(f'人脸编码维度不匹配: {size} != {dim}')
+            record = np.dtype([
+                ('header', f'V{FaceEncodingCodec.HEADER.size}'),
+                ('data', FaceEncodingCodec.DTYPES[code], (size,))
+            ])
+            buffer = b''.join(blobs[i] for i in rows)
+            records = np.frombuffer(buffer, dtype=record)
+            if len(rows) == count:
+                result[:] = records['data']
+            else:
+                result[rows] = records['data']
+
+        for i in legacy_rows:
+            blob = blobs[i]
+            if isinstance(blob, (bytes, bytearray)):
+                blob = bytes(blob).decode('ascii')
+            result[i] = np.frombuffer(base64.b64decode(blob), dtype=np.float64)
+        return result
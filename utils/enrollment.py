@@ -0,0 +1,247 @@
+import json
+import multiprocessing
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from config import Config
+from utils.database import Database
+from utils.face_gallery import FaceGallery
+from utils.face_index import pairwise_distances
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def _init_worker():
+    """编码进程初始化：只用到 face_recognition，按需加载，不加载情绪模型"""
+    from utils.model_registry import ModelRegistry
+    ModelRegistry.preload('lazy')
+
+
+def encode_photo(key, source):
+    """在工作进程中解码一张照片并计算人脸编码
+
+    source 为文件路径或图片字节。照片中必须恰好有一张人脸。
+    返回 (key, 编码或 None, 错误信息或 None)。
+    """
+    from utils.face_pipeline import FaceAnalysis
+    from utils.face_recognition import FaceRecognition
+    from utils.image_processor import ImageProcessor
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                source = f.read()
+        img = ImageProcessor.decode_image_bytes(source)
+        ImageProcessor.check_image_quality(img)
+        face_locations = FaceRecognition.detect_face(img)
+        if len(face_locations) > 1:
+            raise ValueError(f'检测到 {len(face_locations)} 张人脸')
+        return key, FaceAnalysis(img, face_locations).encoding, None
+    except Exception as e:
+        # dlib / numpy 的任何异常只影响这一张照片
+        return key, None, str(e)
+
+
+class PhotoSource:
+    """照片目录或压缩包（zip / tar）
+
+    用户名取自文件名（name_from='file'）或所在目录名（name_from='dir'）。
+    目录中的照片以路径交给工作进程读取；压缩包中的照片由主进程按顺序读出字节。
+    """
+
+    def __init__(self, path, name_from='file'):
+        self.path = os.path.abspath(path)
+        self.name_from = name_from
+        if os.path.isdir(self.path):
+            self.kind = 'dir'
+        elif zipfile.is_zipfile(self.path):
+            self.kind = 'zip'
+        elif tarfile.is_tarfile(self.path):
+            self.kind = 'tar'
+        else:
+            raise ValueError(f'不支持的照片来源: {path}')
+
+    def username(self, key):
+        parts = key.replace('\\', '/').split('/')
+        if self.name_from == 'dir' and len(parts) > 1:
+            return parts[-2]
+        return os.path.splitext(parts[-1])[0]
+
+    def keys(self):
+        """所有照片的相对路径，按名称排序"""
+        if self.kind == 'dir':
+            keys = [
+                os.path.relpath(os.path.join(root, name), self.path).replace(os.sep, '/')
+                for root, _, files in os.walk(self.path) for name in files
+            ]
+        elif self.kind == 'zip':
+            with zipfile.ZipFile(self.path) as archive:
+                keys = [info.filename for info in archive.infolist() if not info.is_dir()]
+        else:
+            with tarfile.open(self.path) as archive:
+                keys = [member.name for member in archive.getmembers() if member.isfile()]
+        return sorted(key for key in keys if key.lower().endswith(IMAGE_EXTENSIONS))
+
+    def iter_photos(self, keys):
+        """逐张返回 (key, 路径或字节)"""
+        wanted = set(keys)
+        if self.kind == 'dir':
+            for key in keys:
+                yield key, os.path.join(self.path, key)
+        elif self.kind == 'zip':
+            with zipfile.ZipFile(self.path) as archive:
+                for key in keys:
+                    yield key, archive.read(key)
+        else:
+            # tar 只能顺序读取，按归档中的顺序返回
+            with tarfile.open(self.path) as archive:
+                for member in archive:
+                    if member.name in wanted:
+                        yield member.name, archive.extractfile(member).read()
+
+
+class BulkEnroller:
+    """批量离线注册
+
+    - 照片在进程池中解码并计算编码，同时在途的任务不超过 workers * 4 个
+    - 每攒够 batch_size 个编码处理一批：与人脸库批量比对去重，批内用一次两两距离
+      矩阵去重（保留排在前面的照片），剩余的一次性写入 users 表
+    - 每批处理完后把已完成的照片写入检查点，中断后用同一检查点重新运行会跳过它们；
+      写库后、写检查点前中断的照片重跑时会被当作人脸库中的重复照片跳过。
+      编码失败的照片不写入检查点，重跑时会重新尝试
+    - reencode=True 时用户名已存在的照片不新建用户，而是用新编码替换该用户的编码，
+      用于更换识别模型或编码参数后重新生成人脸库
+    """
+
+    def __init__(self, workers=None, batch_size=256, checkpoint=None, reencode=False, threshold=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.reencode = reencode
+        self.threshold = threshold or Config.FACE_RECOGNITION['face_distance_threshold']
+        self.stats = {'enrolled': 0, 'reencoded': 0, 'duplicate': 0, 'failed': 0}
+        self._done = {}
+        self._user_ids = {}
+
+    def _load_checkpoint(self, source):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return {}
+        with open(self.checkpoint, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('source') != source:
+            raise ValueError(f"检查点属于另一个照片来源: {state.get('source')}")
+        # 旧版本的检查点中记录了失败的照片，丢弃后重新尝试
+        return {key: status for key, status in state['done'].items() if status != 'failed'}
+
+    def _save_checkpoint(self, source):
+        if not self.checkpoint:
+            return
+        # 先写临时文件再替换，中断时不会留下损坏的检查点
+        tmp_path = f'{self.checkpoint}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': source, 'done': self._done}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint)
+
+    def _mark(self, key, status):
+        self._done[key] = status
+        self.stats[status] += 1
+
+    def _process_batch(self, batch):
+        """batch 为 (key, username, 编码) 列表"""
+        batch.sort(key=lambda item: item[0])
+        encodings = np.array([item[2] for item in batch])
+        matches = FaceGallery.find_best_matches(encodings)
+        distances = pairwise_distances(encodings, encodings)
+
+        kept = np.zeros(len(batch), dtype=bool)
+        new_users, updates = [], []
+        for i, (key, username, encoding) in enumerate(batch):
+            if self.reencode and username in self._user_ids:
+                updates.append((self._user_ids[username], encoding))
+                self._mark(key, 'reencoded')
+                continue
+            match = matches[i]
+            if (match and match[2] < self.threshold) or np.any(distances[i, :i][kept[:i]] < self.threshold):
+                self._mark(key, 'duplicate')
+                continue
+            kept[i] = True
+            new_users.append((username, encoding))
+            self._mark(key, 'enrolled')
+
+        Database.update_face_encodings(updates)
+        Database.create_users(new_users)
+        # 把新用户同步进本进程的人脸库，后续批次与它们去重
+        FaceGallery.sync()
+
+    def run(self, path, name_from='file'):
+        source = PhotoSource(path, name_from)
+        self._done = self._load_checkpoint(source.path)
+        keys = [key for key in source.keys() if key not in self._done]
+        total = len(keys)
+        print(f"共 {total + len(self._done)} 张照片，已完成 {len(self._done)} 张，待处理 {total} 张")
+        if not keys:
+            return self.stats
+
+        FaceGallery.load()
+        if self.reencode:
+            self._user_ids = FaceGallery.user_ids_by_username()
+
+        processed = 0
+        start = time.perf_counter()
+        usernames = {key: source.username(key) for key in keys}
+        batch = []
+
+        def flush():
+            if batch:
+                self._process_batch(batch)
+                batch.clear()
+            self._save_checkpoint(source.path)
+            elapsed = time.perf_counter() - start
+            rate = processed / elapsed if elapsed else 0.0
+            eta = (total - processed) / rate if rate else 0.0
+            print(f"[{processed}/{total}] {rate:.1f} 张/秒, 注册 {self.stats['enrolled']}, "
+                  f"重新编码 {self.stats['reencoded']}, 重复 {self.stats['duplicate']}, "
+                  f"失败 {self.stats['failed']}, 预计剩余 {eta:.0f} 秒", flush=True)
+
+        # 使用 spawn 避免 fork 继承主进程中的数据库连接和线程状态
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        ) as pool:
+            photos = source.iter_photos(keys)
+            pending = set()
+            futures_keys = {}
+            exhausted = False
+            while pending or not exhausted:
+                # 限制在途任务数，压缩包中的照片不会一次性全部读入内存
+                while not exhausted and len(pending) < self.workers * 4:
+                    try:
+                        key, photo = next(photos)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = pool.submit(encode_photo, key, photo)
+                    futures_keys[future] = key
+                    pending.add(future)
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = futures_keys.pop(future)
+                    try:
+                        _, encoding, error = future.result()
+                    except Exception as e:
+                        encoding, error = None, str(e)
+                    processed += 1
+                    if encoding is None:
+                        print(f"跳过 {key}: {error}")
+                        self.stats['failed'] += 1
+                    else:
+                        batch.append((key, usernames[key], encoding))
+                if len(batch) >= self.batch_size:
+                    flush()
+        flush()
+        return self.stats
@@ -0,0 +1,192 @@
+import os
+import threading
+import numpy as np
+from config import Config
+from utils.database import Database
+from utils.encoding_codec import FaceEncodingCodec
+from utils.face_index import create_index
+from utils.gallery_store import EncodingStore, GallerySnapshot, IdentityTable
+from utils.metrics import Metrics
+
+class FaceGallery:
+    """进程内人脸编码库
+
+    所有用户的人脸编码保存在一块连续的紧凑矩阵中（EncodingStore，精度由
+    FACE_RECOGNITION['gallery_dtype'] 决定），用户 id 与用户名保存在整数数组和
+    UTF-8 字节块中（IdentityTable），不为每个用户创建 Python 对象。
+    配置了快照文件时以内存映射方式加载快照，再从数据库同步快照之后的新用户；
+    否则从数据库分批加载。之后注册的新用户直接追加到末尾。
+    检索由可插拔的索引后端完成（见 utils/face_index.py），精确后端对整块
+    矩阵做一次批量距离计算，近似后端只扫描部分候选。
+
+    _lock 只在修改编码库和取检索快照时短暂持有，检索本身在锁外进行（NumPy 距离计算
+    期间释放 GIL，并发的登录请求可以同时检索）；_sync_lock 串行化加载和增量同步，
+    同步等待数据库时不阻塞检索。两把锁总是先取 _sync_lock 再取 _lock。
+    """
+    ENCODING_DIM = 128
+
+    _lock = threading.RLock()
+    _sync_lock = threading.RLock()
+    _loaded = False
+    _store = EncodingStore(ENCODING_DIM)
+    _identities = IdentityTable()
+    # 本进程通过 add() 追加、id 大于 _synced_id 的用户，同步时跳过以免重复
+    _local_ids = set()
+    # 已从数据库同步到的最大用户 id，注册时本进程追加的用户不推进该值，
+    # 以免漏掉其他进程中 id 更小但尚未同步的新用户
+    _synced_id = 0
+    _index = None
+
+    @classmethod
+    def _append_rows(cls, rows):
+        """追加 (id, username, face_encoding) 数据库行"""
+        if not rows:
+            return
+        with cls._lock:
+            cls._synced_id = max(cls._synced_id, rows[-1][0])
+            rows = [row for row in rows if row[0] not in cls._local_ids]
+            cls._local_ids = {user_id for user_id in cls._local_ids if user_id > cls._synced_id}
+            if not rows:
+                return
+            # 整个结果集一次性解码为矩阵，直接写入编码库末尾
+            start = cls._store.size
+            cls._store.append(FaceEncodingCodec.decode_many([row[2] for row in rows], cls.ENCODING_DIM))
+            cls._identities.append([row[0] for row in rows], [row[1] for row in rows])
+            if cls._index is not None:
+                cls._index.add(cls._store, start, cls._store.size)
+
+    @classmethod
+    def _sync_from(cls, min_id):
+        """分批同步 id 大于 min_id 的用户，避免一次取回全部结果集"""
+        batch = Config.FACE_RECOGNITION['gallery_load_batch']
+        while True:
+            rows = Database.get_face_encodings(min_id, batch)
+            cls._append_rows(rows)
+            if len(rows) < batch:
+                return
+            min_id = rows[-1][0]
+
+    @classmethod
+    @Metrics.timed('gallery.load')
+    def load(cls):
+        """加载全部人脸编码：有快照时映射快照并同步之后的增量，否则从数据库加载"""
+        with cls._sync_lock, cls._lock:
+            cls._index = None
+            snapshot = Config.FACE_RECOGNITION['gallery_snapshot']
+            if snapshot and os.path.exists(snapshot):
+                cls._store, cls._identities, cls._synced_id = GallerySnapshot.load(snapshot)
+                # 快照可能包含写入时本进程追加、id 大于 synced_id 的用户
+                cls._local_ids = cls._identities.ids_above(cls._synced_id)
+                print(f"已映射人脸编码库快照: {snapshot}（{cls._store.size} 个用户）")
+            else:
+                cls._store = EncodingStore(cls.ENCODING_DIM, Config.FACE_RECOGNITION['gallery_dtype'])
+                cls._identities = IdentityTable()
+                cls._local_ids = set()
+                cls._synced_id = 0
+            cls._sync_from(cls._synced_id)
+            cls._index = create_index(Config.FACE_RECOGNITION, cls.ENCODING_DIM)
+            cls._index.build(cls._store)
+            cls._loaded = True
+            print(f"人脸编码库已加载: {cls._store.size} 个用户")
+
+    @classmethod
+    @Metrics.timed('gallery.sync')
+    def sync(cls):
+        """增量同步其他进程新注册的用户"""
+        with cls._sync_lock:
+            if not cls._loaded:
+                cls.load()
+                return
+            cls._sync_from(cls._synced_id)
+
+    @classmethod
+    def _ensure_loaded(cls):
+        """首次使用时加载编码库，不持有 _lock 调用，保证加锁顺序"""
+        if not cls._loaded:
+            with cls._sync_lock:
+                if not cls._loaded:
+                    cls.load()
+
+    @classmethod
+    def _snapshot(cls):
+        """(编码库只读视图, 用户表, 索引)，之后的检索不需要持有锁"""
+        cls._ensure_loaded()
+        with cls._lock:
+            return cls._store.view(), cls._identities, cls._index
+
+    @classmethod
+    def add(cls, user_id, username, face_encoding):
+        """注册成功后把新用户加入编码库"""
+        if not cls._loaded:
+            # 加载时会从数据库读到刚注册的用户
+            cls._ensure_loaded()
+            return
+        with cls._lock:
+            if user_id in cls._local_ids or (user_id <= cls._synced_id and cls._identities.contains(user_id)):
+                return
+            start = cls._store.size
+            cls._store.append(face_encoding)
+            cls._identities.append([user_id], [username])
+            cls._local_ids.add(user_id)
+            cls._index.add(cls._store, start, cls._store.size)
+
+    @classmethod
+    def size(cls):
+        """当前编码库中的用户数"""
+        return cls._store.size
+
+    @classmethod
+    def memory_usage(cls):
+        """编码库占用的内存，快照映射的部分由同一台机器上的所有进程共享"""
+        with cls._lock:
+            return {
+                'users': cls._store.size,
+                'dtype': cls._store.dtype,
+                'encoding_bytes': cls._store.nbytes,
+                'identity_bytes': cls._identities.nbytes,
+                'mapped': cls._store.is_mapped
+            }
+
+    @classmethod
+    def save_snapshot(cls, path):
+        """把当前编码库写入快照文件"""
+        cls._ensure_loaded()
+        with cls._lock:
+            GallerySnapshot.save(path, cls._store, cls._identities, cls._synced_id)
+
+    @classmethod
+    def user_ids_by_username(cls):
+        """{用户名: 用户 id}，同名用户取最后注册的"""
+        cls._ensure_loaded()
+        with cls._lock:
+            return {username: user_id for user_id, username in cls._identities.items()}
+
+    @classmethod
+    def find_best_match(cls, face_encoding):
+        """在编码库中查找距离最近的用户
+
+        返回 (user_id, username, distance)，编码库为空时返回 None。
+        """
+        store, identities, index = cls._snapshot()
+        if store.size == 0:
+            return None
+        rows, distances = index.search(store, face_encoding, k=1)
+        if rows.size == 0:
+            return None
+        best = int(rows[0])
+        return identities.user_id(best), identities.username(best), float(distances[0])
+
+    @classmethod
+    def find_best_matches(cls, face_encodings):
+        """批量查找每个编码距离最近的用户
+
+        返回与输入等长的列表，元素为 (user_id, username, distance)，编码库为空时为 None。
+        """
+        if len(face_encodings) == 0:
+            return []
+        store, identities, index = cls._snapshot()
+        rows, distances = index.search_batch(store, np.asarray(face_encodings))
+        return [
+            (identities.user_id(row), identities.username(row), float(distance)) if row >= 0 else None
+            for row, distance in zip(rows.tolist(), distances.tolist())
+        ]
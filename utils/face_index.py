@@ -0,0 +1,316 @@
+import threading
+import numpy as np
+
+class BruteForceIndex:
+    """精确检索：对编码库整块矩阵计算距离
+
+    编码库可以是 float64 矩阵，也可以是 utils/gallery_store.py 中的 EncodingStore，
+    后者在自身的存储精度上计算距离。
+    """
+
+    def __init__(self, dim=128):
+        self.dim = dim
+
+    def build(self, matrix):
+        """精确检索无需训练"""
+
+    def add(self, matrix, start, stop):
+        """精确检索直接读取编码库矩阵，无需额外维护"""
+
+    def search(self, matrix, query, k=1):
+        """返回距离最近的 k 个行号及其距离（按距离升序）"""
+        if matrix.shape[0] == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        distances = _distances(matrix, query)
+        return _top_k(np.arange(matrix.shape[0]), distances, k)
+
+    def search_batch(self, matrix, queries):
+        """批量查询每个向量最近的一行，返回 (行号数组, 距离数组)"""
+        return pairwise_nearest(queries, matrix)
+
+
+class IVFIndex:
+    """倒排文件近似检索（IVF）
+
+    用 k-means 把编码库划分为 nlist 个簇，查询时只扫描离查询向量最近的
+    nprobe 个簇。nprobe 越大召回率越高、延迟越大；nprobe == nlist 时等价于
+    精确检索。编码库小于 min_train_size 时退化为精确检索。
+
+    add() 发现需要（重新）训练时在后台线程中训练，期间继续使用旧的倒排列表
+    （首次训练前为精确检索），训练完成后整体替换，注册请求不必等待训练。
+    """
+
+    def __init__(self, dim=128, nlist=256, nprobe=8, min_train_size=10000,
+                 train_sample=100000, kmeans_iters=15, seed=0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.train_sample = train_sample
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        # (聚类中心, 倒排列表)，训练完成后整体替换，检索时只读取一次引用
+        self._model = None
+        self._trained_size = 0
+        # 已加入索引的行数
+        self._indexed = 0
+        self._lock = threading.Lock()
+        self._training = None
+
+    @property
+    def centroids(self):
+        return None if self._model is None else self._model[0]
+
+    @property
+    def is_trained(self):
+        return self._model is not None
+
+    def build(self, matrix, stop=None):
+        """训练聚类中心并把编码库前 stop 行（默认全部）分配到各个倒排列表"""
+        size = matrix.shape[0] if stop is None else stop
+        model = self._train(matrix, size)
+        with self._lock:
+            self._model = model
+            self._trained_size = size if model is not None else 0
+            self._indexed = size
+
+    def _train(self, matrix, size):
+        """在编码库前 size 行上训练，返回 (聚类中心, 倒排列表)，数据不足时返回 None"""
+        if size == 0 or size < self.min_train_size:
+            return None
+        nlist = min(self.nlist, size)
+        rng = np.random.default_rng(self.seed)
+        if size > self.train_sample:
+            sample = matrix[rng.choice(size, self.train_sample, replace=False)]
+        else:
+            sample = matrix[:size]
+        centroids = kmeans(sample, nlist, self.kmeans_iters, rng)
+        assignments = _nearest_centroids(matrix, centroids, stop=size)
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        return centroids, [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+
+    @staticmethod
+    def _append_rows(model, matrix, start, stop):
+        """把 [start, stop) 行分配到 model 的倒排列表"""
+        if stop <= start:
+            return
+        centroids, lists = model
+        assignments = _nearest_centroids(matrix[start:stop], centroids)
+        rows = np.arange(start, stop)
+        for list_id in np.unique(assignments):
+            lists[list_id] = np.concatenate([lists[list_id], rows[assignments == list_id]])
+
+    def add(self, matrix, start, stop):
+        """把编码库新增的 [start, stop) 行加入倒排列表，需要时在后台重新训练"""
+        with self._lock:
+            self._indexed = stop
+            if self._model is not None:
+                self._append_rows(self._model, matrix, start, stop)
+            # 首次达到 min_train_size 或数据量翻倍后重新训练，避免聚类中心与数据分布偏离过大
+            threshold = self.min_train_size if self._model is None else 2 * self._trained_size
+            if stop >= max(threshold, 1) and self._training is None:
+                self._training = threading.Thread(
+                    target=self._retrain, args=(matrix, stop), name='ivf-train', daemon=True
+                )
+                self._training.start()
+
+    def _retrain(self, matrix, stop):
+        """后台训练，完成后补上训练期间新增的行并替换模型"""
+        try:
+            model = self._train(matrix, stop)
+            with self._lock:
+                if model is not None:
+                    self._append_rows(model, matrix, stop, self._indexed)
+                    self._model = model
+                    self._trained_size = stop
+        except Exception as e:
+            print(f"IVF 索引训练失败: {str(e)}")
+        finally:
+            with self._lock:
+                self._training = None
+
+    def wait(self, timeout=None):
+        """等待正在进行的后台训练完成"""
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+
+    def search(self, matrix, query, k=1):
+        """返回近似最近的 k 个行号及其距离（按距离升序）"""
+        model = self._model
+        if model is None:
+            return BruteForceIndex(self.dim).search(matrix, query, k)
+        centroids, lists = model
+        centroid_distances = np.linalg.norm(centroids - query, axis=1)
+        nprobe = min(self.nprobe, len(lists))
+        probes = np.argpartition(centroid_distances, nprobe - 1)[:nprobe]
+        candidates = np.concatenate([lists[i] for i in probes])
+        # 检索在编码库的只读视图上进行，视图之后追加的行可能已加入倒排列表
+        candidates = candidates[candidates < matrix.shape[0]]
+        if candidates.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        distances = _distances(matrix, query, candidates)
+        return _top_k(candidates, distances, k)
+
+    def search_batch(self, matrix, queries):
+        """批量查询每个向量近似最近的一行，返回 (行号数组, 距离数组)，未找到时行号为 -1
+
+        一次距离矩阵算出全部查询要扫描的 nprobe 个簇，再按簇分组：每个倒排列表只取出
+        一次，与所有探查它的查询一起计算距离。
+        """
+        model = self._model
+        if model is None:
+            return pairwise_nearest(queries, matrix)
+        centroids, lists = model
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        rows = np.full(len(queries), -1, dtype=np.int64)
+        distances = np.full(len(queries), np.inf)
+        if len(queries) == 0:
+            return rows, distances
+
+        nprobe = min(self.nprobe, len(lists))
+        probes = np.argpartition(pairwise_distances(queries, centroids), nprobe - 1, axis=1)[:, :nprobe]
+        list_ids = probes.ravel()
+        query_ids = np.repeat(np.arange(len(queries)), nprobe)
+        order = np.argsort(list_ids, kind='stable')
+        list_ids, query_ids = list_ids[order], query_ids[order]
+        bounds = np.flatnonzero(np.diff(list_ids)) + 1
+        size = matrix.shape[0]
+        for group in np.split(np.arange(len(list_ids)), bounds):
+            candidates = lists[list_ids[group[0]]]
+            # 检索在编码库的只读视图上进行，视图之后追加的行可能已加入倒排列表
+            candidates = candidates[candidates < size]
+            if candidates.size == 0:
+                continue
+            group_queries = query_ids[group]
+            found, found_distances = _nearest_rows(matrix, queries[group_queries], candidates)
+            better = found_distances < distances[group_queries]
+            rows[group_queries[better]] = found[better]
+            distances[group_queries[better]] = found_distances[better]
+        return rows, distances
+
+
+def _distances(matrix, query, rows=None):
+    """query 到 matrix 全部行（或 rows 指定的行）的欧氏距离"""
+    if hasattr(matrix, 'distances'):
+        return matrix.distances(query, rows)
+    block = matrix if rows is None else matrix[rows]
+    return np.linalg.norm(block - query, axis=1)
+
+
+def _nearest_rows(matrix, queries, rows):
+    """queries 每行在 matrix 的 rows 行中最近的一行，返回 (行号数组, 距离数组)"""
+    if hasattr(matrix, 'nearest'):
+        return matrix.nearest(queries, rows)
+    found, distances = pairwise_nearest(queries, matrix[rows])
+    return rows[found], distances
+
+
+def _top_k(rows, distances, k):
+    """从候选中取距离最小的 k 个"""
+    if distances.size > k:
+        part = np.argpartition(distances, k - 1)[:k]
+        rows, distances = rows[part], distances[part]
+    order = np.argsort(distances)
+    return rows[order], distances[order]
+
+
+def pairwise_distances(a, b):
+    """a 与 b 各行之间的欧氏距离矩阵 (len(a), len(b))
+
+    按 |x|^2 + |y|^2 - 2x·y 展开，一次矩阵乘法完成全部两两距离。
+    """
+    squared = (
+        np.einsum('ij,ij->i', a, a)[:, None]
+        + np.einsum('ij,ij->i', b, b)[None, :]
+        - 2.0 * (a @ b.T)
+    )
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def pairwise_nearest(queries, matrix, chunk_size=1024):
+    """queries 每行在 matrix 中最近的一行，返回 (行号数组, 距离数组)
+
+    按查询分块计算，避免查询数和编码库都很大时距离矩阵占用过多内存。
+    matrix 为空时行号为 -1、距离为 inf。
+    """
+    if hasattr(matrix, 'nearest'):
+        return matrix.nearest(queries)
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+    rows = np.full(len(queries), -1, dtype=np.int64)
+    distances = np.full(len(queries), np.inf)
+    if matrix.shape[0] == 0:
+        return rows, distances
+    for start in range(0, len(queries), chunk_size):
+        block = pairwise_distances(queries[start:start + chunk_size], matrix)
+        nearest = block.argmin(axis=1)
+        rows[start:start + len(block)] = nearest
+        distances[start:start + len(block)] = block[np.arange(len(block)), nearest]
+    return rows, distances
+
+
+def _nearest_centroids(vectors, centroids, chunk_size=65536, stop=None):
+    """分块计算前 stop 个（默认全部）向量最近的聚类中心，控制临时矩阵的内存占用"""
+    size = vectors.shape[0] if stop is None else stop
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    assignments = np.empty(size, dtype=np.int64)
+    for begin in range(0, size, chunk_size):
+        chunk = vectors[begin:min(begin + chunk_size, size)]
+        # ||x - c||^2 = ||x||^2 - 2x·c + ||c||^2，||x||^2 对 argmin 无影响
+        scores = centroid_norms - 2.0 * chunk @ centroids.T
+        assignments[begin:begin + chunk_size] = np.argmin(scores, axis=1)
+    return assignments
+
+
+def kmeans(vectors, k, iters, rng, seed_sample_factor=8):
+    """纯 NumPy 实现的 k-means（k-means++ 初始化 + Lloyd 迭代）
+
+    k-means++ 初始化需要 k 次全量扫描，只在 seed_sample_factor * k 个采样点上进行。
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    n = vectors.shape[0]
+    seeds = vectors
+    if n > seed_sample_factor * k:
+        seeds = vectors[rng.choice(n, seed_sample_factor * k, replace=False)]
+    centroids = np.empty((k, vectors.shape[1]), dtype=np.float64)
+    centroids[0] = seeds[rng.integers(seeds.shape[0])]
+    closest = np.sum((seeds - centroids[0]) ** 2, axis=1)
+    for i in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            centroids[i] = seeds[rng.integers(seeds.shape[0])]
+        else:
+            centroids[i] = seeds[rng.choice(seeds.shape[0], p=closest / total)]
+        closest = np.minimum(closest, np.sum((seeds - centroids[i]) ** 2, axis=1))
+
+    for _ in range(iters):
+        assignments = _nearest_centroids(vectors, centroids)
+        sums = np.empty_like(centroids)
+        for d in range(vectors.shape[1]):
+            sums[:, d] = np.bincount(assignments, weights=vectors[:, d], minlength=k)
+        counts = np.bincount(assignments, minlength=k)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+        # 空簇重新随机选点，避免浪费倒排列表
+        empty = np.flatnonzero(~non_empty)
+        if empty.size:
+            centroids[empty] = vectors[rng.choice(n, empty.size, replace=False)]
+    return centroids
+
+
+def create_index(config, dim=128):
+    """根据 Config.FACE_RECOGNITION 创建检索后端"""
+    backend = config.get('index_backend', 'brute_force')
+    if backend == 'brute_force':
+        return BruteForceIndex(dim)
+    if backend == 'ivf':
+        return IVFIndex(
+            dim,
+            nlist=config.get('ivf_nlist', 256),
+            nprobe=config.get('ivf_nprobe', 8),
+            min_train_size=config.get('ivf_min_train_size', 10000),
+            train_sample=config.get('ivf_train_sample', 100000),
+            kmeans_iters=config.get('ivf_kmeans_iters', 15)
+        )
+    raise ValueError(f'未知的人脸检索后端: {backend}')
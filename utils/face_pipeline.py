@@ -0,0 +1,124 @@
+from config import Config
+from utils.image_processor import ImageProcessor
+from utils.face_recognition import FaceRecognition
+from utils.emotion_analyzer import EmotionAnalyzer
+
+class FaceAnalysis:
+    """单帧人脸分析结果
+
+    人脸位置在创建时只检测一次，编码、关键点、人脸裁剪和情绪在首次访问时
+    基于这次检测结果计算并缓存，避免各阶段各自对整帧重复检测。
+    多张人脸时与原有接口一致，单数形式的属性取第一张；encodings / emotions
+    覆盖所有人脸。
+    """
+
+    def __init__(self, img, face_locations, tracked=False):
+        self.img = img
+        self.face_locations = face_locations
+        # 是否是在上一帧人脸附近找到的（而不是整帧检测）
+        self.tracked = tracked
+        self._encoding = None
+        self._landmarks = None
+        self._roi = None
+        self._face_crop = None
+        self._emotion = None
+        self._encodings = None
+        self._emotions = None
+
+    @property
+    def face_location(self):
+        """(top, right, bottom, left)"""
+        return self.face_locations[0]
+
+    @property
+    def roi(self):
+        """(人脸四周的区域图像, 区域内的人脸框)，编码和关键点只在该区域上计算"""
+        if self._roi is None:
+            self._roi = ImageProcessor.crop_roi(
+                self.img, self.face_location, Config.FACE_RECOGNITION['roi_padding']
+            )
+        return self._roi
+
+    @property
+    def encoding(self):
+        """人脸编码"""
+        if self._encoding is None:
+            roi, location = self.roi
+            self._encoding = FaceRecognition.get_face_encoding(roi, [location])
+        return self._encoding
+
+    @property
+    def landmarks(self):
+        """人脸关键点（原图坐标）"""
+        if self._landmarks is None:
+            roi, location = self.roi
+            landmarks = FaceRecognition.get_face_landmarks(roi, [location])
+            dy, dx = self.face_location[0] - location[0], self.face_location[3] - location[3]
+            self._landmarks = {
+                name: [(x + dx, y + dy) for x, y in points] for name, points in landmarks.items()
+            }
+        return self._landmarks
+
+    @property
+    def face_crop(self):
+        """带边距的人脸区域，供下游模型使用的小图"""
+        if self._face_crop is None:
+            self._face_crop = ImageProcessor.crop_face(
+                self.img, self.face_location, Config.FACE_RECOGNITION['face_crop_padding']
+            )
+        return self._face_crop
+
+    @property
+    def emotion(self):
+        """情绪分析结果，直接在人脸区域上推理，跳过 DeepFace 内部检测"""
+        if self._emotion is None:
+            self._emotion = EmotionAnalyzer.analyze_face(self.face_crop)
+        return self._emotion
+
+    @property
+    def encodings(self):
+        """所有人脸的编码，(人脸数, 128) 矩阵，整帧上一次计算"""
+        if self._encodings is None:
+            self._encodings = FaceRecognition.get_face_encodings(self.img, self.face_locations)
+        return self._encodings
+
+    @property
+    def emotions(self):
+        """所有人脸的情绪分析结果，各人脸区域合并为一次推理"""
+        if self._emotions is None:
+            padding = Config.FACE_RECOGNITION['face_crop_padding']
+            self._emotions = EmotionAnalyzer.analyze_faces([
+                ImageProcessor.crop_face(self.img, location, padding) for location in self.face_locations
+            ])
+        return self._emotions
+
+
+class FacePipeline:
+    @staticmethod
+    def process(img, hint=None):
+        """检测一次人脸，返回可供各阶段复用的 FaceAnalysis
+
+        传入上一帧的人脸框 hint 时先只在其附近检测，找不到再整帧检测。
+        """
+        if hint is not None:
+            try:
+                return FaceAnalysis(
+                    img,
+                    FaceRecognition.detect_face_near(img, hint, Config.TRACKING['search_margin']),
+                    tracked=True
+                )
+            except ValueError:
+                pass
+        return FaceAnalysis(img, FaceRecognition.detect_face(img))
+
+    @staticmethod
+    def process_all(img, max_faces=None):
+        """检测画面中的所有人脸，超过 max_faces 张时只保留面积最大的几张"""
+        face_locations = FaceRecognition.detect_face(img)
+        if max_faces and len(face_locations) > max_faces:
+            face_locations = sorted(
+                face_locations,
+                key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]),
+                reverse=True
+            )[:max_faces]
+        return FaceAnalysis(img, face_locations)
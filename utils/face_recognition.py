@@ -1,28 +1,72 @@
-import face_recognition
 import numpy as np
 from config import Config
+from utils.face_gallery import FaceGallery
+from utils.image_processor import ImageProcessor
+from utils.model_registry import ModelRegistry
+from utils.metrics import Metrics
 
 class FaceRecognition:
     @staticmethod
-    def detect_face(img):
-        """检测人脸"""
-        face_locations = face_recognition.face_locations(img)
+    @Metrics.timed('face.detect')
+    def detect_face(img, max_width=None):
+        """检测人脸
+
+        在宽度不超过 max_width（默认取 detection_max_width）的缩小图上检测，
+        返回原图坐标系下的人脸框。
+        """
+        if max_width is None:
+            max_width = Config.FACE_RECOGNITION['detection_max_width']
+        small, scale = ImageProcessor.downscale(img, max_width)
+        face_locations = ModelRegistry.face_recognition().face_locations(small)
         if not face_locations:
             raise ValueError('未检测到人脸')
+        if scale != 1.0:
+            face_locations = [ImageProcessor.scale_face_location(loc, scale, img.shape) for loc in face_locations]
         return face_locations
 
     @staticmethod
-    def get_face_encoding(img):
-        """获取人脸编码"""
-        face_encodings = face_recognition.face_encodings(img)
+    @Metrics.timed('face.detect_near')
+    def detect_face_near(img, face_location, margin=0.5):
+        """只在 face_location 四周扩展 margin 倍人脸宽高的区域内检测人脸
+
+        返回原图坐标系下的人脸框，区域内没有人脸时抛出 ValueError。
+        """
+        top, right, bottom, left = face_location
+        margin_y = int((bottom - top) * margin)
+        margin_x = int((right - left) * margin)
+        height, width = img.shape[:2]
+        roi_top, roi_left = max(top - margin_y, 0), max(left - margin_x, 0)
+        roi = img[roi_top:min(bottom + margin_y, height), roi_left:min(right + margin_x, width)]
+        return [
+            (r_top + roi_top, r_right + roi_left, r_bottom + roi_top, r_left + roi_left)
+            for r_top, r_right, r_bottom, r_left in FaceRecognition.detect_face(roi)
+        ]
+
+    @staticmethod
+    @Metrics.timed('face.encode')
+    def get_face_encoding(img, face_locations=None):
+        """获取人脸编码
+
+        传入已检测到的 face_locations 时不再重复检测人脸。
+        """
+        face_encodings = ModelRegistry.face_recognition().face_encodings(img, known_face_locations=face_locations)
         if not face_encodings:
             raise ValueError('未检测到人脸特征')
         return face_encodings[0]
 
+    @staticmethod
+    @Metrics.timed('face.encode_batch')
+    def get_face_encodings(img, face_locations):
+        """一次计算 face_locations 中所有人脸的编码，返回 (人脸数, 128) 矩阵"""
+        face_encodings = ModelRegistry.face_recognition().face_encodings(img, known_face_locations=face_locations)
+        if len(face_encodings) != len(face_locations):
+            raise ValueError('未检测到人脸特征')
+        return np.array(face_encodings)
+
     @staticmethod
     def calculate_face_distance(known_face_encoding, face_encoding_to_check):
         """计算人脸距离"""
-        return face_recognition.face_distance([known_face_encoding], face_encoding_to_check)[0]
+        return ModelRegistry.face_recognition().face_distance([known_face_encoding], face_encoding_to_check)[0]
 
     @staticmethod
     def check_face_similarity(face_encoding, stored_encoding):
@@ -31,9 +75,42 @@ class FaceRecognition:
         return distance < Config.FACE_RECOGNITION['face_distance_threshold']
 
     @staticmethod
-    def get_face_landmarks(img):
-        """获取人脸关键点"""
-        landmarks = face_recognition.face_landmarks(img)
+    @Metrics.timed('face.match')
+    def find_best_match(face_encoding):
+        """在人脸编码库中检索最接近的已注册用户
+
+        返回 (user_id, username, distance)，编码库为空时返回 None。
+        本进程未命中时先同步其他进程新注册的用户再检索一次。
+        """
+        match = FaceGallery.find_best_match(face_encoding)
+        if match is None or match[2] >= Config.FACE_RECOGNITION['face_distance_threshold']:
+            FaceGallery.sync()
+            match = FaceGallery.find_best_match(face_encoding)
+        return match
+
+    @staticmethod
+    @Metrics.timed('face.match_batch')
+    def find_best_matches(face_encodings):
+        """批量检索每个人脸编码最接近的已注册用户，整个编码库只做一次矩阵运算
+
+        返回与输入等长的列表，元素为 (user_id, username, distance) 或 None。
+        有未命中的编码时先同步其他进程新注册的用户再检索一次。
+        """
+        threshold = Config.FACE_RECOGNITION['face_distance_threshold']
+        matches = FaceGallery.find_best_matches(face_encodings)
+        if any(match is None or match[2] >= threshold for match in matches):
+            FaceGallery.sync()
+            matches = FaceGallery.find_best_matches(face_encodings)
+        return matches
+
+    @staticmethod
+    @Metrics.timed('face.landmarks')
+    def get_face_landmarks(img, face_locations=None):
+        """获取人脸关键点
+
+        传入已检测到的 face_locations 时不再重复检测人脸。
+        """
+        landmarks = ModelRegistry.face_recognition().face_landmarks(img, face_locations=face_locations)
         if not landmarks:
             raise ValueError('未检测到人脸特征点')
         return landmarks[0] 
\ No newline at end of file
@@ -0,0 +1,85 @@
+import threading
+from config import Config
+from utils.ttl_cache import TTLCache
+
+class FaceTracker:
+    """单个会话的人脸跟踪状态
+
+    - 记录上一帧的人脸框和时间，下一帧只在其附近检测（hint）
+    - 跟踪持续超过 full_detect_interval 秒后强制整帧检测一次，防止跟错人脸
+    - 缓存最近一次身份检索结果，人脸一直在画面中且未超过 reverify_interval 秒时
+      直接复用，不再计算编码和检索人脸库
+    """
+
+    def __init__(self, config=None):
+        config = config or Config.TRACKING
+        self.max_gap = config['max_gap']
+        self.full_detect_interval = config['full_detect_interval']
+        self.reverify_interval = config['reverify_interval']
+
+        self.location = None
+        self.seen_at = None
+        self.full_detect_at = None
+        self.identity = None
+        self.verified_at = None
+
+    def _tracking(self, now):
+        return self.location is not None and now - self.seen_at <= self.max_gap
+
+    def hint(self, now):
+        """下一帧的检测提示；跟踪丢失或到了整帧检测的时间时返回 None"""
+        if not self._tracking(now) or now - self.full_detect_at >= self.full_detect_interval:
+            return None
+        return self.location
+
+    def observe(self, location, tracked, now):
+        """记录本帧的人脸框，tracked 表示是否在 hint 附近找到"""
+        if not tracked:
+            # 整帧检测到的人脸与之前跟踪的人脸不相连时，缓存的身份作废
+            if not self._tracking(now) or not self._overlaps(location):
+                self.identity = None
+            self.full_detect_at = now
+        self.location = tuple(location)
+        self.seen_at = now
+
+    def _overlaps(self, location):
+        """新人脸框的中心是否落在上一帧人脸框内"""
+        top, right, bottom, left = self.location
+        center_y = (location[0] + location[2]) / 2
+        center_x = (location[1] + location[3]) / 2
+        return top <= center_y <= bottom and left <= center_x <= right
+
+    def lost(self):
+        """本帧未检测到人脸"""
+        self.location = None
+        self.identity = None
+
+    def cached_identity(self, now):
+        """仍然有效的身份检索结果，没有时返回 None"""
+        if self.identity is None or not self._tracking(now) or now - self.verified_at >= self.reverify_interval:
+            return None
+        return self.identity
+
+    def remember_identity(self, identity, now):
+        self.identity = identity
+        self.verified_at = now
+
+
+class FaceTrackerStore:
+    """按会话保存 FaceTracker，闲置超过 session_ttl 秒或超出 max_sessions 时淘汰"""
+    _lock = threading.Lock()
+    _trackers = TTLCache(Config.TRACKING['max_sessions'], Config.TRACKING['session_ttl'])
+
+    @classmethod
+    def get(cls, key):
+        with cls._lock:
+            tracker = cls._trackers.get(key)
+            if tracker is None:
+                tracker = FaceTracker()
+            # 每次访问都重新计时
+            cls._trackers.set(key, tracker)
+            return tracker
+
+    @classmethod
+    def drop(cls, key):
+        cls._trackers.delete(key)
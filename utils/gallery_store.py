@@ -0,0 +1,344 @@
+import copy
+import json
+import os
+from array import array
+import numpy as np
+
+
+class EncodingStore:
+    """紧凑的人脸编码矩阵
+
+    - 存储精度 dtype 为 float64 / float32 / float16 / int8；int8 对称量化，x ≈ q * scale，
+      scale 固定由 INT8_RANGE 确定（超出范围的值截断），与数据的加入顺序无关，
+      一个个追加的新用户与快照中批量写入的用户量化方式相同
+    - 每行另存反量化后向量的平方范数，距离按 |x|^2 - 2x·q + |q|^2 计算：float32 直接
+      矩阵乘，float16 / int8 分块转为 float32 后计算，不会生成整块的高精度副本
+    - 由两段组成：只读的基础段（可以是快照文件的内存映射，多个进程共享同一份物理页）
+      和进程内按倍数扩容的增量段
+
+    支持 shape、len() 和切片 / 行号数组下标（返回反量化后的 float64 行），可以直接
+    交给 utils/face_index.py 中的检索后端。
+    """
+    DTYPES = {'float64': np.float64, 'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+    # 低精度编码分块转换的行数，转换结果留在 CPU 缓存中再做矩阵乘
+    CHUNK_ROWS = 1024
+    # float16 -> float32 查表转换，比逐元素 astype 快
+    HALF_TABLE = np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.float16).astype(np.float32)
+    # int8 量化范围 [-INT8_RANGE, INT8_RANGE]，覆盖 dlib 人脸编码各维的取值
+    INT8_RANGE = 0.5
+
+    def __init__(self, dim=128, dtype='float32', scale=None, base=None, base_norms=None):
+        if dtype not in self.DTYPES:
+            raise ValueError(f'不支持的编码库精度: {dtype}')
+        self.dim = dim
+        self.dtype = dtype
+        self.storage_dtype = self.DTYPES[dtype]
+        # float64 存储时按 float64 计算，其余按 float32 计算
+        self.compute_dtype = np.float64 if dtype == 'float64' else np.float32
+        if scale is None and dtype == 'int8':
+            scale = np.full(dim, self.INT8_RANGE / 127)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+        self._base = base if base is not None else np.empty((0, dim), dtype=self.storage_dtype)
+        self._base_norms = base_norms if base_norms is not None else np.empty(0, dtype=self.compute_dtype)
+        self._tail = np.empty((0, dim), dtype=self.storage_dtype)
+        self._tail_norms = np.empty(0, dtype=self.compute_dtype)
+        self._tail_size = 0
+
+    @property
+    def size(self):
+        return self._base.shape[0] + self._tail_size
+
+    @property
+    def shape(self):
+        return self.size, self.dim
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        """编码与范数实际占用的字节数（增量段按已使用的行计）"""
+        row_bytes = self.dim * np.dtype(self.storage_dtype).itemsize + np.dtype(self.compute_dtype).itemsize
+        return self.size * row_bytes
+
+    @property
+    def is_mapped(self):
+        return isinstance(self._base, np.memmap)
+
+    def view(self):
+        """当前全部行的只读视图
+
+        与原编码库共享底层数组，不复制数据。append 只写入视图范围之外的行或换用新数组，
+        视图中已有的行不会改变，之后追加的行对视图不可见。视图本身不能再 append。
+        """
+        return copy.copy(self)
+
+    def _segments(self):
+        """[(起始行号, 编码, 范数)]"""
+        return [
+            (0, self._base, self._base_norms),
+            (self._base.shape[0], self._tail[:self._tail_size], self._tail_norms[:self._tail_size])
+        ]
+
+    def _quantize(self, encodings):
+        if self.dtype != 'int8':
+            return encodings.astype(self.storage_dtype)
+        return np.clip(np.rint(encodings / self.scale), -127, 127).astype(np.int8)
+
+    def _dequantize(self, data):
+        block = self._upcast(data)
+        if self.scale is not None:
+            # 只有 int8 有 scale，此时 _upcast 返回的是新数组
+            block *= self.scale
+        return block
+
+    def append(self, encodings):
+        """追加 (n, dim) 编码"""
+        encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, self.dim)
+        if encodings.shape[0] == 0:
+            return
+        data = self._quantize(encodings)
+        required = self._tail_size + data.shape[0]
+        if required > self._tail.shape[0]:
+            capacity = max(required, self._tail.shape[0] * 2, 64)
+            tail = np.empty((capacity, self.dim), dtype=self.storage_dtype)
+            tail[:self._tail_size] = self._tail[:self._tail_size]
+            norms = np.empty(capacity, dtype=self.compute_dtype)
+            norms[:self._tail_size] = self._tail_norms[:self._tail_size]
+            self._tail, self._tail_norms = tail, norms
+        dequantized = self._dequantize(data)
+        self._tail[self._tail_size:required] = data
+        self._tail_norms[self._tail_size:required] = np.einsum('ij,ij->i', dequantized, dequantized)
+        self._tail_size = required
+
+    def raw(self):
+        """(存储精度的全部编码, 范数)，用于写快照"""
+        segments = self._segments()
+        return (np.concatenate([data for _, data, _ in segments]),
+                np.concatenate([norms for _, _, norms in segments]))
+
+    def _gather(self, rows):
+        """按行号取出存储精度的编码与范数"""
+        base_size = self._base.shape[0]
+        data = np.empty((rows.size, self.dim), dtype=self.storage_dtype)
+        norms = np.empty(rows.size, dtype=self.compute_dtype)
+        in_base = rows < base_size
+        data[in_base] = self._base[rows[in_base]]
+        norms[in_base] = self._base_norms[rows[in_base]]
+        tail_rows = rows[~in_base] - base_size
+        data[~in_base] = self._tail[tail_rows]
+        norms[~in_base] = self._tail_norms[tail_rows]
+        return data, norms
+
+    def __getitem__(self, key):
+        """反量化后的 float64 行，key 为连续切片或行号数组"""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            if step != 1:
+                raise ValueError('只支持连续切片')
+            parts = [
+                data[max(start - offset, 0):max(stop - offset, 0)]
+                for offset, data, _ in self._segments()
+            ]
+            data = np.concatenate(parts)
+        else:
+            data, _ = self._gather(np.asarray(key, dtype=np.int64))
+        return self._dequantize(data).astype(np.float64)
+
+    def _upcast(self, block):
+        """把一块存储精度的编码转换为计算精度（不乘 scale）"""
+        if block.dtype == self.compute_dtype:
+            return block
+        if block.dtype == np.float16:
+            return np.take(self.HALF_TABLE, block.view(np.uint16))
+        return block.astype(self.compute_dtype)
+
+    def _dot(self, data, query):
+        """data 各行与 query 的内积，低精度存储时分块转换"""
+        if data.dtype == self.compute_dtype:
+            return data @ query
+        result = np.empty(data.shape[0], dtype=self.compute_dtype)
+        for begin in range(0, data.shape[0], self.CHUNK_ROWS):
+            result[begin:begin + self.CHUNK_ROWS] = self._upcast(data[begin:begin + self.CHUNK_ROWS]) @ query
+        return result
+
+    def _prepare(self, queries):
+        """返回 (乘以 scale 后的查询, 查询的平方范数)"""
+        queries = np.asarray(queries, dtype=self.compute_dtype)
+        squared = np.einsum('...i,...i->...', queries, queries)
+        if self.scale is not None:
+            queries = queries * self.scale
+        return queries, squared
+
+    def distances(self, query, rows=None):
+        """query 到全部行（或 rows 指定的行）的欧氏距离"""
+        query, query_norm = self._prepare(np.ravel(query))
+        if rows is None:
+            segments = self._segments()
+            dots = np.concatenate([self._dot(data, query) for _, data, _ in segments])
+            norms = np.concatenate([norms for _, _, norms in segments])
+        else:
+            data, norms = self._gather(np.asarray(rows, dtype=np.int64))
+            dots = self._dot(data, query)
+        return np.sqrt(np.maximum(norms - 2 * dots + query_norm, 0)).astype(np.float64)
+
+    def nearest(self, queries, rows=None):
+        """每个查询在全部行（或 rows 指定的行）中最近的一行
+
+        返回 (行号数组, 距离数组)，没有数据时行号为 -1、距离为 inf。
+        """
+        queries, query_norms = self._prepare(np.atleast_2d(queries))
+        if rows is None:
+            segments = self._segments()
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            data, norms = self._gather(rows)
+            segments = [(0, data, norms)]
+        best_rows = np.full(len(queries), -1, dtype=np.int64)
+        best = np.full(len(queries), np.inf)
+        # 查询较少时加大分块，减少循环次数；同时控制 (块行数 × 查询数) 距离矩阵的大小
+        chunk = max(64, min(16 * self.CHUNK_ROWS, (1 << 22) // max(len(queries), 1)))
+        columns = np.arange(len(queries))
+        for offset, data, norms in segments:
+            for begin in range(0, data.shape[0], chunk):
+                block = self._upcast(data[begin:begin + chunk])
+                squared = norms[begin:begin + chunk, None] - 2 * (block @ queries.T) + query_norms[None, :]
+                nearest = squared.argmin(axis=0)
+                values = squared[nearest, columns]
+                better = values < best
+                best[better] = values[better]
+                best_rows[better] = offset + begin + nearest[better]
+        if rows is not None:
+            found = best_rows >= 0
+            best_rows[found] = rows[best_rows[found]]
+        return best_rows, np.sqrt(np.maximum(best, 0))
+
+
+class IdentityTable:
+    """编码库各行对应的用户 id 与用户名
+
+    用户 id 存在整数数组中，用户名按 UTF-8 拼接为一整块字节并记录偏移，不为每个用户
+    创建 Python 对象。与 EncodingStore 一样分为只读的基础段（可来自快照的内存映射）
+    和进程内追加的增量段（array('q') 与 bytearray）。
+    """
+
+    def __init__(self, base_ids=None, base_names=None, base_offsets=None):
+        self._base_ids = base_ids if base_ids is not None else np.empty(0, dtype=np.int64)
+        self._base_names = base_names if base_names is not None else np.empty(0, dtype=np.uint8)
+        self._base_offsets = base_offsets if base_offsets is not None else np.zeros(1, dtype=np.int64)
+        self._ids = array('q')
+        self._names = bytearray()
+        self._offsets = array('q', [0])
+
+    def __len__(self):
+        return len(self._base_ids) + len(self._ids)
+
+    @property
+    def nbytes(self):
+        return (self._base_ids.nbytes + self._base_names.nbytes + self._base_offsets.nbytes
+                + self._ids.itemsize * len(self._ids) + len(self._names)
+                + self._offsets.itemsize * len(self._offsets))
+
+    def append(self, user_ids, usernames):
+        for user_id, username in zip(user_ids, usernames):
+            self._ids.append(user_id)
+            self._names += username.encode('utf-8')
+            self._offsets.append(len(self._names))
+
+    def user_id(self, row):
+        base_size = len(self._base_ids)
+        return int(self._base_ids[row]) if row < base_size else self._ids[row - base_size]
+
+    def username(self, row):
+        base_size = len(self._base_ids)
+        if row < base_size:
+            begin, end = self._base_offsets[row], self._base_offsets[row + 1]
+            return bytes(self._base_names[begin:end]).decode('utf-8')
+        row -= base_size
+        return self._names[self._offsets[row]:self._offsets[row + 1]].decode('utf-8')
+
+    def contains(self, user_id):
+        return bool((self._base_ids == user_id).any()) or user_id in self._ids
+
+    def ids_above(self, user_id):
+        """id 大于 user_id 的用户"""
+        return {int(i) for i in self._base_ids[self._base_ids > user_id]} | {i for i in self._ids if i > user_id}
+
+    def items(self):
+        """逐行返回 (user_id, username)"""
+        for row in range(len(self)):
+            yield self.user_id(row), self.username(row)
+
+    def arrays(self):
+        """(全部 id, 用户名字节, 偏移)，用于写快照"""
+        ids = np.concatenate([self._base_ids, np.frombuffer(self._ids, dtype=np.int64)])
+        names = np.concatenate([self._base_names, np.frombuffer(bytes(self._names), dtype=np.uint8)])
+        offsets = np.concatenate([
+            self._base_offsets, np.frombuffer(self._offsets, dtype=np.int64)[1:] + self._base_offsets[-1]
+        ])
+        return ids, names, offsets
+
+
+class GallerySnapshot:
+    """编码库快照文件
+
+    文件布局：4096 字节头部（魔数 + JSON 描述）之后依次为编码、范数、量化比例、
+    用户 id、用户名字节和偏移各段，每段按 64 字节对齐。加载时各段以只读内存映射打开，
+    同一台机器上的多个 Web 进程共享操作系统页缓存中的同一份数据。
+    """
+    MAGIC = b'FGSNAP01'
+    HEADER_SIZE = 4096
+    ALIGN = 64
+
+    @classmethod
+    def save(cls, path, store, identities, synced_id):
+        """写入快照（先写临时文件再替换，正在使用旧快照的进程不受影响）"""
+        encodings, norms = store.raw()
+        ids, names, offsets = identities.arrays()
+        sections = {'encodings': encodings, 'norms': norms, 'ids': ids, 'names': names, 'offsets': offsets}
+        if store.scale is not None:
+            sections['scale'] = store.scale
+
+        layout, position = {}, cls.HEADER_SIZE
+        for name, data in sections.items():
+            layout[name] = {'offset': position, 'dtype': data.dtype.str, 'shape': list(data.shape)}
+            position += -(-data.nbytes // cls.ALIGN) * cls.ALIGN
+        header = json.dumps({
+            'dtype': store.dtype, 'dim': store.dim, 'size': store.size,
+            'synced_id': int(synced_id), 'sections': layout
+        }).encode('utf-8')
+        if len(cls.MAGIC) + len(header) > cls.HEADER_SIZE:
+            raise ValueError('快照头部过大')
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(cls.MAGIC + header)
+            for name, data in sections.items():
+                f.seek(layout[name]['offset'])
+                f.write(np.ascontiguousarray(data).tobytes())
+            f.truncate(position)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """以内存映射打开快照，返回 (EncodingStore, IdentityTable, synced_id)"""
+        with open(path, 'rb') as f:
+            head = f.read(cls.HEADER_SIZE)
+        if not head.startswith(cls.MAGIC):
+            raise ValueError(f'不是人脸编码库快照: {path}')
+        header = json.loads(head[len(cls.MAGIC):].rstrip(b'\0').decode('utf-8'))
+
+        sections = {}
+        for name, spec in header['sections'].items():
+            shape = tuple(spec['shape'])
+            if np.prod(shape) == 0:
+                sections[name] = np.empty(shape, dtype=spec['dtype'])
+            else:
+                sections[name] = np.memmap(path, dtype=spec['dtype'], mode='r', offset=spec['offset'], shape=shape)
+        store = EncodingStore(
+            header['dim'], header['dtype'],
+            scale=np.array(sections['scale']) if 'scale' in sections else None,
+            base=sections['encodings'], base_norms=sections['norms']
+        )
+        identities = IdentityTable(sections['ids'], sections['names'], sections['offsets'])
+        return store, identities, header['synced_id']
@@ -2,9 +2,11 @@ import cv2
 import numpy as np
 import base64
 from config import Config
+from utils.metrics import Metrics
 
 class ImageProcessor:
     @staticmethod
+    @Metrics.timed('decode')
     def decode_base64_image(base64_string):
         """解码base64图像数据"""
         try:
@@ -20,6 +22,21 @@ class ImageProcessor:
             raise ValueError(f'图片处理失败: {str(e)}')
 
     @staticmethod
+    @Metrics.timed('decode')
+    def decode_image_bytes(image_bytes):
+        """解码二进制图像数据（JPEG/PNG 等）
+
+        image_bytes 可以是 bytes、bytearray 或 memoryview，np.frombuffer
+        直接引用原缓冲区，解码前不产生额外拷贝。
+        """
+        nparr = np.frombuffer(image_bytes, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError('图片解码失败')
+        return img
+
+    @staticmethod
+    @Metrics.timed('quality_check')
     def check_image_quality(img):
         """检查图像质量"""
         if img.shape[0] < Config.FACE_RECOGNITION['min_quality_width'] or \
@@ -34,4 +51,56 @@ class ImageProcessor:
         max_dim = max(height, width)
         scale = target_size / max_dim
         new_height, new_width = int(height * scale), int(width * scale)
-        return cv2.resize(img, (new_width, new_height)) 
\ No newline at end of file
+        return cv2.resize(img, (new_width, new_height))
+
+    @staticmethod
+    def downscale(img, max_width):
+        """把宽度超过 max_width 的图像等比缩小，返回 (缩放后的图像, 缩放比例)
+
+        未超过或 max_width 为 0 时原样返回，比例为 1.0。
+        """
+        height, width = img.shape[:2]
+        if not max_width or width <= max_width:
+            return img, 1.0
+        scale = max_width / width
+        return cv2.resize(img, (max_width, max(int(round(height * scale)), 1)), interpolation=cv2.INTER_AREA), scale
+
+    @staticmethod
+    def scale_face_location(face_location, scale, shape):
+        """把缩放图上的人脸框 (top, right, bottom, left) 换算回原图坐标"""
+        height, width = shape[:2]
+        top, right, bottom, left = face_location
+        return (
+            max(int(round(top / scale)), 0),
+            min(int(round(right / scale)), width),
+            min(int(round(bottom / scale)), height),
+            max(int(round(left / scale)), 0)
+        )
+
+    @staticmethod
+    def crop_face(img, face_location, padding=0.2):
+        """按人脸框裁剪图像，四周各扩展 padding 倍的人脸宽高
+
+        face_location 为 face_recognition 的 (top, right, bottom, left) 格式。
+        返回的是原图的视图，不复制像素。
+        """
+        top, right, bottom, left = face_location
+        pad_y = int((bottom - top) * padding)
+        pad_x = int((right - left) * padding)
+        height, width = img.shape[:2]
+        return img[max(top - pad_y, 0):min(bottom + pad_y, height),
+                   max(left - pad_x, 0):min(right + pad_x, width)]
+
+    @staticmethod
+    def crop_roi(img, face_location, padding=0.5):
+        """裁剪带边距的人脸区域，返回 (区域图像, 区域内的人脸框)
+
+        区域图像为连续内存的拷贝，可直接交给 dlib。
+        """
+        top, right, bottom, left = face_location
+        pad_y = int((bottom - top) * padding)
+        pad_x = int((right - left) * padding)
+        height, width = img.shape[:2]
+        roi_top, roi_left = max(top - pad_y, 0), max(left - pad_x, 0)
+        roi = np.ascontiguousarray(img[roi_top:min(bottom + pad_y, height), roi_left:min(right + pad_x, width)])
+        return roi, (top - roi_top, right - roi_left, bottom - roi_top, left - roi_left)
@@ -0,0 +1,185 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+class InferenceBusyError(Exception):
+    """推理队列已满，请求被拒绝"""
+
+
+class InferenceTimeoutError(InferenceBusyError):
+    """推理任务超时"""
+
+
+class InferenceRestartingError(InferenceBusyError):
+    """推理进程异常退出，进程池正在重建"""
+
+
+def _init_worker(preload_mode, warmup):
+    """推理进程初始化：在每个进程内各自加载并预热模型"""
+    from config import Config
+    from utils.model_registry import ModelRegistry
+    # 每个推理进程一次只执行一个任务，微批处理等不到第二张人脸，只会徒增 max_wait_ms 的延迟
+    Config.EMOTION_BATCHING['enabled'] = False
+    ModelRegistry.preload(preload_mode, warmup)
+
+
+def _ping():
+    return True
+
+
+# 推理任务：在工作进程中执行，参数与返回值需可序列化
+def face_encoding_task(img):
+    """检测人脸并返回编码"""
+    from utils.face_pipeline import FacePipeline
+    return FacePipeline.process(img).encoding
+
+
+def liveness_task(img, last_location=None, track_margin=0.5):
+    """在上一帧人脸附近（丢失时整帧）检测人脸并计算 EAR，眨眼状态留在 Web 进程"""
+    from utils.liveness import measure_eyes
+    return measure_eyes(img, last_location, track_margin)
+
+
+def face_analysis_task(img, hint=None, fields=(), fallback_fields=()):
+    """检测人脸（优先在 hint 附近）并返回 fields 中列出的结果
+
+    fallback_fields 只在人脸不是在 hint 附近找到时才计算，供调用方在跟踪丢失时
+    补算身份等结果。返回 {'location', 'tracked', 字段: 结果}。
+    """
+    from utils.face_pipeline import FacePipeline
+    analysis = FacePipeline.process(img, hint)
+    result = {'location': analysis.face_location, 'tracked': analysis.tracked}
+    for field in tuple(fields) + (() if analysis.tracked else tuple(fallback_fields)):
+        result[field] = getattr(analysis, field)
+    return result
+
+
+def multi_face_task(img, max_faces=None):
+    """检测画面中的所有人脸，批量计算编码和情绪
+
+    返回 {'locations', 'encodings', 'emotions'}，三者按人脸一一对应。
+    """
+    from utils.face_pipeline import FacePipeline
+    analysis = FacePipeline.process_all(img, max_faces)
+    return {
+        'locations': analysis.face_locations,
+        'encodings': analysis.encodings,
+        'emotions': analysis.emotions
+    }
+
+
+class InferenceExecutor:
+    """推理进程池
+
+    把 dlib / DeepFace 推理从 Flask 请求线程中剥离到独立进程，每个进程各自
+    持有已加载的模型，不受主进程 GIL 限制。
+    - 同时排队和执行的任务不超过 max_pending，超出时立即拒绝（降载）
+    - 单个任务超过 timeout 秒未完成时放弃等待并返回超时
+    - 工作进程异常退出（OOM、dlib / TensorFlow 原生崩溃）后整个进程池不可再用，
+      此时重建进程池，重建并预热完成前 is_ready() 为 False
+    """
+
+    def __init__(self, workers=2, max_pending=16, timeout=10, preload_mode='eager', warmup=True):
+        self.workers = workers
+        self.timeout = timeout
+        self._initargs = (preload_mode, warmup)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._ready = threading.Event()
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'completed': 0, 'rejected': 0, 'timeouts': 0, 'failed': 0, 'restarts': 0}
+        self._pool = self._create_pool()
+
+    def _create_pool(self):
+        # 使用 spawn 避免 fork 继承主进程中 TensorFlow 等库的线程状态
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=self._initargs
+        )
+
+    def start(self):
+        """提前拉起全部工作进程并加载模型，完成后 is_ready() 返回 True"""
+        pool = self._pool
+        futures = [pool.submit(_ping) for _ in range(self.workers)]
+
+        def wait_all():
+            try:
+                for future in futures:
+                    future.result()
+                # 等待期间进程池可能已被重建，旧进程池就绪不代表当前进程池就绪
+                if self._pool is pool:
+                    self._ready.set()
+            except Exception as e:
+                print(f"推理进程启动失败: {str(e)}")
+
+        threading.Thread(target=wait_all, name='inference-start', daemon=True).start()
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def _incr(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _restart(self, broken_pool):
+        """重建已损坏的进程池，多个请求同时发现时只重建一次"""
+        with self._pool_lock:
+            if self._pool is not broken_pool:
+                return
+            print("推理进程异常退出，正在重建推理进程池")
+            self._ready.clear()
+            broken_pool.shutdown(wait=False)
+            self._pool = self._create_pool()
+            self._incr('restarts')
+            self.start()
+
+    def run(self, fn, *args):
+        """提交任务并等待结果"""
+        if not self._slots.acquire(blocking=False):
+            self._incr('rejected')
+            raise InferenceBusyError('服务繁忙，请稍后重试')
+        pool = self._pool
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._incr('failed')
+            self._restart(pool)
+            raise InferenceRestartingError('推理服务正在重启，请稍后重试')
+        except Exception:
+            self._slots.release()
+            raise
+        # 任务真正结束（包括超时后仍在运行的任务）时才释放名额
+        future.add_done_callback(lambda _: self._slots.release())
+        self._incr('submitted')
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._incr('timeouts')
+            raise InferenceTimeoutError('处理超时，请稍后重试')
+        except BrokenProcessPool:
+            # 不自动重试：崩溃可能正是由这次的输入引起的
+            self._incr('failed')
+            self._restart(pool)
+            raise InferenceRestartingError('推理服务正在重启，请稍后重试')
+        except Exception:
+            self._incr('failed')
+            raise
+        self._incr('completed')
+        return result
+
+    def stats(self):
+        """推理进程池指标"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.workers
+        stats['ready'] = self.is_ready()
+        return stats
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,116 @@
+import time
+import numpy as np
+from config import Config
+from utils.face_recognition import FaceRecognition
+
+def eye_aspect_ratio(eye):
+    """计算眼睛纵横比(EAR)"""
+    try:
+        # 确保坐标点是 numpy 数组
+        eye = np.array(eye)
+
+        # 计算垂直方向上的欧氏距离
+        A = np.linalg.norm(eye[1] - eye[5])
+        B = np.linalg.norm(eye[2] - eye[4])
+
+        # 计算水平方向上的欧氏距离
+        C = np.linalg.norm(eye[0] - eye[3])
+
+        # 计算眼睛纵横比
+        ear = (A + B) / (2.0 * C)
+        return ear
+    except Exception as e:
+        print(f"计算眼睛纵横比时出错: {str(e)}")
+        return 0.0
+
+
+def measure_eyes(img, last_location=None, track_margin=0.5):
+    """检测人脸并计算 EAR，返回 {'location', 'ear', 'full_detection'}
+
+    last_location 不为空时优先在其附近检测，丢失时才回退到整帧检测。未检测到人脸时
+    location 为 None，未检测到眼睛特征点时 ear 为 None。只依赖参数，可在推理进程中执行。
+    """
+    location = None
+    if last_location is not None:
+        try:
+            location = FaceRecognition.detect_face_near(img, last_location, track_margin)[0]
+        except ValueError:
+            pass
+    full_detection = location is None
+    if location is None:
+        try:
+            location = FaceRecognition.detect_face(img)[0]
+        except ValueError:
+            return {'location': None, 'ear': None, 'full_detection': True}
+
+    landmarks = FaceRecognition.get_face_landmarks(img, [location])
+    left_eye = landmarks.get('left_eye')
+    right_eye = landmarks.get('right_eye')
+    ear = None
+    if left_eye and right_eye:
+        ear = float((eye_aspect_ratio(left_eye) + eye_aspect_ratio(right_eye)) / 2)
+    return {'location': location, 'ear': ear, 'full_detection': full_detection}
+
+
+class LivenessSession:
+    """单个连接的流式眨眼检测状态
+
+    - 跟踪：只在上一帧人脸框附近的区域内检测，丢失时才回退到整帧检测
+    - 眨眼：EAR 先降到 ear_close_threshold 以下，再在 max_closed_seconds 内
+      回升到 ear_open_threshold 以上，记为一次眨眼（闭眼-睁眼完整序列），
+      不会因为两次轮询之间错过闭眼帧而漏检
+
+    人脸检测和 EAR 计算由 measure_eyes 完成（可交给推理进程池），
+    会话只保存跟踪位置和眨眼状态。
+    """
+
+    def __init__(self, config=None):
+        config = config or Config.LIVENESS
+        self.close_threshold = config['ear_close_threshold']
+        self.open_threshold = config['ear_open_threshold']
+        self.max_closed_seconds = config['max_closed_seconds']
+        self.track_margin = config['track_margin']
+        self.required_blinks = config['required_blinks']
+
+        self.last_location = None
+        self.eyes_closed_at = None
+        self.blinks = 0
+        self.frames = 0
+        self.full_detections = 0
+
+    def observe(self, measurement, now=None):
+        """根据 measure_eyes 的结果更新状态，返回本帧的 EAR 以及是否完成了一次眨眼"""
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        if measurement['full_detection']:
+            self.full_detections += 1
+        location = measurement['location']
+        if location is None:
+            # 人脸丢失时清空跟踪和闭眼状态
+            self.last_location = None
+            self.eyes_closed_at = None
+            return {'face': False, 'blink': False, 'blinks': self.blinks, 'passed': False}
+        self.last_location = location
+
+        ear = measurement['ear']
+        if ear is None:
+            return {'face': True, 'blink': False, 'blinks': self.blinks, 'passed': False}
+
+        blink = False
+        if ear < self.close_threshold:
+            if self.eyes_closed_at is None:
+                self.eyes_closed_at = now
+        elif ear > self.open_threshold and self.eyes_closed_at is not None:
+            # 闭眼时间过长视为闭眼而不是眨眼
+            blink = now - self.eyes_closed_at <= self.max_closed_seconds
+            self.eyes_closed_at = None
+            if blink:
+                self.blinks += 1
+
+        return {
+            'face': True,
+            'ear': ear,
+            'blink': blink,
+            'blinks': self.blinks,
+            'passed': self.blinks >= self.required_blinks
+        }
@@ -0,0 +1,147 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from config import Config
+
+class Histogram:
+    """累计分桶直方图（非线程安全，由 Metrics 加锁）"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # 最后一个桶对应 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """轻量的阶段耗时统计
+
+    - timer(stage) 上下文管理器 / timed(stage) 装饰器记录一个阶段的耗时
+    - 同一阶段的耗时汇总到直方图中，render_prometheus() 输出 Prometheus 文本格式
+    - begin_request() 之后当前线程记录的阶段耗时会单独累加，end_request() 取出，
+      用于生成 Server-Timing 响应头
+
+    每次记录只有两次 perf_counter、一次二分查找和一次加锁，可在生产环境常开。
+    推理进程池启用时，工作进程内的阶段不计入主进程，主进程只记录整个推理任务的耗时。
+    """
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    FAMILIES = {
+        'stage': ('face_auth_stage_seconds', '各处理阶段耗时（秒）', 'stage'),
+        'request': ('face_auth_request_seconds', '请求处理耗时（秒）', 'endpoint')
+    }
+
+    _lock = threading.Lock()
+    _histograms = {}
+    _local = threading.local()
+
+    @classmethod
+    def enabled(cls):
+        return Config.METRICS['enabled']
+
+    @classmethod
+    def observe(cls, family, label, seconds):
+        """记录一次耗时"""
+        key = (family, label)
+        with cls._lock:
+            histogram = cls._histograms.get(key)
+            if histogram is None:
+                histogram = cls._histograms[key] = Histogram(cls.BUCKETS)
+            histogram.observe(seconds)
+        if family == 'stage':
+            timings = getattr(cls._local, 'timings', None)
+            if timings is not None:
+                timings[label] = timings.get(label, 0.0) + seconds
+
+    @classmethod
+    @contextmanager
+    def timer(cls, stage):
+        """记录 with 块的耗时（抛出异常时同样记录）"""
+        if not cls.enabled():
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe('stage', stage, time.perf_counter() - start)
+
+    @staticmethod
+    def timed(stage):
+        """记录函数调用耗时的装饰器，需放在 @staticmethod / @classmethod 之下"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not Metrics.enabled():
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    Metrics.observe('stage', stage, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    @classmethod
+    def begin_request(cls):
+        """开始收集当前线程的阶段耗时"""
+        cls._local.timings = {}
+
+    @classmethod
+    def end_request(cls):
+        """结束收集并返回 {阶段: 累计秒数}"""
+        timings = getattr(cls._local, 'timings', None) or {}
+        cls._local.timings = None
+        return timings
+
+    @staticmethod
+    def server_timing(timings):
+        """生成 Server-Timing 响应头的值"""
+        return ', '.join(
+            f"{stage.replace('.', '-')};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()
+        )
+
+    @classmethod
+    def snapshot(cls):
+        """各直方图的次数、总耗时与分桶计数"""
+        with cls._lock:
+            return {
+                key: {'counts': list(h.counts), 'sum': h.sum, 'count': h.count}
+                for key, h in cls._histograms.items()
+            }
+
+    @classmethod
+    def render_prometheus(cls, gauges=None, counters=None):
+        """输出 Prometheus 文本格式
+
+        gauges 为 {指标名: (说明, 数值)}，用于附带连接池等即时指标；
+        counters 格式相同，用于进程启动以来累计的次数，指标名需以 _total 结尾。
+        """
+        snapshot = cls.snapshot()
+        lines = []
+        for family, (name, help_text, label_name) in cls.FAMILIES.items():
+            items = sorted((label, data) for (fam, label), data in snapshot.items() if fam == family)
+            if not items:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for label, data in items:
+                cumulative = 0
+                for bound, count in zip(cls.BUCKETS + ('+Inf',), data['counts']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label_name}="{label}"}} {data["sum"]:.6f}')
+                lines.append(f'{name}_count{{{label_name}="{label}"}} {data["count"]}')
+        for metric_type, metrics in (('gauge', gauges), ('counter', counters)):
+            for name, (help_text, value) in (metrics or {}).items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
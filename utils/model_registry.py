@@ -0,0 +1,142 @@
+import importlib
+import threading
+import time
+import numpy as np
+
+class ModelRegistry:
+    """模型注册表
+
+    统一负责 face_recognition(dlib) 与 DeepFace(TensorFlow) 的导入、加载和预热。
+    这些库导入时就会加载模型，耗时数秒，因此其他模块都通过这里按需获取，
+    只导入 utils 的命令行工具和测试不会被拖慢。
+
+    preload() 可在应用启动时同步或在后台线程中加载全部模型，并在合成图像上
+    各跑一次推理预热；全部完成后 is_ready() 才返回 True。
+    """
+    MODELS = ('face_recognition', 'emotion')
+
+    _lock = threading.RLock()
+    _modules = {}
+    _status = {name: {'loaded': False, 'load_time': None, 'warmup_time': None} for name in MODELS}
+    _ready = threading.Event()
+    _preload_started = False
+    _lazy = False
+    _error = None
+
+    @classmethod
+    def _import(cls, module_name, model_name):
+        """导入模块并记录加载耗时"""
+        module = cls._modules.get(module_name)
+        if module is not None:
+            return module
+        with cls._lock:
+            module = cls._modules.get(module_name)
+            if module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(module_name)
+                cls._modules[module_name] = module
+                cls._status[model_name]['load_time'] = time.perf_counter() - start
+        return module
+
+    @classmethod
+    def face_recognition(cls):
+        """face_recognition 库（导入时加载 dlib 检测、关键点和编码模型）"""
+        module = cls._import('face_recognition', 'face_recognition')
+        cls._status['face_recognition']['loaded'] = True
+        return module
+
+    @classmethod
+    def deepface(cls):
+        """DeepFace 类"""
+        return cls._import('deepface', 'emotion').DeepFace
+
+    @classmethod
+    def emotion_model(cls):
+        """DeepFace 情绪模型（DeepFace 内部会缓存已构建的模型）"""
+        with cls._lock:
+            status = cls._status['emotion']
+            if not status['loaded']:
+                start = time.perf_counter()
+                model = cls.deepface().build_model('Emotion')
+                status['load_time'] = (status['load_time'] or 0) + time.perf_counter() - start
+                status['loaded'] = True
+                cls._modules['emotion_model'] = model
+            return cls._modules['emotion_model']
+
+    @classmethod
+    def _warmup_face_recognition(cls):
+        """在合成图像上跑一次检测、编码和关键点"""
+        face_recognition = cls.face_recognition()
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        location = [(40, 200, 200, 40)]
+        face_recognition.face_locations(frame)
+        face_recognition.face_encodings(frame, known_face_locations=location)
+        face_recognition.face_landmarks(frame, face_locations=location)
+
+    @classmethod
+    def _warmup_emotion(cls):
+        """在合成人脸裁剪图上跑一次情绪分析"""
+        from utils.emotion_analyzer import EmotionAnalyzer
+        cls.emotion_model()
+        EmotionAnalyzer.analyze(np.full((96, 96, 3), 128, dtype=np.uint8), detector_backend='skip')
+
+    @classmethod
+    def _load_all(cls, warmup):
+        try:
+            for name, loader, warmer in (
+                ('face_recognition', cls.face_recognition, cls._warmup_face_recognition),
+                ('emotion', cls.emotion_model, cls._warmup_emotion)
+            ):
+                loader()
+                if warmup:
+                    start = time.perf_counter()
+                    warmer()
+                    cls._status[name]['warmup_time'] = time.perf_counter() - start
+                status = cls._status[name]
+                print(f"模型 {name} 已就绪: 加载 {status['load_time'] or 0:.2f}s, "
+                      f"预热 {status['warmup_time'] or 0:.2f}s")
+            cls._ready.set()
+        except Exception as e:
+            cls._error = str(e)
+            print(f"模型预加载失败: {str(e)}")
+
+    @classmethod
+    def preload(cls, mode='background', warmup=True):
+        """预加载模型
+
+        mode: 'eager' 阻塞直到加载完成；'background' 在后台线程中加载；
+        'lazy' 不预加载，首次使用时再加载。
+        """
+        with cls._lock:
+            if cls._preload_started:
+                return
+            cls._preload_started = True
+        if mode == 'lazy':
+            cls._lazy = True
+            return
+        if mode == 'eager':
+            cls._load_all(warmup)
+        elif mode == 'background':
+            threading.Thread(target=cls._load_all, args=(warmup,), name='model-preload', daemon=True).start()
+        else:
+            raise ValueError(f'未知的模型预加载模式: {mode}')
+
+    @classmethod
+    def is_ready(cls):
+        """模型已加载并预热完成（lazy 模式下始终视为就绪）"""
+        return cls._lazy or cls._ready.is_set()
+
+    @classmethod
+    def wait_until_ready(cls, timeout=None):
+        """阻塞等待模型就绪"""
+        return cls._lazy or cls._ready.wait(timeout)
+
+    @classmethod
+    def status(cls):
+        """各模型的加载状态与耗时"""
+        with cls._lock:
+            return {
+                'ready': cls.is_ready(),
+                'error': cls._error,
+                'models': {name: dict(status) for name, status in cls._status.items()}
+            }
@@ -0,0 +1,296 @@
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+import cv2
+import numpy as np
+from config import Config
+from utils.database import Database
+from utils.face_pipeline import FacePipeline
+from utils.face_recognition import FaceRecognition
+from utils.image_processor import ImageProcessor
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# 阶段之间传递的结束标记
+_DONE = object()
+
+
+class FrameSampler:
+    """决定哪些帧需要分析
+
+    - every: 每 every 帧取一帧
+    - sample_fps: 按时间戳每 1/sample_fps 秒取一帧
+    - motion_threshold: 与上一张取样帧相比灰度平均差超过该值才取，画面静止时跳过
+
+    every 和 sample_fps 只看帧号和时间戳，被跳过的视频帧只 grab 不解码；
+    motion_threshold 需要先解码才能比较。
+    """
+
+    def __init__(self, every=1, sample_fps=None, motion_threshold=None):
+        self.every = max(every, 1)
+        self.interval = 1.0 / sample_fps if sample_fps else 0.0
+        self.motion_threshold = motion_threshold
+        self._next_at = 0.0
+        self._last_gray = None
+
+    def wants(self, index, seconds):
+        """按帧号和时间戳判断是否需要解码这一帧"""
+        if index % self.every:
+            return False
+        if self.interval and seconds + 1e-6 < self._next_at:
+            return False
+        return True
+
+    def accept(self, frame, seconds):
+        """解码后的最终判断，返回 True 时这一帧进入分析"""
+        if self.motion_threshold is not None:
+            small, _ = ImageProcessor.downscale(frame, 160)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            if self._last_gray is not None and \
+               float(cv2.absdiff(gray, self._last_gray).mean()) < self.motion_threshold:
+                return False
+            self._last_gray = gray
+        self._next_at = seconds + self.interval
+        return True
+
+
+class FrameSource:
+    """视频文件或图片序列（目录中的图片按文件名排序）
+
+    图片序列没有帧率，按 fps 计算每张图片的时间戳。
+    """
+
+    def __init__(self, path, fps=None):
+        self.path = path
+        if os.path.isdir(path):
+            self._images = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            self.fps = fps or 1.0
+            self.frame_count = len(self._images)
+        else:
+            self._images = None
+            capture = cv2.VideoCapture(path)
+            if not capture.isOpened():
+                raise ValueError(f'无法打开视频: {path}')
+            self.fps = fps or capture.get(cv2.CAP_PROP_FPS) or 25.0
+            self.frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            capture.release()
+
+    def frames(self, sampler, stats):
+        """逐帧返回 (帧号, 秒, 图像)，只解码 sampler 需要的帧"""
+        if self._images is not None:
+            for index, file in enumerate(self._images):
+                seconds = index / self.fps
+                stats['read'] += 1
+                if not sampler.wants(index, seconds):
+                    continue
+                frame = cv2.imread(file)
+                if frame is None:
+                    print(f"跳过无法读取的图片: {file}")
+                    continue
+                stats['decoded'] += 1
+                if sampler.accept(frame, seconds):
+                    yield index, seconds, frame
+            return
+
+        capture = cv2.VideoCapture(self.path)
+        try:
+            index = 0
+            while True:
+                seconds = index / self.fps
+                if not sampler.wants(index, seconds):
+                    # 跳过的帧只取出不解码
+                    if not capture.grab():
+                        break
+                    stats['read'] += 1
+                    index += 1
+                    continue
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                stats['read'] += 1
+                stats['decoded'] += 1
+                if sampler.accept(frame, seconds):
+                    yield index, seconds, frame
+                index += 1
+        finally:
+            capture.release()
+
+
+class ReplayPipeline:
+    """离线回放录像，生成情绪时间线
+
+    三个阶段并发执行，阶段之间用有界队列衔接，下游处理不过来时上游阻塞等待：
+        读取线程   按采样策略读取并解码帧
+        推理线程   workers 个线程，检测所有人脸、批量计算编码和情绪
+        写入（主线程）  与人脸库匹配，攒够 batch_size 条后用 save_emotions 批量写入
+    dlib 与 TensorFlow 推理时会释放 GIL，多个推理线程可以并行。
+
+    指定 user_id 时认为录像中只有该用户，不做身份识别，只分析面积最大的人脸。
+    每条记录的时间为 start_time 加上帧在录像中的时间。
+    """
+
+    def __init__(self, source, sampler, start_time, user_id=None, workers=2, queue_size=32,
+                 batch_size=500, max_faces=None, dry_run=False, progress_interval=5.0):
+        self.source = source
+        self.sampler = sampler
+        self.start_time = start_time
+        self.user_id = user_id
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_faces = max_faces or Config.MULTI_FACE['max_faces']
+        self.dry_run = dry_run
+        self.progress_interval = progress_interval
+
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._results = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._errors = []
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'read': 0, 'decoded': 0, 'analyzed': 0, 'no_face': 0,
+            'faces': 0, 'identified': 0, 'records': 0
+        }
+
+    def _incr(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _put(self, q, item):
+        """放入有界队列，流水线出错停止时放弃等待"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        try:
+            for item in self.source.frames(self.sampler, self.stats):
+                if not self._put(self._frames, item):
+                    return
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            for _ in range(self.workers):
+                self._put(self._frames, _DONE)
+
+    def _analyze(self, frame):
+        """返回 [(人脸框, 编码或 None, 情绪结果)]"""
+        if self.user_id is not None:
+            analysis = FacePipeline.process_all(frame, max_faces=1)
+            return [(analysis.face_location, None, analysis.emotion)]
+        analysis = FacePipeline.process_all(frame, self.max_faces)
+        return list(zip(analysis.face_locations, analysis.encodings, analysis.emotions))
+
+    def _infer(self):
+        try:
+            while True:
+                try:
+                    item = self._frames.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        return
+                    continue
+                if item is _DONE:
+                    break
+                index, seconds, frame = item
+                try:
+                    faces = self._analyze(frame)
+                except ValueError:
+                    self._incr('no_face')
+                    faces = []
+                self._incr('analyzed')
+                if not self._put(self._results, (index, seconds, faces)):
+                    return
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._put(self._results, _DONE)
+
+    def _records(self, seconds, faces):
+        """一帧的情绪记录，同一用户在一帧中只记录距离最近的人脸"""
+        created_at = (self.start_time + timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S')
+        if self.user_id is not None:
+            return [(self.user_id, emotion['emotion'], created_at, emotion['probabilities'])
+                    for _, _, emotion in faces]
+        if not faces:
+            return []
+        matches = FaceRecognition.find_best_matches(np.array([encoding for _, encoding, _ in faces]))
+        best = {}
+        for (_, _, emotion), match in zip(faces, matches):
+            if match and match[2] < Config.FACE_RECOGNITION['face_distance_threshold']:
+                user_id, _, distance = match
+                if user_id not in best or distance < best[user_id][0]:
+                    best[user_id] = (distance, emotion)
+        return [(user_id, emotion['emotion'], created_at, emotion['probabilities'])
+                for user_id, (_, emotion) in best.items()]
+
+    def _flush(self, records):
+        if records and not self.dry_run:
+            Database.save_emotions(records)
+        self._incr('records', len(records))
+        records.clear()
+
+    def _report(self, start):
+        elapsed = time.perf_counter() - start
+        stats = dict(self.stats)
+        print(f"[{stats['read']}/{self.source.frame_count or '?'}] 读取 {stats['read'] / elapsed:.1f} 帧/秒, "
+              f"分析 {stats['analyzed']} 帧 ({stats['analyzed'] / elapsed:.1f} 帧/秒), "
+              f"人脸 {stats['faces']}, 识别 {stats['identified']}, 记录 {stats['records']}", flush=True)
+
+    def run(self):
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._read, name='replay-reader', daemon=True)]
+        threads += [
+            threading.Thread(target=self._infer, name=f'replay-infer-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        records = []
+        finished = 0
+        last_report = start
+        try:
+            while finished < self.workers:
+                try:
+                    item = self._results.get(timeout=0.5)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if item is _DONE:
+                    finished += 1
+                    continue
+                _, seconds, faces = item
+                frame_records = self._records(seconds, faces)
+                self._incr('faces', len(faces))
+                self._incr('identified', len(frame_records))
+                records.extend(frame_records)
+                if len(records) >= self.batch_size:
+                    self._flush(records)
+                if time.perf_counter() - last_report >= self.progress_interval:
+                    self._report(start)
+                    last_report = time.perf_counter()
+            self._flush(records)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+        elapsed = time.perf_counter() - start
+        self._report(start)
+        self.stats['elapsed'] = elapsed
+        self.stats['fps'] = self.stats['analyzed'] / elapsed if elapsed else 0.0
+        return self.stats
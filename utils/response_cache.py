@@ -0,0 +1,193 @@
+import asyncio
+import json
+import threading
+from config import Config
+from utils.ttl_cache import TTLCache
+
+class LocalCacheBackend:
+    """进程内缓存后端：条目存放在 TTLCache 中，版本号存放在普通字典中
+
+    版本号不参与 LRU 淘汰，否则被淘汰后归零会让旧条目重新生效。
+    也可作为共享后端的本地替身，用于开发和单进程部署。
+    版本号只在本进程内递增：其他进程（包括 manage.py 的 enroll、replay 等命令）
+    写入数据后，本进程中的旧条目仍会命中，直到 TTL 过期。
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self._entries = TTLCache(max_entries, ttl)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._entries.set(key, value, ttl)
+
+    def get_generations(self, tags):
+        with self._lock:
+            return [self._generations.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Redis 共享缓存后端，多个 Web 进程共用同一份缓存和版本号
+
+    redis 为可选依赖，只有配置 backend='redis' 时才需要安装。
+    """
+
+    def __init__(self, url, ttl=300, prefix='face_auth:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('使用 redis 缓存后端需要先安装 redis: pip install redis')
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.setex(self.prefix + key, ttl or self.ttl, json.dumps(value, ensure_ascii=False))
+
+    def get_generations(self, tags):
+        values = self._client.mget([self.prefix + 'gen:' + tag for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, tags):
+        pipe = self._client.pipeline()
+        for tag in tags:
+            pipe.incr(self.prefix + 'gen:' + tag)
+        pipe.execute()
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    """读接口的结果缓存
+
+    缓存键由命名空间、参数和各标签的当前版本号组成。数据写入后只需把相关标签的
+    版本号加一（invalidate），旧条目就不会再被命中，随后按 TTL 或 LRU 自然淘汰。
+    缓存的值必须可以 JSON 序列化，loader 返回 None 时不缓存。
+    """
+    USER_LIST_TAG = 'user_list'
+
+    _lock = threading.Lock()
+    _backend = None
+    _stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @classmethod
+    def get_backend(cls):
+        if cls._backend is None:
+            with cls._lock:
+                if cls._backend is None:
+                    config = Config.RESPONSE_CACHE
+                    if config['backend'] == 'redis':
+                        cls._backend = RedisCacheBackend(config['redis_url'], config['ttl'])
+                    elif config['backend'] == 'local':
+                        cls._backend = LocalCacheBackend(config['max_entries'], config['ttl'])
+                    else:
+                        raise ValueError(f"未知的缓存后端: {config['backend']}")
+        return cls._backend
+
+    @classmethod
+    def set_backend(cls, backend):
+        """替换缓存后端"""
+        with cls._lock:
+            cls._backend = backend
+
+    @classmethod
+    def _incr(cls, key, value=1):
+        with cls._lock:
+            cls._stats[key] += value
+
+    @classmethod
+    def _lookup(cls, namespace, tags, params):
+        """返回 (缓存键, 缓存值)，未命中时缓存值为 None"""
+        backend = cls.get_backend()
+        generations = backend.get_generations(tags)
+        key = f"{namespace}:{json.dumps(params, ensure_ascii=False)}:{generations}"
+        value = backend.get(key)
+        cls._incr('hits' if value is not None else 'misses')
+        return key, value
+
+    @classmethod
+    def get_or_set(cls, namespace, tags, params, loader):
+        """命中时返回缓存值，否则调用 loader() 计算并写入缓存"""
+        if not Config.RESPONSE_CACHE['enabled']:
+            return loader()
+        key, value = cls._lookup(namespace, tags, params)
+        if value is not None:
+            return value
+        value = loader()
+        if value is not None:
+            cls.get_backend().set(key, value)
+        return value
+
+    @classmethod
+    async def aget_or_set(cls, namespace, tags, params, loader):
+        """get_or_set 的异步版本，loader 为协程函数
+
+        缓存条目与 get_or_set 共用，同步和异步接口可以互相命中。
+        redis 等外部后端的调用是阻塞的网络请求，放到线程池中执行，不阻塞事件循环。
+        """
+        if not Config.RESPONSE_CACHE['enabled']:
+            return await loader()
+        backend = cls.get_backend()
+        if isinstance(backend, LocalCacheBackend):
+            # 进程内后端只是内存读写，直接调用
+            key, value = cls._lookup(namespace, tags, params)
+        else:
+            key, value = await cls._run_blocking(cls._lookup, namespace, tags, params)
+        if value is not None:
+            return value
+        value = await loader()
+        if value is not None:
+            if isinstance(backend, LocalCacheBackend):
+                backend.set(key, value)
+            else:
+                await cls._run_blocking(backend.set, key, value)
+        return value
+
+    @staticmethod
+    async def _run_blocking(func, *args):
+        """在默认线程池中执行阻塞调用"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    @classmethod
+    def invalidate(cls, *tags):
+        """使带有这些标签的缓存条目失效"""
+        if not Config.RESPONSE_CACHE['enabled'] or not tags:
+            return
+        cls.get_backend().bump(tags)
+        cls._incr('invalidations', len(tags))
+
+    @classmethod
+    def stats(cls):
+        """缓存命中率等指标"""
+        with cls._lock:
+            stats = dict(cls._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['backend'] = Config.RESPONSE_CACHE['backend']
+        stats['entries'] = cls.get_backend().size() if Config.RESPONSE_CACHE['enabled'] else 0
+        return stats
+
+    # 各读接口使用的缓存标签
+    @staticmethod
+    def user_tag(user_id):
+        return f'user:{user_id}'
+
+    @staticmethod
+    def emotions_tag(user_id):
+        return f'emotions:{user_id}'
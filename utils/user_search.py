@@ -0,0 +1,238 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from config import Config
+from utils.database import Database
+from utils.ttl_cache import TTLCache
+
+class UserSearchIndex:
+    """进程内用户名搜索索引
+
+    为每个用户名（转小写）建立长度 1~3 的 n-gram 倒排表，子串查询时取查询串的
+    n-gram 倒排表求交集，再校验子串，语义与 LIKE '%query%' 相同但不扫描全表。
+    最新情绪也缓存在内存中，搜索完全不访问 MySQL。
+
+    本进程的注册和情绪记录会直接更新索引；其他进程的写入每隔
+    refresh_interval 秒通过两条走索引的增量查询同步一次。情绪的同步水位只由
+    从数据库读到的行推进，查询时再回看 emotion_lookback 秒，覆盖批量写入延迟
+    落库和各进程之间时钟偏差的记录。
+    最近的查询结果缓存在 TTLCache 中，写入时只失效能匹配到被修改用户名的查询。
+    """
+    MAX_GRAM = 3
+    # 候选集超过该大小时改为按最近情绪时间的快照顺序扫描，而不是整体排序
+    SCAN_THRESHOLD = 2000
+    # 快照之后有变动的用户超过该数量时重建快照
+    MAX_DIRTY = 4096
+
+    _lock = threading.RLock()
+    _loaded = False
+    _users = {}
+    _postings = {}
+    _synced_id = 0
+    _synced_emotion_at = None
+    _last_refresh = 0.0
+    _by_recency = []
+    _dirty = set()
+    _cache = TTLCache(Config.USER_SEARCH['cache_size'], Config.USER_SEARCH['cache_ttl'])
+
+    @staticmethod
+    def _grams(text):
+        """text 的全部长度 1~MAX_GRAM 的子串"""
+        grams = set()
+        for n in range(1, UserSearchIndex.MAX_GRAM + 1):
+            for i in range(len(text) - n + 1):
+                grams.add(text[i:i + n])
+        return grams
+
+    @staticmethod
+    def _format_time(value):
+        """统一为 'YYYY-MM-DD HH:MM:SS' 字符串，可直接按字典序比较"""
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+
+    @classmethod
+    def _index_user(cls, user_id, username, latest_emotion=None, emotion_time=None):
+        """加入或更新一个用户，调用方需持有锁"""
+        if user_id not in cls._users:
+            for gram in cls._grams(username.lower()):
+                cls._postings.setdefault(gram, set()).add(user_id)
+        cls._users[user_id] = {
+            'username': username,
+            'key': username.lower(),
+            'latest_emotion': latest_emotion,
+            'emotion_time': cls._format_time(emotion_time)
+        }
+
+    @classmethod
+    def load(cls):
+        """从数据库加载全部用户"""
+        with cls._lock:
+            cls._users = {}
+            cls._postings = {}
+            cls._synced_id = 0
+            cls._synced_emotion_at = None
+            cls._apply_user_rows(Database.get_search_entries())
+            cls._rebuild_recency()
+            cls._last_refresh = time.monotonic()
+            cls._loaded = True
+            cls._cache.clear()
+            print(f"用户搜索索引已加载: {len(cls._users)} 个用户")
+
+    @classmethod
+    def _advance_emotion_watermark(cls, emotion_at):
+        """用从数据库读到的情绪时间推进同步水位，调用方需持有锁"""
+        emotion_at = cls._format_time(emotion_at)
+        if emotion_at and (cls._synced_emotion_at is None or emotion_at > cls._synced_emotion_at):
+            cls._synced_emotion_at = emotion_at
+
+    @classmethod
+    def _emotion_since(cls):
+        """增量查询最新情绪的起始时间：同步水位再回看 emotion_lookback 秒"""
+        if cls._synced_emotion_at is None:
+            # 加载时还没有任何情绪记录，之后的记录全部需要同步
+            return '1970-01-01 00:00:00'
+        watermark = datetime.strptime(cls._synced_emotion_at, '%Y-%m-%d %H:%M:%S')
+        return cls._format_time(watermark - timedelta(seconds=Config.USER_SEARCH['emotion_lookback']))
+
+    @classmethod
+    def _apply_user_rows(cls, rows):
+        for user_id, username, latest_emotion, emotion_at in rows:
+            cls._index_user(user_id, username, latest_emotion, emotion_at)
+            cls._synced_id = max(cls._synced_id, user_id)
+            cls._advance_emotion_watermark(emotion_at)
+
+    @classmethod
+    def refresh(cls):
+        """同步其他进程写入的新用户和最新情绪"""
+        with cls._lock:
+            if not cls._loaded:
+                cls.load()
+                return
+            for user_id, username, latest_emotion, emotion_at in Database.get_search_entries(cls._synced_id):
+                cls.add_user(user_id, username)
+                if latest_emotion is not None:
+                    cls.update_emotion(user_id, latest_emotion, emotion_at)
+                    cls._advance_emotion_watermark(emotion_at)
+                cls._synced_id = max(cls._synced_id, user_id)
+            for user_id, latest_emotion, emotion_at in Database.get_latest_emotion_updates(cls._emotion_since()):
+                cls.update_emotion(user_id, latest_emotion, emotion_at)
+                cls._advance_emotion_watermark(emotion_at)
+            cls._last_refresh = time.monotonic()
+
+    @classmethod
+    def _invalidate(cls, username_key):
+        """失效能匹配到该用户名的缓存查询"""
+        cls._cache.delete_where(lambda key: key[0] in username_key)
+
+    @classmethod
+    def add_user(cls, user_id, username):
+        """注册新用户后加入索引"""
+        with cls._lock:
+            if not cls._loaded or user_id in cls._users:
+                return
+            cls._index_user(user_id, username)
+            cls._dirty.add(user_id)
+            cls._invalidate(username.lower())
+
+    @classmethod
+    def update_emotion(cls, user_id, emotion, emotion_time):
+        """记录情绪后更新用户的最新情绪
+
+        不推进同步水位：本进程写入的时间可能晚于其他进程尚未落库的记录。
+        """
+        with cls._lock:
+            user = cls._users.get(user_id)
+            if user is None:
+                return
+            emotion_time = cls._format_time(emotion_time)
+            # 回看窗口会重复读到已应用的行，内容不变时不失效缓存
+            if (user['emotion_time'] is None or emotion_time > user['emotion_time']
+                    or (emotion_time == user['emotion_time'] and emotion != user['latest_emotion'])):
+                user['latest_emotion'] = emotion
+                user['emotion_time'] = emotion_time
+                cls._dirty.add(user_id)
+                cls._invalidate(user['key'])
+
+    @classmethod
+    def _match(cls, text):
+        """用户名包含 text 的用户 id 集合，调用方需持有锁
+
+        _top 会对候选集逐个做成员判断，因此必须返回集合。
+        """
+        n = min(len(text), cls.MAX_GRAM)
+        # 从最短的倒排表开始求交集
+        postings = sorted(
+            (cls._postings.get(text[i:i + n], ()) for i in range(len(text) - n + 1)),
+            key=len
+        )
+        candidates = postings[0]
+        if len(postings) > 1:
+            candidates = set(candidates).intersection(*postings[1:])
+        if len(text) > cls.MAX_GRAM:
+            # n-gram 都出现不代表连续出现，需再校验一次子串
+            candidates = {uid for uid in candidates if text in cls._users[uid]['key']}
+        return candidates
+
+    @classmethod
+    def _recency_key(cls, user_id):
+        # 没有情绪记录的用户排在最后
+        return (cls._users[user_id]['emotion_time'] or '', user_id)
+
+    @classmethod
+    def _rebuild_recency(cls):
+        """按最新情绪时间倒序重建用户快照，调用方需持有锁"""
+        cls._by_recency = sorted(cls._users, key=cls._recency_key, reverse=True)
+        cls._dirty = set()
+
+    @classmethod
+    def _top(cls, candidates, limit):
+        """候选用户中最新情绪时间最近的 limit 个，调用方需持有锁"""
+        if len(candidates) <= cls.SCAN_THRESHOLD:
+            return heapq.nlargest(limit, candidates, key=cls._recency_key)
+        if len(cls._dirty) > cls.MAX_DIRTY:
+            cls._rebuild_recency()
+        # 快照之后未变动的用户在快照中的顺序仍然正确，变动过的用户单独参与排序
+        picked = []
+        for user_id in cls._by_recency:
+            if user_id in candidates and user_id not in cls._dirty:
+                picked.append(user_id)
+                if len(picked) >= limit:
+                    break
+        picked.extend(user_id for user_id in cls._dirty if user_id in candidates)
+        return heapq.nlargest(limit, picked, key=cls._recency_key)
+
+    @classmethod
+    def search(cls, query, limit=50):
+        """子串搜索用户名，按最新情绪时间倒序返回最多 limit 个用户"""
+        key = (query.lower(), limit)
+        cached = cls._cache.get(key)
+        if cached is not None:
+            return cached
+
+        with cls._lock:
+            if not cls._loaded:
+                cls.load()
+            elif time.monotonic() - cls._last_refresh > Config.USER_SEARCH['refresh_interval']:
+                cls.refresh()
+
+            text = key[0]
+            if not text:
+                candidates = cls._users.keys()
+            else:
+                candidates = cls._match(text)
+
+            top = cls._top(candidates, limit)
+            results = [
+                {
+                    'username': cls._users[uid]['username'],
+                    'latest_emotion': cls._users[uid]['latest_emotion'],
+                    'emotion_time': cls._users[uid]['emotion_time']
+                }
+                for uid in top
+            ]
+            cls._cache.set(key, results)
+        return results